@@ -0,0 +1,31 @@
+import argparse
+import os
+import sys
+
+# Beräkningskoden ligger bredvid appen i streamlit_app/
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app")
+sys.path.insert(0, app_dir)
+
+from forberakning import bygg_artefakt
+
+parser = argparse.ArgumentParser(description="Förberäkna avstånd från lekplatser till närmaste hållplats och toalett.")
+parser.add_argument("--gangnat", help="OSM-utdrag (XML) med gatunätet; ger gångavstånd i stället för fågelväg")
+parser.add_argument("--raster", type=float, metavar="METER",
+                    help="bygg även tillgänglighetsrastret (avstånd per cell) med denna cellstorlek")
+args = parser.parse_args()
+
+sökväg = bygg_artefakt(
+    os.path.join(app_dir, "lekplatser_ny.json"),
+    os.path.join(app_dir, "stops.txt"),
+    os.path.join(app_dir, "toaletter.json"),
+    gångnät_fil=args.gangnat,
+)
+
+print(f"Filen '{os.path.relpath(sökväg)}' har sparats.")
+
+if args.raster:
+    from tillganglighet import bygg_raster
+    sökväg = bygg_raster(
+        os.path.join(app_dir, "stops.txt"), os.path.join(app_dir, "toaletter.json"), upplösning_m=args.raster
+    )
+    print(f"Filen '{os.path.relpath(sökväg)}' har sparats.")
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+
+# Beräkningskoden ligger bredvid appen i streamlit_app/
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app")
+sys.path.insert(0, app_dir)
+
+import regioner
+from osm_uppdatering import FILNAMN
+from regionbygge import bygg
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bygg en shard per region (hållplatser, OSM-lager och förberäknade filer) från nationella indata."
+    )
+    parser.add_argument("--gtfs", required=True, help="nationell GTFS (stops.txt eller zip)")
+    parser.add_argument("--lekplatser", required=True, help="nationell OSM-JSON med lekplatser")
+    parser.add_argument("--toaletter", required=True, help="nationell OSM-JSON med toaletter")
+    parser.add_argument("--osm", action="append", default=[], metavar="DATASET=FIL",
+                        help="fler nationella OSM-lager, t.ex. bänkar=sverige_bankar.json")
+    parser.add_argument("--regioner", nargs="+", help="vilka regioner (standard: alla i registret)")
+    parser.add_argument("--regionfil", help="JSON-fil med fler regioner (samma fält som region.json)")
+    parser.add_argument("--katalog", default=regioner.SHARDKATALOG, help="var shardarna skrivs")
+    parser.add_argument("--processer", type=int, help="antal arbetsprocesser (standard: alla kärnor)")
+    parser.add_argument("--raster", type=float, metavar="METER",
+                        help="bygg även tillgänglighetsrastret med denna cellstorlek")
+    args = parser.parse_args()
+
+    if args.regionfil:
+        regioner.registrera_från_fil(args.regionfil)
+    regionlista = [regioner.REGISTER[id_] for id_ in (args.regioner or regioner.REGISTER)]
+    osm_källor = {'lekplatser': args.lekplatser, 'toaletter': args.toaletter}
+    osm_källor.update(dict(par.split("=", 1) for par in args.osm))
+    okända = sorted(set(osm_källor) - set(FILNAMN))
+    if okända:
+        parser.error(f"okända dataset: {', '.join(okända)} (välj bland {', '.join(sorted(FILNAMN))})")
+
+    resultat = bygg(regionlista, args.gtfs, osm_källor, bas=args.katalog,
+                    max_processer=args.processer, upplösning_m=args.raster)
+    for region_id, rad in resultat.items():
+        antal = ", ".join(f"{n} {dataset}" for dataset, n in rad.items() if dataset != 'sekunder')
+        status = f"förberäknad på {rad['sekunder']:.1f} s" if rad['sekunder'] is not None else "ej förberäknad (data saknas)"
+        print(f"{region_id:<12} {antal}; {status}")
+    print(f"Shardarna har sparats i '{os.path.relpath(args.katalog)}'.")
@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+# Beräkningskoden ligger bredvid appen i streamlit_app/
+app_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app")
+sys.path.insert(0, app_dir)
+
+from kartexport import VARIANTER, exportera
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Förbygg kartor (HTML) och GeoJSON-lager för alla klustringsval, t.ex. för en CDN."
+    )
+    parser.add_argument("--katalog", default=os.path.join(app_dir, "kartor"), help="var exporten skrivs")
+    parser.add_argument("--gangnat", help="OSM-utdrag (XML) med gatunätet; ger gångavstånd i stället för fågelväg")
+    parser.add_argument("--lage", choices=("bulk", "markörer"), default="bulk", help="hur kartans punkter ritas")
+    parser.add_argument("--processer", type=int, help="antal arbetsprocesser (standard: alla kärnor)")
+    parser.add_argument("--klustring", choices=("kmeans", "minibatch"), default="kmeans",
+                        help="klustringsbackend, samma som KLUSTRING_BACKEND i appen")
+    args = parser.parse_args()
+
+    katalog = exportera(
+        os.path.join(app_dir, "lekplatser_ny.json"),
+        os.path.join(app_dir, "stops.txt"),
+        os.path.join(app_dir, "toaletter.json"),
+        args.katalog,
+        gångnät_fil=args.gangnat,
+        läge=args.lage,
+        max_processer=args.processer,
+        backend=args.klustring,
+    )
+    print(f"{len(VARIANTER)} kartor har exporterats till '{os.path.relpath(katalog)}'.")
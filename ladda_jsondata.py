@@ -1,25 +1,36 @@
-import requests
-import pandas as pd
-import json
+import argparse
+import os
+import sys
 
-query = """
-[out:json];
-node["leisure"="playground"](57.5,11.7,57.85,12.1);
-out body;
-"""
+# Uppdateringslogiken ligger bredvid appen i streamlit_app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app"))
 
-url = "http://overpass-api.de/api/interpreter"
-respones = requests.get(url, params={"data": query})
-playground = respones.json()
+from osm_uppdatering import OVERPASS_URL, finns_ändringar, sammanfatta, uppdatera
+from overpass import CACHE_TTL_S
+import regioner
 
-#Filtrera bort lekplatser där access = "private"
-filtered_elements = [
-    el for el in playground["elements"]
-    if not(el.get("tags", {}).get("access") =="private")
-]
+parser = argparse.ArgumentParser(description="Hämta lekplatser från OpenStreetMap (Overpass).")
+parser.add_argument("--inkrementell", action="store_true",
+                    help="jämför med den sparade filen och skriv bara om något har ändrats")
+parser.add_argument("--fixtur", help="läs Overpass-svaret från en lokal JSON-fil i stället för att hämta det")
+parser.add_argument("--katalog",
+                    help="katalog där 'lekplatser_ny.json' ligger/sparas (standard: . eller regionens shard)")
+parser.add_argument("--region", choices=sorted(regioner.REGISTER),
+                    help="hämta inom regionens ruta (se regioner.py) i stället för Göteborgs")
+parser.add_argument("--url", default=OVERPASS_URL, help="Overpass-adress (t.ex. en lokal testserver)")
+parser.add_argument("--cache-ttl", type=int, default=CACHE_TTL_S,
+                    help="återanvänd sparade Overpass-svar som är yngre än så här många sekunder (0 = ingen cache)")
+args = parser.parse_args()
 
-with open("lekplatser_ny.json", "w", encoding="utf-8") as f:
-    json.dump(filtered_elements, f, ensure_ascii=False, indent=2)
+bbox = regioner.REGISTER[args.region].bbox if args.region else None
+katalog = args.katalog or (regioner.shardkatalog(args.region) if args.region else ".")
+os.makedirs(katalog, exist_ok=True)
 
+diff = uppdatera("lekplatser", katalog=katalog, fixtur=args.fixtur, inkrementell=args.inkrementell,
+                 url=args.url, cache_ttl_s=args.cache_ttl, bbox=bbox)
+print(sammanfatta("lekplatser", diff))
 
-print("Filen 'lekplatser_ny.json' har sparats.")
\ No newline at end of file
+if finns_ändringar(diff):
+    print("Filen 'lekplatser_ny.json' har sparats.")
+else:
+    print("Inga ändringar, filen 'lekplatser_ny.json' har inte skrivits om.")
@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+
+# Uppdateringslogiken ligger bredvid appen i streamlit_app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app"))
+
+from osm_uppdatering import FILNAMN, OVERPASS_URL, finns_ändringar, sammanfatta, uppdatera_flera
+from overpass import CACHE_TTL_S
+import regioner
+
+parser = argparse.ArgumentParser(description="Hämta flera dataset från OpenStreetMap (Overpass) samtidigt.")
+parser.add_argument("dataset", nargs="+", choices=sorted(FILNAMN), help="vilka dataset som ska hämtas")
+parser.add_argument("--inkrementell", action="store_true",
+                    help="jämför med de sparade filerna och skriv bara om det som har ändrats")
+parser.add_argument("--katalog",
+                    help="katalog där filerna ligger/sparas (standard: . eller regionens shard)")
+parser.add_argument("--region", choices=sorted(regioner.REGISTER),
+                    help="hämta inom regionens ruta (se regioner.py) i stället för Göteborgs")
+parser.add_argument("--url", default=OVERPASS_URL, help="Overpass-adress (t.ex. en lokal testserver)")
+parser.add_argument("--rutnat", type=int, nargs=2, default=(2, 2), metavar=("RADER", "KOLUMNER"),
+                    help="hur rutan delas upp i delfrågor")
+parser.add_argument("--samtidiga", type=int, default=4, help="högst så här många frågor åt gången")
+parser.add_argument("--cache-ttl", type=int, default=CACHE_TTL_S,
+                    help="återanvänd sparade Overpass-svar som är yngre än så här många sekunder (0 = ingen cache)")
+args = parser.parse_args()
+
+bbox = regioner.REGISTER[args.region].bbox if args.region else None
+katalog = args.katalog or (regioner.shardkatalog(args.region) if args.region else ".")
+os.makedirs(katalog, exist_ok=True)
+
+diffar = uppdatera_flera(
+    args.dataset, katalog=katalog, inkrementell=args.inkrementell, url=args.url,
+    rutnät=tuple(args.rutnat), max_samtidiga=args.samtidiga, cache_ttl_s=args.cache_ttl,
+    bbox=bbox,
+)
+for dataset, diff in diffar.items():
+    print(sammanfatta(dataset, diff))
+    if finns_ändringar(diff):
+        print(f"Filen '{FILNAMN[dataset]}' har sparats.")
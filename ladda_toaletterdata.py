@@ -1,18 +1,36 @@
-import requests
-import pandas as pd
-import json
+import argparse
+import os
+import sys
 
-query = """
-[out:json];
-node["amenity"="toilets"](57.5,11.7,57.85,12.1);
-out body;
-"""
+# Uppdateringslogiken ligger bredvid appen i streamlit_app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app"))
 
-url = "http://overpass-api.de/api/interpreter"
-response = requests.get(url, params={"data": query})
-toilets = response.json()
+from osm_uppdatering import OVERPASS_URL, finns_ändringar, sammanfatta, uppdatera
+from overpass import CACHE_TTL_S
+import regioner
 
-with open("toaletter.json", "w", encoding="utf-8") as f:
-    json.dump(toilets["elements"], f, ensure_ascii=False, indent=2)
+parser = argparse.ArgumentParser(description="Hämta toaletter från OpenStreetMap (Overpass).")
+parser.add_argument("--inkrementell", action="store_true",
+                    help="jämför med den sparade filen och skriv bara om något har ändrats")
+parser.add_argument("--fixtur", help="läs Overpass-svaret från en lokal JSON-fil i stället för att hämta det")
+parser.add_argument("--katalog",
+                    help="katalog där 'toaletter.json' ligger/sparas (standard: . eller regionens shard)")
+parser.add_argument("--region", choices=sorted(regioner.REGISTER),
+                    help="hämta inom regionens ruta (se regioner.py) i stället för Göteborgs")
+parser.add_argument("--url", default=OVERPASS_URL, help="Overpass-adress (t.ex. en lokal testserver)")
+parser.add_argument("--cache-ttl", type=int, default=CACHE_TTL_S,
+                    help="återanvänd sparade Overpass-svar som är yngre än så här många sekunder (0 = ingen cache)")
+args = parser.parse_args()
 
-print("Filen 'toaletter.json' har sparats.")
\ No newline at end of file
+bbox = regioner.REGISTER[args.region].bbox if args.region else None
+katalog = args.katalog or (regioner.shardkatalog(args.region) if args.region else ".")
+os.makedirs(katalog, exist_ok=True)
+
+diff = uppdatera("toaletter", katalog=katalog, fixtur=args.fixtur, inkrementell=args.inkrementell,
+                 url=args.url, cache_ttl_s=args.cache_ttl, bbox=bbox)
+print(sammanfatta("toaletter", diff))
+
+if finns_ändringar(diff):
+    print("Filen 'toaletter.json' har sparats.")
+else:
+    print("Inga ändringar, filen 'toaletter.json' har inte skrivits om.")
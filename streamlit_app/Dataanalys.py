@@ -1,55 +1,53 @@
+import argparse
 import pandas as pd
-import json
 import os
-from geopy.distance import geodesic
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
-
-#Laddar in data
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-#Läser in lekplatser från JSON-fil och skapar en DataFrame
-lekplats_path = os.path.join(current_dir, "lekplatser_ny.json")
-with open(lekplats_path, "r", encoding="utf-8") as f:
-    lekplatser_data = json.load(f)
-
-lekplatser_df = pd.DataFrame([{
-    'name': el.get('tags', {}).get('name', 'Okänd lekplats'),
-    'lat': el['lat'],
-    'lon': el['lon']
-} for el in lekplatser_data])
-
-#Läser in hållplatser och filtrerar på koordinater inom Göteborg
-stop_df = pd.read_csv(os.path.join(current_dir, "stops.txt"))
-stop_df = stop_df[
-    (stop_df['stop_lat'] >= 57.5) & (stop_df['stop_lat'] <= 57.85) &
-    (stop_df['stop_lon'] >= 11.7) & (stop_df['stop_lon'] <= 12.1)
-].drop_duplicates(subset='stop_name')
-stop_df = stop_df.rename(columns={'stop_lat': 'lat', 'stop_lon': 'lon'})
-
-#Läser in offentliga toaletter från JSON-fil och skapar en DataFrame
-toalett_path = os.path.join(current_dir, "toaletter.json")
-with open(toalett_path, "r", encoding="utf-8") as f:
-    toaletter_data = json.load(f)
-
-toaletter_df = pd.DataFrame([{
-    'lat': el['lat'],
-    'lon': el['lon']
-} for el in toaletter_data])
-
-#Funktion för att räkna ut närmaste avstånd från en punkt till en lista med platser
-def närmaste_avstånd(lat, lon, platser_df):
-    pos = (lat, lon)
-    return min(geodesic(pos, (r['lat'], r['lon'])).meters for _, r in platser_df.iterrows())
-
-#Lägger till kolumner i lekplatser_df med avstånd till närmaste hållplats och toalett
-lekplatser_df['dist_hållplats'] = lekplatser_df.apply(lambda row: närmaste_avstånd(row['lat'], row['lon'], stop_df), axis=1)
-lekplatser_df['dist_toalett'] = lekplatser_df.apply(lambda row: närmaste_avstånd(row['lat'], row['lon'], toaletter_df), axis=1)
-
-#Kombinerat avstånd: summan av avstånd till hållplats och toalett
-lekplatser_df['dist_kombi'] = lekplatser_df['dist_hållplats'] + lekplatser_df['dist_toalett']
+from sokindex import PunktIndex
+import gtfs
+import poi_lager
+import modellval
+import regioner
+
+#Funktion för att räkna ut närmaste avstånd från varje lekplats till en lista med platser (via spatialt index)
+def närmaste_avstånd(lekplatser_df, platser_df):
+    index = PunktIndex(platser_df['lat'], platser_df['lon'])
+    avstånd, _ = index.närmaste(lekplatser_df['lat'], lekplatser_df['lon'], k=1, exakt=True)
+    return avstånd[:, 0]
+
+#Laddar in data för en region (Göteborg: filerna bredvid skriptet, annars regionens shard, se regioner.py)
+#Körs bara från huvudblocket så att processpoolens arbetsprocesser inte läser om allt
+#när de importerar modulen (spawn)
+def läs_data(region_id=regioner.STANDARDREGION):
+    region = regioner.hämta(region_id)
+    katalog = regioner.datakatalog(region_id)
+    förberäknat = regioner.förberäknat_katalog(region_id)
+
+    #Läser in lekplatser (kompakt kolumnformat, se poi_lager.py) och skapar en DataFrame
+    lekplatser_data = poi_lager.ladda_poi(os.path.join(katalog, "lekplatser_ny.json"), förberäknat)
+
+    lekplatser_df = pd.DataFrame({
+        'name': lekplatser_data.kolumn('name', saknas='Okänd lekplats'),
+        'lat': lekplatser_data.lat,
+        'lon': lekplatser_data.lon
+    })
+
+    #Läser in hållplatser och filtrerar på koordinater inom regionens ruta (strömmande, se gtfs.py)
+    stop_df = gtfs.läs_hållplatser(os.path.join(katalog, "stops.txt"), bbox=region.bbox)
+
+    #Läser in offentliga toaletter och skapar en DataFrame
+    toaletter_data = poi_lager.ladda_poi(os.path.join(katalog, "toaletter.json"), förberäknat)
+
+    toaletter_df = pd.DataFrame({
+        'lat': toaletter_data.lat,
+        'lon': toaletter_data.lon
+    })
+
+    #Lägger till kolumner i lekplatser_df med avstånd till närmaste hållplats och toalett
+    lekplatser_df['dist_hållplats'] = närmaste_avstånd(lekplatser_df, stop_df)
+    lekplatser_df['dist_toalett'] = närmaste_avstånd(lekplatser_df, toaletter_df)
+
+    #Kombinerat avstånd: summan av avstånd till hållplats och toalett
+    lekplatser_df['dist_kombi'] = lekplatser_df['dist_hållplats'] + lekplatser_df['dist_toalett']
+    return lekplatser_df
 
 #Klusteranalys med olika features
 features_dict = {
@@ -58,34 +56,62 @@ features_dict = {
     'Kombinerat': ['dist_hållplats', 'dist_toalett']
 }
 
-for feature_name, cols in features_dict.items():
-    print(f"\n==== {feature_name.upper()} ====")
-
-    X = lekplatser_df[cols].copy()
-    X_scaled = StandardScaler().fit_transform(X)
-
-    inertias = []
-    silhouettes = []
-    ks = range(2, 11)
-
-    for k in ks:
-        kmeans = KMeans(n_clusters=k, n_init="auto", random_state=0)
-        cluster_labels = kmeans.fit_predict(X_scaled)
-        inertias.append(kmeans.inertia_)
-        silhouette_avg = silhouette_score(X_scaled, cluster_labels)
-        silhouettes.append(silhouette_avg)
-
-    #Plotting
-    plt.figure()
-    plt.plot(ks, inertias, marker='o')
-    plt.title(f'Elbow-plot för {feature_name}')
-    plt.xlabel('Antal kluster (k)')
-    plt.ylabel('Inertia')
-
-    plt.figure()
-    plt.plot(ks, silhouettes, marker='o', color='green')
-    plt.title(f'Silhouette-värden för {feature_name}')
-    plt.xlabel('Antal kluster (k)')
-    plt.ylabel('Silhouette score')
-
-plt.show()
\ No newline at end of file
+
+#Ritar elbow- och silhouette-plot per featureset från svepets resultat
+def plotta(resultat):
+    import matplotlib.pyplot as plt
+
+    for feature_name in features_dict:
+        rader = [r for r in resultat if r['featureset'] == feature_name]
+        ks = [r['k'] for r in rader]
+
+        plt.figure()
+        plt.plot(ks, [r['inertia'] for r in rader], marker='o')
+        plt.title(f'Elbow-plot för {feature_name}')
+        plt.xlabel('Antal kluster (k)')
+        plt.ylabel('Inertia')
+
+        plt.figure()
+        plt.plot(ks, [r['silhouette'] for r in rader], marker='o', color='green')
+        plt.title(f'Silhouette-värden för {feature_name}')
+        plt.xlabel('Antal kluster (k)')
+        plt.ylabel('Silhouette score')
+
+    plt.show()
+
+
+#Processpoolen kräver att svepet bara startas när skriptet körs direkt
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Välj antal kluster (k) för lekplatsernas avståndsdata.")
+    parser.add_argument("--rapport", default="dataanalys_rapport.json",
+                        help="sökväg för rapporten, .json eller .csv")
+    parser.add_argument("--headless", action="store_true", help="skriv bara rapporten, visa inga plottar")
+    parser.add_argument("--processer", type=int, default=None, help="antal arbetsprocesser (standard: alla kärnor)")
+    parser.add_argument("--inget-tidigt-stopp", action="store_true", help="svep alltid alla k = 2..10")
+    parser.add_argument("--minibatch", action="store_true", help="MiniBatchKMeans i stället för KMeans (stora datamängder)")
+    parser.add_argument("--region", default=regioner.STANDARDREGION, help="region (se regioner.py), t.ex. stockholm")
+    args = parser.parse_args()
+
+    lekplatser_df = läs_data(args.region)
+
+    resultat = modellval.svep(
+        {namn: lekplatser_df[cols].values for namn, cols in features_dict.items()},
+        ks=range(2, 11),
+        max_processer=args.processer,
+        tolerans=0.0 if args.inget_tidigt_stopp else 0.05,
+        backend="minibatch" if args.minibatch else "kmeans",
+    )
+
+    for feature_name in features_dict:
+        print(f"\n==== {feature_name.upper()} ====")
+        for r in resultat:
+            if r['featureset'] == feature_name:
+                print(f"k={r['k']:<3} inertia={r['inertia']:.2f}  silhouette={r['silhouette']:.3f}  "
+                      f"calinski_harabasz={r['calinski_harabasz']:.1f}")
+
+    modellval.skriv_rapport(resultat, args.rapport)
+    print(f"\nBästa k enligt silhouette: {modellval.bästa_k(resultat)}")
+    print(f"Rapporten har sparats i '{args.rapport}'.")
+
+    if not args.headless:
+        plotta(resultat)
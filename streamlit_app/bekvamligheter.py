@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+
+# --- Register över bekvämligheter som lekplatserna mäts mot ---
+# Varje lager (hållplatser, toaletter, bänkar, ...) beskrivs en gång här: datafil,
+# avståndskolumn i lekplatstabellen och hur det visas på kartan. Klustring, popups,
+# legend och karta går igenom registret i stället för att ha en kodväg per lager, så
+# ett nytt lager kräver bara en ny post (och en fil, t.ex. från ladda_osmdata.py).
+#
+# Hållplatser och toaletter ingår i de förberäknade avstånden (forberakning.py). Övriga
+# lager räknas ut av Avståndsmotor, som har ett spatialt index per lager och svarar för
+# alla lager i ett anrop.
+#
+# Registret läses innan appen har ritat sidopanelen, så modulen importerar bara NumPy;
+# pandas, inläsningen och sökindexet importeras i de funktioner som använder dem.
+
+
+class Lager:
+    def __init__(self, namn, fil, kolumn, etikett, popuptext, ikon, symbol, format="osm"):
+        self.namn = namn            # nyckel i registret, samma som i osm_uppdatering.FILNAMN
+        self.fil = fil              # filnamn bredvid appen
+        self.kolumn = kolumn        # avståndskolumn i lekplatstabellen
+        self.etikett = etikett      # "hållplats" -> "max 5 min till hållplats" i legenden
+        self.popuptext = popuptext  # "till närmaste hållplats" i lekplatsernas popup
+        self.ikon = ikon            # Font Awesome-ikon på kartan
+        self.symbol = symbol        # symbol i legenden
+        self.format = format        # "gtfs" (stops.txt) eller "osm" (OSM-JSON)
+
+
+REGISTER = {}
+
+
+def registrera(lager):
+    REGISTER[lager.namn] = lager
+    return lager
+
+
+registrera(Lager('hållplatser', "stops.txt", 'avstånd_m', "hållplats", "till närmaste hållplats",
+                 'bus', "🔵", format="gtfs"))
+registrera(Lager('toaletter', "toaletter.json", 'avstånd_toalett', "toalett", "till toalett",
+                 'restroom', "🚻"))
+registrera(Lager('bänkar', "bankar.json", 'avstånd_bänk', "bänk", "till närmaste bänk", 'chair', "🪑"))
+registrera(Lager('kaféer', "kafeer.json", 'avstånd_kafé', "kafé", "till närmaste kafé", 'coffee', "☕"))
+registrera(Lager('dricksvatten', "dricksvatten.json", 'avstånd_dricksvatten', "dricksvatten",
+                 "till närmaste dricksvatten", 'tint', "🚰"))
+
+# Lager som finns i de förberäknade avstånden
+FÖRBERÄKNADE = ('hållplatser', 'toaletter')
+
+# Klustringsvalen i appen och vilka lager de klustrar på
+KLUSTRINGSVAL = {
+    "Hållplatsavstånd": ('hållplatser',),
+    "Toalettavstånd": ('toaletter',),
+    "Både hållplats + toalett": ('hållplatser', 'toaletter'),
+}
+
+
+# --- Lagren för ett klustringsval, eller ett eget urval (lista med lagernamn) ---
+def urval_för(klustringsval):
+    if isinstance(klustringsval, str):
+        return KLUSTRINGSVAL[klustringsval]
+    urval = tuple(klustringsval)
+    okända = [namn for namn in urval if namn not in REGISTER]
+    if okända or not urval:
+        raise ValueError(f"Okända eller inga lager {okända}, välj bland {list(REGISTER)}")
+    return urval
+
+
+def kolumner(urval):
+    return [REGISTER[namn].kolumn for namn in urval]
+
+
+# --- Lager vars datafil finns i katalogen ---
+def tillgängliga(katalog):
+    return [namn for namn, lager in REGISTER.items() if os.path.exists(os.path.join(katalog, lager.fil))]
+
+
+# --- Läs ett lagers punkter som DataFrame med lat/lon ---
+def ladda(namn, katalog, poi_katalog=None):
+    import pandas as pd
+
+    import forberakning
+    import poi_lager
+
+    lager = REGISTER[namn]
+    sökväg = os.path.join(katalog, lager.fil)
+    if lager.format == "gtfs":
+        return forberakning.läs_hållplatser(sökväg)
+    tabell = poi_lager.ladda_poi(sökväg, poi_katalog or forberakning.STANDARDKATALOG)
+    return pd.DataFrame({'lat': np.asarray(tabell.lat, dtype='f4'), 'lon': np.asarray(tabell.lon, dtype='f4')})
+
+
+# --- Närmaste punkt i alla lager för många lekplatser i taget ---
+# punktlager: {lagernamn: DataFrame med lat/lon}. Indexen byggs första gången ett lager
+# efterfrågas och delas sedan av alla anrop.
+class Avståndsmotor:
+    def __init__(self, punktlager):
+        self.punktlager = punktlager
+        self._index = {}
+
+    def index(self, namn):
+        if namn not in self._index:
+            from sokindex import PunktIndex
+            punkter = self.punktlager[namn]
+            self._index[namn] = PunktIndex(punkter['lat'], punkter['lon'])
+        return self._index[namn]
+
+    # --- {lagernamn: (avstånd i meter, index i lagret)} för varje lekplats ---
+    def närmaste(self, lat, lon, lager=None, exakt=True):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        resultat = {}
+        for namn in lager or self.punktlager:
+            if len(self.punktlager[namn]) == 0:
+                resultat[namn] = (np.full(len(lat), np.inf), np.full(len(lat), -1))
+                continue
+            avstånd, index = self.index(namn).närmaste(lat, lon, k=1, exakt=exakt)
+            resultat[namn] = (avstånd[:, 0], index[:, 0])
+        return resultat
+
+    # --- Lekplatstabellen med en avståndskolumn (float32) per lager; indata ändras inte ---
+    def lägg_till_kolumner(self, lekplatser, lager=None):
+        return lekplatser.assign(**{
+            REGISTER[namn].kolumn: avstånd.astype('f4')
+            for namn, (avstånd, _) in self.närmaste(lekplatser['lat'], lekplatser['lon'], lager).items()
+        })
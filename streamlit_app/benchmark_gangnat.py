@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import forberakning
+from benchmark_poi import _maxrss_mb
+from gatunat import Gångnät
+
+# --- Mät byggtid och minne för gatunätet och avståndsfälten ---
+# Kör: python benchmark_gangnat.py utdrag.osm.bz2    (ett riktigt OSM-utdrag, t.ex. hela Göteborg)
+#  eller python benchmark_gangnat.py --syntetiskt 700  (rutnät med 700×700 noder över Göteborgsrutan)
+
+
+def skriv_syntetiskt_rutnät(sökväg, sida):
+    lat = np.linspace(57.5, 57.85, sida)
+    lon = np.linspace(11.7, 12.1, sida)
+    with open(sökväg, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='UTF-8'?>\n<osm version='0.6'>\n")
+        for i in range(sida):
+            for j in range(sida):
+                f.write(f"<node id='{i * sida + j + 1}' lat='{lat[i]:.7f}' lon='{lon[j]:.7f}'/>\n")
+        väg_id = 1
+        for i in range(sida):
+            for rad, steg in ((i * sida, 1), (i, sida)):  # en väg per rad och per kolumn
+                noder = "".join(f"<nd ref='{rad + j * steg + 1}'/>" for j in range(sida))
+                f.write(f"<way id='{väg_id}'>{noder}<tag k='highway' v='residential'/></way>\n")
+                väg_id += 1
+        f.write("</osm>\n")
+
+
+def main(osm_fil):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    hållplatser = forberakning.läs_hållplatser(os.path.join(current_dir, "stops.txt"))
+    toaletter = forberakning.läs_osm_json(os.path.join(current_dir, "toaletter.json"))
+    lekplatser = forberakning.läs_osm_json(os.path.join(current_dir, "lekplatser_ny.json"))
+
+    start = time.perf_counter()
+    nät = Gångnät.från_osm(osm_fil)
+    byggtid = time.perf_counter() - start
+    grafstorlek = sum(a.nbytes for a in (nät.lat, nät.lon, nät.kant_från, nät.kant_till, nät.kant_längd))
+
+    start = time.perf_counter()
+    fält_h = nät.avståndsfält(hållplatser['lat'], hållplatser['lon'])
+    fält_t = nät.avståndsfält([el['lat'] for el in toaletter], [el['lon'] for el in toaletter])
+    dijkstratid = time.perf_counter() - start
+
+    lek_lat = np.array([el['lat'] for el in lekplatser])
+    lek_lon = np.array([el['lon'] for el in lekplatser])
+    start = time.perf_counter()
+    fält_h.slå_upp(lek_lat, lek_lon)
+    fält_t.slå_upp(lek_lat, lek_lon)
+    uppslagstid = time.perf_counter() - start
+
+    print(f"OSM-fil            {os.path.getsize(osm_fil) / 1e6:.1f} MB")
+    print(f"noder / kanter     {len(nät):,} / {len(nät.kant_längd):,}")
+    print(f"bygga graf         {byggtid:.2f} s ({grafstorlek / 1e6:.1f} MB arrayer)")
+    print(f"2 avståndsfält     {dijkstratid:.2f} s ({len(hållplatser)} hållplatser, {len(toaletter)} toaletter)")
+    print(f"slå upp lekplatser {uppslagstid * 1000:.1f} ms för {len(lekplatser)} lekplatser")
+    print(f"max RSS            {_maxrss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--syntetiskt":
+        with tempfile.TemporaryDirectory() as tmp:
+            osm_fil = os.path.join(tmp, "rutnät.osm")
+            skriv_syntetiskt_rutnät(osm_fil, int(sys.argv[2]))
+            main(osm_fil)
+    else:
+        main(sys.argv[1])
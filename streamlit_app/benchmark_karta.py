@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+import forberakning
+import kartlager
+
+# --- Jämför kartrenderingen: en markör per rad ("markörer") mot GeoJSON-lager ("bulk") ---
+# Mäter tid för att bygga kartan och serialisera den till HTML, samt HTML-storleken.
+# Kör: python benchmark_karta.py [skalfaktor]   (skalfaktor > 1 upprepar hållplatserna)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+skalfaktor = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+lekplats_fil = os.path.join(current_dir, "lekplatser_ny.json")
+hållplats_fil = os.path.join(current_dir, "stops.txt")
+toalett_fil = os.path.join(current_dir, "toaletter.json")
+
+lekplatser_data = forberakning.läs_osm_json(lekplats_fil)
+förberäknat = forberakning.ladda_avstånd(lekplats_fil, hållplats_fil, toalett_fil)
+lekplatser = pd.DataFrame({
+    'name': [el.get('tags', {}).get('name', 'Okänd lekplats') for el in lekplatser_data],
+    'lat': [el['lat'] for el in lekplatser_data],
+    'lon': [el['lon'] for el in lekplatser_data],
+    'avstånd_m': förberäknat['avstånd_m'],
+    'avstånd_toalett': förberäknat['avstånd_toalett'],
+})
+lekplatser['färg'] = 'green'
+
+hållplatser = forberakning.läs_hållplatser(hållplats_fil)
+hållplatser = pd.concat([hållplatser] * skalfaktor, ignore_index=True)
+toaletter = pd.DataFrame(forberakning.läs_osm_json(toalett_fil))
+
+
+def bygg_karta(läge):
+    karta = kartlager.skapa_karta([57.7, 11.97], zoom_start=12, läge=läge)
+    kartlager.lägg_till_ikoner(
+        karta, lekplatser['lat'], lekplatser['lon'], lekplatser['färg'],
+        kartlager.lekplats_popups(lekplatser, "Både hållplats + toalett"), ikon='child', läge=läge
+    )
+    kartlager.lägg_till_hållplatser(karta, hållplatser, läge=läge)
+    kartlager.lägg_till_ikoner(
+        karta, toaletter['lat'], toaletter['lon'], ['gray'] * len(toaletter),
+        ["Toalett"] * len(toaletter), ikon='restroom', läge=läge
+    )
+    return karta
+
+
+print(f"{len(lekplatser)} lekplatser, {len(hållplatser)} hållplatser, {len(toaletter)} toaletter\n")
+print(f"{'läge':<10}{'bygga (s)':>12}{'rendera (s)':>14}{'HTML (kB)':>12}")
+for läge in reversed(kartlager.LÄGEN):
+    start = time.perf_counter()
+    karta = bygg_karta(läge)
+    byggtid = time.perf_counter() - start
+
+    start = time.perf_counter()
+    html = karta.get_root().render()
+    renderingstid = time.perf_counter() - start
+
+    print(f"{läge:<10}{byggtid:>12.3f}{renderingstid:>14.3f}{len(html.encode('utf-8')) / 1024:>12.0f}")
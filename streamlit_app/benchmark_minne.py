@@ -0,0 +1,77 @@
+import argparse
+import gc
+import json
+import os
+import sys
+
+import matning
+import pipeline
+from benchmark_poi import _maxrss_mb
+
+# --- Minne per session ---
+# Kör appen i flera sessioner i samma process (Streamlits AppTest, som i en riktig server
+# där alla sessioner delar cache_resource) och skriver processens RSS före första sessionen,
+# efter första och efter sista, samt ökningen per extra session. Sessionerna hålls öppna
+# så att det de behåller räknas med. Tabellernas storlek (pandas memory_usage) skrivs också.
+# Kör: python benchmark_minne.py [--sessioner 10] [--json minne.json]
+
+
+def tabellstorlek_mb(lekplats_fil, hållplats_fil, toalett_fil):
+    lekplatser, hållplatser, toaletter = pipeline.förbered(lekplats_fil, hållplats_fil, toalett_fil)
+    return {
+        namn: tabell.memory_usage(deep=True).sum() / 1e6
+        for namn, tabell in (('lekplatser', lekplatser), ('hållplatser', hållplatser), ('toaletter', toaletter))
+    }
+
+
+def mät_sessioner(app_fil, antal, hållplats=None):
+    from streamlit.testing.v1 import AppTest
+
+    gc.collect()
+    rss = [matning.rss_mb()]
+    sessioner = []
+    for _ in range(antal):
+        session = AppTest.from_file(app_fil, default_timeout=600).run()
+        if hållplats is not None:
+            session.selectbox(key="hållplats").set_value(hållplats).run()
+        sessioner.append(session)
+        gc.collect()
+        rss.append(matning.rss_mb())
+    return {
+        'sessioner': antal,
+        'rss_före_mb': rss[0],
+        'rss_första_mb': rss[1],
+        'rss_sista_mb': rss[-1],
+        'mb_per_extra_session': (rss[-1] - rss[1]) / (antal - 1) if antal > 1 else None,
+        'max_rss_mb': _maxrss_mb(),
+    }
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Mät appens minne (RSS) per session")
+    parser.add_argument("--sessioner", type=int, default=10)
+    parser.add_argument("--hallplats", default="Brunnsparken", help="hållplats att filtrera på i varje session")
+    parser.add_argument("--json", help="skriv resultatet till denna fil")
+    args = parser.parse_args()
+
+    filer = [os.path.join(current_dir, namn) for namn in ("lekplatser_ny.json", "stops.txt", "toaletter.json")]
+    resultat = {
+        'tabeller_mb': tabellstorlek_mb(*filer),
+        **mät_sessioner(os.path.join(current_dir, "streamlit_app.py"), args.sessioner, args.hallplats or None),
+    }
+
+    for namn, mb in resultat['tabeller_mb'].items():
+        print(f"tabell {namn:<12}{mb:>8.3f} MB")
+    for nyckel, värde in resultat.items():
+        if nyckel != 'tabeller_mb' and värde is not None:
+            print(f"{nyckel:<21}{värde:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultat, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import forberakning
+import pipeline
+import poi_lager
+from benchmark_poi import _maxrss_mb
+
+# --- Mät hela kedjan från data till karta, steg för steg (se pipeline.py) ---
+# Varje steg körs `repetitioner` gånger och den snabbaste tiden sparas; därefter körs
+# steget en gång till under tracemalloc för toppminnet (tracemalloc gör körningen långsammare
+# och ingår därför inte i tiden). För html-steget sparas även HTML-storleken.
+#
+# Datamängder: det medföljande datat ("skala 1") och syntetiska datamängder där lekplatser och
+# toaletter upprepas med förskjutna koordinater (t.ex. --skala 1 10 100 1000). Med --gtfs används
+# ett annat GTFS-flöde (t.ex. hela Sveriges stops.txt eller en zip) i stället för stops.txt.
+#
+# Resultatet jämförs med en sparad baslinje; om något steg blivit långsammare än
+# baslinjen × tolerans avslutas skriptet med felkod 1.
+# Kör: python benchmark_pipeline.py [--skala 1 10] [--gtfs sverige.zip] [--uppdatera-baslinje]
+
+BASLINJE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baslinje.json")
+
+# Steg som går snabbare än så här jämförs inte relativt, då blir mätbruset för stort
+MARGINAL_S = 0.005
+
+# Hur långt från ursprungspunkten de syntetiska kopiorna hamnar (grader, ungefär 300 m)
+SPRIDNING = 0.003
+
+
+# --- Skriv en uppskalad kopia av en OSM-JSON-fil: unika id och slumpvis förskjutna koordinater ---
+def skala_upp(json_fil, skalfaktor, sökväg, slumpfrö=0):
+    element = forberakning.läs_osm_json(json_fil)
+    slump = np.random.default_rng(slumpfrö)
+    förskjutning = slump.normal(0, SPRIDNING, size=(skalfaktor, len(element), 2))
+    förskjutning[0] = 0  # första kopian är originalet
+    skalade = [
+        dict(el, id=el['id'] * 10_000 + i, lat=el['lat'] + förskjutning[i, j, 0], lon=el['lon'] + förskjutning[i, j, 1])
+        for i in range(skalfaktor) for j, el in enumerate(element)
+    ]
+    with open(sökväg, "w", encoding="utf-8") as f:
+        json.dump(skalade, f, ensure_ascii=False)
+    return sökväg
+
+
+# --- Stegen i den ordning appen kör dem; varje steg läser och fyller på `tillstånd` ---
+def steg_konvertering(t):
+    poi_lager.konvertera(t['lekplats_fil'], t['katalog'])
+    poi_lager.konvertera(t['toalett_fil'], t['katalog'])
+
+
+def steg_inläsning(t):
+    t['lekplatser_df'], t['stops_df'], t['toaletter_df'] = pipeline.ladda_data(
+        t['lekplats_fil'], t['hållplats_fil'], t['toalett_fil'], katalog=t['katalog']
+    )
+
+
+def steg_kombinera(t):
+    t['lekplatser'], t['hållplatser'] = pipeline.kombinera(t['lekplatser_df'], t['stops_df'])
+
+
+def steg_närmaste_avstånd(t):
+    resultat = forberakning.beräkna_avstånd(t['lekplatser_data'], t['stops_df'], t['toaletter_data'])
+    t['lekplatser'] = pipeline.lägg_till_avstånd(t['lekplatser'], resultat)
+
+
+def steg_klustring(t):
+    t['klustrade'], *t['legenddata'] = pipeline.klustra_lekplatser(t['lekplatser'], t['klustringsval'])
+
+
+def steg_radiefilter(t):
+    vald = t['vald_hållplats']
+    t['lekplatser_nära'] = pipeline.lekplatser_inom_radie(t['klustrade'], (vald['lat'], vald['lon']), t['radie'])
+
+
+def steg_karta(t):
+    t['karta'] = pipeline.bygg_karta(
+        t['klustrade'], t['hållplatser'], {'toaletter': t['toaletter_df']}, t['klustringsval'], läge=t['läge']
+    )
+
+
+def steg_karta_filtrerad(t):
+    t['karta_filtrerad'] = pipeline.bygg_karta(
+        t['klustrade'], t['hållplatser'], {'toaletter': t['toaletter_df']}, t['klustringsval'],
+        vald_hållplats=t['vald_hållplats'], lekplatser_nära=t['lekplatser_nära'], radie=t['radie'], läge=t['läge']
+    )
+
+
+def steg_html(t):
+    t['html'] = t['karta'].get_root().render()
+
+
+STEG = [
+    ("konvertering", steg_konvertering),
+    ("inläsning", steg_inläsning),
+    ("kombinera", steg_kombinera),
+    ("närmaste_avstånd", steg_närmaste_avstånd),
+    ("klustring", steg_klustring),
+    ("radiefilter", steg_radiefilter),
+    ("karta", steg_karta),
+    ("karta_filtrerad", steg_karta_filtrerad),
+    ("html", steg_html),
+]
+
+
+def mät_steg(funktion, tillstånd, repetitioner):
+    tider = []
+    for _ in range(repetitioner):
+        start = time.perf_counter()
+        funktion(tillstånd)
+        tider.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    funktion(tillstånd)
+    _, topp = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'sekunder': min(tider), 'toppminne_mb': topp / 1e6}
+
+
+# --- Kör alla steg för en datamängd ---
+def kör_datamängd(lekplats_fil, hållplats_fil, toalett_fil, katalog, repetitioner=3,
+                  klustringsval="Både hållplats + toalett", radie=1000, läge="bulk"):
+    tillstånd = {
+        'lekplats_fil': lekplats_fil, 'hållplats_fil': hållplats_fil, 'toalett_fil': toalett_fil,
+        'katalog': katalog, 'klustringsval': klustringsval, 'radie': radie, 'läge': läge,
+        'lekplatser_data': forberakning.läs_osm_json(lekplats_fil),
+        'toaletter_data': forberakning.läs_osm_json(toalett_fil),
+    }
+    resultat = {}
+    for namn, funktion in STEG:
+        if namn == "radiefilter":
+            # Filtrera runt hållplatsen mitt i listan (Brunnsparken om den finns)
+            hållplatser = tillstånd['hållplatser']
+            centrum = hållplatser[hållplatser['name'] == "Brunnsparken"]
+            tillstånd['vald_hållplats'] = centrum.iloc[0] if len(centrum) else hållplatser.iloc[len(hållplatser) // 2]
+        resultat[namn] = mät_steg(funktion, tillstånd, repetitioner)
+    resultat['html']['html_kb'] = len(tillstånd['html'].encode("utf-8")) / 1024
+    resultat['_storlek'] = {
+        'lekplatser': len(tillstånd['lekplatser']),
+        'hållplatser': len(tillstånd['hållplatser']),
+        'toaletter': len(tillstånd['toaletter_df']),
+    }
+    return resultat
+
+
+# --- Jämför med baslinjen; returnerar en lista med (datamängd, steg, tid, baslinjetid) ---
+def jämför(resultat, baslinje, tolerans):
+    regressioner = []
+    for datamängd, steg in resultat.items():
+        for namn, mått in steg.items():
+            bas = baslinje.get(datamängd, {}).get(namn)
+            if namn.startswith("_") or bas is None:
+                continue
+            if mått['sekunder'] > bas['sekunder'] * tolerans + MARGINAL_S:
+                regressioner.append((datamängd, namn, mått['sekunder'], bas['sekunder']))
+    return regressioner
+
+
+def skriv_tabell(datamängd, steg):
+    storlek = steg['_storlek']
+    print(f"\n{datamängd}: {storlek['lekplatser']} lekplatser, {storlek['hållplatser']} hållplatser, "
+          f"{storlek['toaletter']} toaletter")
+    print(f"{'steg':<20}{'tid (s)':>10}{'toppminne (MB)':>17}")
+    for namn, _ in STEG:
+        mått = steg[namn]
+        extra = f"  HTML {mått['html_kb']:.0f} kB" if 'html_kb' in mått else ""
+        print(f"{namn:<20}{mått['sekunder']:>10.4f}{mått['toppminne_mb']:>17.1f}{extra}")
+
+
+def main():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Mät stegen från data till karta")
+    parser.add_argument("--skala", type=int, nargs="+", default=[1, 10],
+                        help="skalfaktorer för lekplatser och toaletter (1 = medföljande data)")
+    parser.add_argument("--gtfs", help="annat GTFS-flöde (stops.txt eller zip) i stället för stops.txt")
+    parser.add_argument("--repetitioner", type=int, default=3)
+    parser.add_argument("--tolerans", type=float, default=1.5,
+                        help="hur mycket långsammare än baslinjen ett steg får vara")
+    parser.add_argument("--baslinje", default=BASLINJE)
+    parser.add_argument("--uppdatera-baslinje", action="store_true",
+                        help="spara resultatet som ny baslinje i stället för att jämföra")
+    parser.add_argument("--json", help="skriv resultatet till denna fil")
+    args = parser.parse_args()
+
+    hållplats_fil = args.gtfs or os.path.join(current_dir, "stops.txt")
+    gtfs_namn = os.path.basename(args.gtfs) if args.gtfs else "stops.txt"
+
+    resultat = {}
+    tmp = tempfile.mkdtemp()
+    try:
+        for skalfaktor in args.skala:
+            datamängd = f"skala_{skalfaktor}" + (f"_{gtfs_namn}" if args.gtfs else "")
+            lekplats_fil = os.path.join(current_dir, "lekplatser_ny.json")
+            toalett_fil = os.path.join(current_dir, "toaletter.json")
+            if skalfaktor > 1:
+                lekplats_fil = skala_upp(lekplats_fil, skalfaktor, os.path.join(tmp, f"lekplatser_{skalfaktor}.json"))
+                toalett_fil = skala_upp(toalett_fil, skalfaktor, os.path.join(tmp, f"toaletter_{skalfaktor}.json"))
+            resultat[datamängd] = kör_datamängd(
+                lekplats_fil, hållplats_fil, toalett_fil, os.path.join(tmp, datamängd), args.repetitioner
+            )
+            skriv_tabell(datamängd, resultat[datamängd])
+    finally:
+        shutil.rmtree(tmp)
+    print(f"\nmax RSS {_maxrss_mb():.0f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultat, f, ensure_ascii=False, indent=2)
+
+    if args.uppdatera_baslinje:
+        baslinje = {}
+        if os.path.exists(args.baslinje):
+            with open(args.baslinje, "r", encoding="utf-8") as f:
+                baslinje = json.load(f)
+        baslinje.update(resultat)
+        with open(args.baslinje, "w", encoding="utf-8") as f:
+            json.dump(baslinje, f, ensure_ascii=False, indent=2)
+        print(f"Baslinjen sparad i {args.baslinje}")
+        return 0
+
+    if not os.path.exists(args.baslinje):
+        print("Ingen baslinje att jämföra med, kör med --uppdatera-baslinje först")
+        return 0
+    with open(args.baslinje, "r", encoding="utf-8") as f:
+        baslinje = json.load(f)
+    regressioner = jämför(resultat, baslinje, args.tolerans)
+    for datamängd, namn, tid, bas in regressioner:
+        print(f"LÅNGSAMMARE: {datamängd}/{namn} {tid:.4f} s mot baslinjen {bas:.4f} s (×{tid / bas:.2f})")
+    if not regressioner:
+        print(f"Alla steg inom baslinjen × {args.tolerans}")
+    return 1 if regressioner else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import poi_lager
+
+# --- Jämför inläsning av POI-data: JSON + DataFrame per element mot kolumnformatet ---
+# Varje variant körs i en egen process så att minnesmätningen (max RSS) blir rättvis.
+# Kör: python benchmark_poi.py [skalfaktor]   (skalfaktor > 1 upprepar lekplatserna)
+
+
+def _maxrss_mb():
+    # VmHWM nollställs vid exec, till skillnad från ru_maxrss som ärvs från föräldraprocessen
+    try:
+        with open("/proc/self/status") as f:
+            for rad in f:
+                if rad.startswith("VmHWM:"):
+                    return int(rad.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss är i kB på Linux (utan /proc, t.ex. macOS, blir värdet ungefärligt)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def läs_json(json_fil):
+    with open(json_fil, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return pd.DataFrame([{
+        'name': el.get('tags', {}).get('name', 'Okänd lekplats'),
+        'lat': el['lat'],
+        'lon': el['lon'],
+    } for el in data])
+
+
+def läs_kolumnformat(json_fil, katalog):
+    tabell = poi_lager.ladda_poi(json_fil, katalog)
+    return pd.DataFrame({
+        'name': tabell.kolumn('name', saknas='Okänd lekplats'),
+        'lat': tabell.lat,
+        'lon': tabell.lon,
+    })
+
+
+# --- Körs i barnprocessen: mät en variant och skriv resultatet som JSON ---
+def mät(variant, json_fil, katalog):
+    före = _maxrss_mb()
+    start = time.perf_counter()
+    df = läs_json(json_fil) if variant == "json" else läs_kolumnformat(json_fil, katalog)
+    sekunder = time.perf_counter() - start
+    print(json.dumps({'sekunder': sekunder, 'rss_ökning_mb': _maxrss_mb() - före, 'rader': len(df)}))
+
+
+def main(skalfaktor):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(current_dir, "lekplatser_ny.json"), "r", encoding="utf-8") as f:
+        element = json.load(f)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        # Skala upp med unika id och lätt förskjutna koordinater
+        skalade = [
+            dict(el, id=el['id'] * 10_000 + i, lat=el['lat'] + i * 1e-5)
+            for i in range(skalfaktor) for el in element
+        ]
+        json_fil = os.path.join(tmp, "lekplatser.json")
+        with open(json_fil, "w", encoding="utf-8") as f:
+            json.dump(skalade, f, ensure_ascii=False, indent=2)
+        katalog = os.path.join(tmp, "poi")
+        start = time.perf_counter()
+        poi_lager.konvertera(json_fil, katalog)
+        konverteringstid = time.perf_counter() - start
+
+        print(f"{len(skalade)} lekplatser, JSON {os.path.getsize(json_fil) / 1e6:.1f} MB, "
+              f"konvertering (en gång) {konverteringstid:.2f} s\n")
+        print(f"{'variant':<14}{'inläsning (s)':>15}{'RSS-ökning (MB)':>18}")
+        for variant in ("json", "kolumnformat"):
+            utdata = subprocess.run(
+                [sys.executable, __file__, "--mät", variant, json_fil, katalog],
+                capture_output=True, text=True, check=True, cwd=current_dir
+            ).stdout
+            resultat = json.loads(utdata.strip().splitlines()[-1])
+            print(f"{variant:<14}{resultat['sekunder']:>15.4f}{resultat['rss_ökning_mb']:>18.1f}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--mät":
+        mät(*sys.argv[2:5])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
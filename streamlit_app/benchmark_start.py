@@ -0,0 +1,123 @@
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# --- Kallstart: importtid och tid till första ritning ---
+# Varje prov körs i en ny Python-process, som en nystartad replik:
+#   streamlit_s       import av streamlit (servern gör det innan appen körs)
+#   importer_s        appens importer överst i streamlit_app.py (de som körs före första ritningen)
+#   första_ritning_s  från skriptets start till att sidhuvud och sidopanel är ritade
+#   data_inläst_s     till att tabellerna är inlästa
+#   karta_klar_s      till att kartan är ritad
+# Milstolparna kommer från matning.markera i appen (körs med MATNING=1 via AppTest).
+# Medianen över proven jämförs med BUDGET; över budget avslutas skriptet med felkod 1.
+# Kör: python benchmark_start.py [--prov 5] [--json start.json]
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+
+# Sekunder (median); importer_s och första_ritning_s får inte dra in pandas, scikit-learn eller folium
+BUDGET = {
+    'importer_s': 0.3,
+    'första_ritning_s': 0.5,
+    'karta_klar_s': 8.0,
+}
+
+# Moduler som inte ska vara importerade vid första ritningen
+TUNGA_MODULER = ("pandas", "sklearn", "folium", "scipy", "geopy", "streamlit_folium")
+
+
+# --- Modulerna som streamlit_app.py importerar på toppnivå före första st-anropet ---
+def toppimporter(app_fil=APP):
+    with open(app_fil, "r", encoding="utf-8") as f:
+        träd = ast.parse(f.read())
+    moduler = []
+    for nod in träd.body:
+        if isinstance(nod, ast.Import):
+            moduler += [alias.name for alias in nod.names]
+        elif isinstance(nod, ast.ImportFrom):
+            moduler.append(nod.module)
+        elif isinstance(nod, ast.Expr):
+            break
+    return [m for m in moduler if m != "streamlit"]
+
+
+# --- Ett prov (körs i en egen process) ---
+def ett_prov(app_fil=APP):
+    sys.path.insert(0, os.path.dirname(app_fil))
+    start = time.perf_counter()
+    import streamlit  # noqa: F401
+    streamlit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for modul in toppimporter(app_fil):
+        __import__(modul)
+    importer_s = time.perf_counter() - start
+    tunga = [m for m in TUNGA_MODULER if m in sys.modules]
+
+    import matning
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["MATNING"] = "1"
+    session = AppTest.from_file(app_fil, default_timeout=600).run()
+    if session.exception:
+        raise RuntimeError(str(session.exception[0].value))
+    milstolpar = matning.SUMMERING.milstolpar
+    return {
+        'streamlit_s': streamlit_s,
+        'importer_s': importer_s,
+        'tunga_vid_import': tunga,
+        **{f"{namn}_s": sekunder for namn, sekunder in milstolpar.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mät importtid och tid till första ritning vid kallstart")
+    parser.add_argument("--prov", type=int, default=5, help="antal nystartade processer")
+    parser.add_argument("--json", help="skriv resultatet till denna fil")
+    parser.add_argument("--ett-prov", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ett_prov:
+        print(json.dumps(ett_prov(), ensure_ascii=False))
+        return 0
+
+    prov = []
+    for _ in range(args.prov):
+        utdata = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--ett-prov"],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        prov.append(json.loads(utdata.strip().splitlines()[-1]))
+
+    nycklar = [n for n in prov[0] if n.endswith("_s")]
+    median = {n: statistics.median(p[n] for p in prov if n in p) for n in nycklar}
+    tunga = sorted({m for p in prov for m in p['tunga_vid_import']})
+
+    print(f"{'mått':<20}{'median (s)':>12}{'budget (s)':>12}")
+    över = []
+    for namn, värde in median.items():
+        budget = BUDGET.get(namn)
+        print(f"{namn:<20}{värde:>12.3f}{budget if budget is not None else '':>12}")
+        if budget is not None and värde > budget:
+            över.append(namn)
+    if tunga:
+        print(f"Tunga moduler importerade före första ritningen: {', '.join(tunga)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'median': median, 'prov': prov, 'budget': BUDGET}, f, ensure_ascii=False, indent=2)
+
+    for namn in över:
+        print(f"ÖVER BUDGET: {namn} {median[namn]:.3f} s (budget {BUDGET[namn]} s)")
+    if not över and not tunga:
+        print("Inom startbudgeten")
+    return 1 if över or tunga else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
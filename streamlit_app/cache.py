@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+# --- Storleksbegränsad LRU-cache med träff-/missräknare ---
+# Delas mellan alla sessioner i samma process (skapas via st.cache_resource i appen),
+# så en användare som växlar fram och tillbaka mellan val får resultatet direkt.
+# Värdena som lagras får inte ändras av anroparen eftersom samma objekt återanvänds.
+class LRUCache:
+    def __init__(self, max_poster):
+        if max_poster < 1:
+            raise ValueError("max_poster måste vara minst 1")
+        self.max_poster = max_poster
+        self._poster = OrderedDict()
+        self._lås = threading.Lock()
+        self.träffar = 0
+        self.missar = 0
+        self.utkastade = 0
+
+    def __len__(self):
+        return len(self._poster)
+
+    def __contains__(self, nyckel):
+        return nyckel in self._poster
+
+    # --- Hämta värdet för nyckeln, eller beräkna och spara det vid miss ---
+    # Beräkningen görs utanför låset så att långsamma beräkningar inte blockerar andra sessioner.
+    def hämta(self, nyckel, beräkna):
+        with self._lås:
+            if nyckel in self._poster:
+                self._poster.move_to_end(nyckel)
+                self.träffar += 1
+                return self._poster[nyckel]
+            self.missar += 1
+
+        värde = beräkna()
+
+        with self._lås:
+            self._poster[nyckel] = värde
+            self._poster.move_to_end(nyckel)
+            while len(self._poster) > self.max_poster:
+                self._poster.popitem(last=False)
+                self.utkastade += 1
+        return värde
+
+    def töm(self):
+        with self._lås:
+            self._poster.clear()
+
+    def statistik(self):
+        with self._lås:
+            anrop = self.träffar + self.missar
+            return {
+                'poster': len(self._poster),
+                'max_poster': self.max_poster,
+                'träffar': self.träffar,
+                'missar': self.missar,
+                'utkastade': self.utkastade,
+                'träffgrad': self.träffar / anrop if anrop else 0.0,
+            }
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+import gtfs
+
+# --- Förberäknade avstånd ---
+# Avstånd från varje lekplats till närmaste hållplats och toalett räknas ut en gång
+# (offline via bygg_avstand.py eller automatiskt vid första start) och sparas som en
+# .npy-fil. Filnamnet innehåller avståndsslaget (fågelväg eller gångnät) och en hash av
+# indatafilerna, så en ny fil byggs bara när någon av dem har ändrats, och de två slagen
+# kan ligga kvar sida vid sida när man växlar mellan dem. Appen läser filen minnesmappad i stället för att räkna om.
+# Om ett OSM-utdrag med gatunätet anges blir avstånden gångavstånd (se gatunat.py).
+#
+# gatunat (scipy) och sokindex (scikit-learn) importeras först när en artefakt ska byggas,
+# så att appen bara behöver NumPy för att läsa en färdig artefakt.
+
+# Höj versionen om beräkningen eller fälten ändras så att gamla filer byggs om
+ARTEFAKT_VERSION = 2
+
+GÅNGHASTIGHET_M_PER_MIN = 83  # 5 km/h
+
+ARTEFAKT_DTYPE = np.dtype([
+    ('lekplats_id', 'i8'),
+    ('avstånd_m', 'f8'),
+    ('hållplats_id', 'U32'),
+    ('gångtid_hållplats_min', 'i2'),
+    ('avstånd_toalett', 'f8'),
+    ('toalett_id', 'i8'),
+    ('gångtid_toalett_min', 'i2'),
+])
+
+NYCKELLÄNGD = 16
+
+STANDARDKATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forberaknat")
+
+
+# --- Läs lekplatser/toaletter (OSM-JSON) ---
+def läs_osm_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# --- Läs hållplatser och filtrera på koordinater inom Göteborg ---
+def läs_hållplatser(file_path):
+    return gtfs.läs_hållplatser(file_path)
+
+
+# --- Hash av indatafilernas innehåll (plus formatversion) ---
+def innehållshash(*sökvägar, version=ARTEFAKT_VERSION):
+    h = hashlib.sha256(f"v{version}".encode())
+    for sökväg in sökvägar:
+        with open(sökväg, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:NYCKELLÄNGD]
+
+
+# --- Filerna <stam>_<nyckel><ändelse> i katalogen, där nyckel är en innehållshash ---
+# Mönstret matchar exakt, så att filer med längre stam (lekplatser_ny_...) och andra
+# processers temporära filer (....tmp) inte räknas som äldre versioner.
+def filer_med_nyckel(katalog, stam, ändelse=""):
+    mönster = re.compile(rf"{re.escape(stam)}_[0-9a-f]{{{NYCKELLÄNGD}}}{re.escape(ändelse)}")
+    namn = os.listdir(katalog) if os.path.isdir(katalog) else []
+    return [os.path.join(katalog, n) for n in sorted(namn) if mönster.fullmatch(n)]
+
+
+# --- Ta bort äldre versioner av en fil (samma stam, annan nyckel) ---
+# En annan process kan hinna ta bort samma fil, det är inget fel.
+def ta_bort_äldre(sökväg, stam, ändelse=""):
+    for gammal in filer_med_nyckel(os.path.dirname(sökväg), stam, ändelse):
+        if gammal != sökväg:
+            try:
+                os.remove(gammal)
+            except FileNotFoundError:
+                pass
+
+
+def _indatafiler(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil=None):
+    return (lekplats_fil, hållplats_fil, toalett_fil) + ((gångnät_fil,) if gångnät_fil else ())
+
+
+def _artefaktstam(gångnät=False):
+    return "avstand_gangnat" if gångnät else "avstand_fagelvag"
+
+
+def artefakt_sökväg(nyckel, katalog=STANDARDKATALOG, gångnät=False):
+    return os.path.join(katalog, f"{_artefaktstam(gångnät)}_{nyckel}.npy")
+
+
+def gångtid_minuter(meter):
+    return np.rint(np.asarray(meter) / GÅNGHASTIGHET_M_PER_MIN).astype('i2')
+
+
+# --- Läs gatunätet för gångavstånd, med en cachad .npz bredvid artefakterna ---
+def ladda_gångnät(osm_fil, katalog=STANDARDKATALOG):
+    from gatunat import Gångnät
+    sökväg = os.path.join(katalog, f"gangnat_{innehållshash(osm_fil, version='gångnät1')}.npz")
+    if os.path.exists(sökväg):
+        return Gångnät.ladda(sökväg)
+    nät = Gångnät.från_osm(osm_fil)
+    os.makedirs(katalog, exist_ok=True)
+    tmp = f"{sökväg}.{os.getpid()}.tmp.npz"
+    nät.spara(tmp)
+    os.replace(tmp, sökväg)
+    return nät
+
+
+# --- Närmaste punkt för varje lekplats: fågelväg, eller gångavstånd om ett gatunät anges ---
+# Lekplatser som inte når någon punkt via nätet (t.ex. utanför utdraget) får fågelvägen.
+def _närmaste(lek_lat, lek_lon, lat, lon, gångnät=None):
+    from sokindex import PunktIndex
+    index = PunktIndex(lat, lon)
+    avstånd, närmaste = index.närmaste(lek_lat, lek_lon, k=1, exakt=True)
+    avstånd, närmaste = avstånd[:, 0], närmaste[:, 0]
+    if gångnät is None:
+        return avstånd, närmaste
+
+    nät_avstånd, nät_närmaste = gångnät.avståndsfält(lat, lon).slå_upp(lek_lat, lek_lon)
+    nåbar = np.isfinite(nät_avstånd)
+    return np.where(nåbar, nät_avstånd, avstånd), np.where(nåbar, nät_närmaste, närmaste)
+
+
+# --- Räkna ut avstånden för alla lekplatser ---
+def beräkna_avstånd(lekplatser_data, hållplatser, toaletter_data, gångnät=None):
+    lek_lat = np.array([el['lat'] for el in lekplatser_data], dtype=float)
+    lek_lon = np.array([el['lon'] for el in lekplatser_data], dtype=float)
+
+    avstånd_h, närmaste_h = _närmaste(lek_lat, lek_lon, hållplatser['lat'], hållplatser['lon'], gångnät)
+    avstånd_t, närmaste_t = _närmaste(
+        lek_lat, lek_lon,
+        [el['lat'] for el in toaletter_data], [el['lon'] for el in toaletter_data], gångnät
+    )
+
+    resultat = np.empty(len(lekplatser_data), dtype=ARTEFAKT_DTYPE)
+    resultat['lekplats_id'] = [el['id'] for el in lekplatser_data]
+    resultat['avstånd_m'] = avstånd_h
+    resultat['hållplats_id'] = hållplatser['stop_id'].astype(str).to_numpy()[närmaste_h]
+    resultat['gångtid_hållplats_min'] = gångtid_minuter(avstånd_h)
+    resultat['avstånd_toalett'] = avstånd_t
+    resultat['toalett_id'] = np.array([el['id'] for el in toaletter_data])[närmaste_t]
+    resultat['gångtid_toalett_min'] = gångtid_minuter(avstånd_t)
+    return resultat
+
+
+# --- Skriv artefakten till disk ---
+# Skriver först till en temporär fil så att en samtidig läsare aldrig ser en halvskriven fil.
+def _skriv_artefakt(resultat, nyckel, katalog, gångnät=False):
+    os.makedirs(katalog, exist_ok=True)
+    sökväg = artefakt_sökväg(nyckel, katalog, gångnät)
+    tmp = f"{sökväg}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, resultat)
+    os.replace(tmp, sökväg)
+
+    # Ta bort gamla artefakter av samma slag som byggts från tidigare versioner av indata,
+    # och artefakter från före uppdelningen i slag (avstand_<nyckel>.npy)
+    ta_bort_äldre(sökväg, _artefaktstam(gångnät), ".npy")
+    ta_bort_äldre(sökväg, "avstand", ".npy")
+    return sökväg
+
+
+# --- Bygg artefakten från början ---
+# Med gångnät_fil (ett OSM-utdrag) blir avstånden gångavstånd längs gatunätet i stället för fågelväg.
+def bygg_artefakt(lekplats_fil, hållplats_fil, toalett_fil, katalog=STANDARDKATALOG, gångnät_fil=None):
+    nyckel = innehållshash(*_indatafiler(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil))
+    gångnät = ladda_gångnät(gångnät_fil, katalog) if gångnät_fil else None
+    resultat = beräkna_avstånd(
+        läs_osm_json(lekplats_fil), läs_hållplatser(hållplats_fil), läs_osm_json(toalett_fil), gångnät
+    )
+    return _skriv_artefakt(resultat, nyckel, katalog, gångnät=bool(gångnät_fil))
+
+
+# --- Uppdatera en befintlig artefakt efter en inkrementell OSM-uppdatering ---
+# gammal_nyckel är hashen för indatafilerna innan de skrevs om. Diffarna kommer från
+# osm_uppdatering.diffa. Bara tillagda/flyttade lekplatser räknas om helt; för övriga
+# räknas toalettavståndet om bara om deras närmaste toalett har tagits bort/flyttats,
+# eller om en ny/flyttad toalett ligger närmare. Saknas den gamla artefakten byggs allt om.
+# Returnerar (sökväg, antal lekplatser vars avstånd räknades om helt).
+# Gäller fågelvägsavstånden; med gatunät byggs artefakten om helt vid nästa ladda_avstånd.
+def uppdatera_artefakt(lekplats_fil, hållplats_fil, toalett_fil, gammal_nyckel,
+                       lekplats_diff=None, toalett_diff=None, katalog=STANDARDKATALOG):
+    nyckel = innehållshash(lekplats_fil, hållplats_fil, toalett_fil)
+    if os.path.exists(artefakt_sökväg(nyckel, katalog)):
+        return artefakt_sökväg(nyckel, katalog), 0
+    gammal_sökväg = artefakt_sökväg(gammal_nyckel, katalog)
+    if not os.path.exists(gammal_sökväg):
+        return bygg_artefakt(lekplats_fil, hållplats_fil, toalett_fil, katalog), len(läs_osm_json(lekplats_fil))
+
+    from sokindex import PunktIndex
+    gammal = np.load(gammal_sökväg)
+    lekplatser_data = läs_osm_json(lekplats_fil)
+    toaletter_data = läs_osm_json(toalett_fil)
+    lekplats_diff = lekplats_diff or {}
+    toalett_diff = toalett_diff or {}
+
+    # Återanvänd gamla rader (i den nya filens ordning) för lekplatser som inte flyttats
+    gamla_rader = {int(id_): i for i, id_ in enumerate(gammal['lekplats_id'])}
+    räkna_om = set(lekplats_diff.get('tillagda', [])) | set(lekplats_diff.get('flyttade', []))
+    resultat = np.empty(len(lekplatser_data), dtype=ARTEFAKT_DTYPE)
+    helt_ny = np.zeros(len(lekplatser_data), dtype=bool)
+    for i, el in enumerate(lekplatser_data):
+        if el['id'] in gamla_rader and el['id'] not in räkna_om:
+            resultat[i] = gammal[gamla_rader[el['id']]]
+        else:
+            helt_ny[i] = True
+
+    if helt_ny.any():
+        resultat[helt_ny] = beräkna_avstånd(
+            [el for el, ny in zip(lekplatser_data, helt_ny) if ny],
+            läs_hållplatser(hållplats_fil), toaletter_data
+        )
+
+    # Toalettändringar påverkar bara de lekplatser som de kan vara närmast
+    lek_lat = np.array([el['lat'] for el in lekplatser_data], dtype=float)
+    lek_lon = np.array([el['lon'] for el in lekplatser_data], dtype=float)
+    toalett_id = np.array([el['id'] for el in toaletter_data])
+    försvunna = list(toalett_diff.get('borttagna', [])) + list(toalett_diff.get('flyttade', []))
+    tappat_närmaste = ~helt_ny & np.isin(resultat['toalett_id'], försvunna)
+    if tappat_närmaste.any():
+        index = PunktIndex([el['lat'] for el in toaletter_data], [el['lon'] for el in toaletter_data])
+        avstånd, närmaste = index.närmaste(lek_lat[tappat_närmaste], lek_lon[tappat_närmaste], k=1, exakt=True)
+        resultat['avstånd_toalett'][tappat_närmaste] = avstånd[:, 0]
+        resultat['toalett_id'][tappat_närmaste] = toalett_id[närmaste[:, 0]]
+
+    nya_toaletter = set(toalett_diff.get('tillagda', [])) | set(toalett_diff.get('flyttade', []))
+    if nya_toaletter:
+        nya = [el for el in toaletter_data if el['id'] in nya_toaletter]
+        index = PunktIndex([el['lat'] for el in nya], [el['lon'] for el in nya])
+        avstånd, närmaste = index.närmaste(lek_lat, lek_lon, k=1, exakt=True)
+        närmare = ~helt_ny & (avstånd[:, 0] < resultat['avstånd_toalett'])
+        resultat['avstånd_toalett'][närmare] = avstånd[närmare, 0]
+        resultat['toalett_id'][närmare] = np.array([el['id'] for el in nya])[närmaste[närmare, 0]]
+    resultat['gångtid_toalett_min'] = gångtid_minuter(resultat['avstånd_toalett'])
+
+    return _skriv_artefakt(resultat, nyckel, katalog), int(helt_ny.sum())
+
+
+# --- Läs artefakten minnesmappad, bygg om den först om indata har ändrats ---
+def ladda_avstånd(lekplats_fil, hållplats_fil, toalett_fil, katalog=STANDARDKATALOG, gångnät_fil=None):
+    nyckel = innehållshash(*_indatafiler(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil))
+    sökväg = artefakt_sökväg(nyckel, katalog, gångnät=bool(gångnät_fil))
+    if not os.path.exists(sökväg):
+        sökväg = bygg_artefakt(lekplats_fil, hållplats_fil, toalett_fil, katalog, gångnät_fil)
+    return np.load(sökväg, mmap_mode='r')
@@ -0,0 +1,169 @@
+import bz2
+import gzip
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from avstand import radvisa_avstånd
+from sokindex import PunktIndex
+
+# --- Gångavstånd längs gatunätet ---
+# Läser ett lokalt OSM-utdrag (XML, .osm/.osm.bz2/.osm.gz) och bygger en graf över
+# vägar man kan gå på. Från alla hållplatser (eller toaletter) körs en Dijkstra med
+# flera startpunkter samtidigt, vilket ger gångavståndet till närmaste startpunkt för
+# varje nod i grafen. En lekplats slås sedan upp genom att knyta den till närmaste nod.
+
+# Vägtyper som inte är gångbara
+EJ_GÅNGBARA = {
+    'motorway', 'motorway_link', 'trunk', 'trunk_link', 'raceway', 'bus_guideway',
+    'construction', 'proposed', 'abandoned', 'platform',
+}
+
+# csgraph behandlar 0 som "ingen kant", så kanter med längd 0 får en minimal vikt
+MINSTA_VIKT = 1e-6
+
+
+def _öppna(sökväg):
+    if sökväg.endswith(".pbf"):
+        raise ValueError(
+            "PBF-filer stöds inte direkt, konvertera först till XML "
+            "(t.ex. 'osmium cat utdrag.osm.pbf -o utdrag.osm.bz2')"
+        )
+    if sökväg.endswith(".bz2"):
+        return bz2.open(sökväg, "rb")
+    if sökväg.endswith(".gz"):
+        return gzip.open(sökväg, "rb")
+    return open(sökväg, "rb")
+
+
+def _är_gångbar(taggar):
+    highway = taggar.get('highway')
+    if highway is None or highway in EJ_GÅNGBARA:
+        return False
+    if taggar.get('foot') in ('yes', 'designated', 'permissive'):
+        return True
+    return taggar.get('foot') != 'no' and taggar.get('access') not in ('no', 'private')
+
+
+# --- Läs noder och gångbara kanter ur en OSM-XML-fil ---
+# Filen läses strömmande; noder och kanter lagras i kompakta arrayer, inte Python-objekt.
+def läs_osm(sökväg):
+    nod_id, nod_lat, nod_lon = array('q'), array('d'), array('d')
+    från, till = array('q'), array('q')
+
+    with _öppna(sökväg) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == 'node':
+                nod_id.append(int(elem.get('id')))
+                nod_lat.append(float(elem.get('lat')))
+                nod_lon.append(float(elem.get('lon')))
+                elem.clear()
+            elif elem.tag == 'way':
+                taggar = {t.get('k'): t.get('v') for t in elem.iter('tag')}
+                if _är_gångbar(taggar):
+                    noder = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                    från.extend(noder[:-1])
+                    till.extend(noder[1:])
+                elem.clear()
+            elif elem.tag == 'relation':
+                elem.clear()
+
+    return (np.frombuffer(nod_id, dtype='i8'), np.frombuffer(nod_lat, dtype='f8'),
+            np.frombuffer(nod_lon, dtype='f8'), np.frombuffer(från, dtype='i8'),
+            np.frombuffer(till, dtype='i8'))
+
+
+# --- Gatunätet som gles graf ---
+class Gångnät:
+    def __init__(self, lat, lon, kant_från, kant_till, kant_längd):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.kant_från = np.asarray(kant_från, dtype='i4')
+        self.kant_till = np.asarray(kant_till, dtype='i4')
+        self.kant_längd = np.asarray(kant_längd, dtype=float)
+        self._nodindex = None
+
+    def __len__(self):
+        return len(self.lat)
+
+    # --- Bygg grafen från OSM-data; bara noder som används av gångbara vägar behålls ---
+    @classmethod
+    def från_osm(cls, sökväg):
+        nod_id, nod_lat, nod_lon, från, till = läs_osm(sökväg)
+        ordning = np.argsort(nod_id)
+        sorterade_id = nod_id[ordning]
+
+        # Kanter till noder som saknas i utdraget (vägar som korsar kanten) tas bort
+        def position(osm_id):
+            pos = np.clip(np.searchsorted(sorterade_id, osm_id), 0, len(sorterade_id) - 1)
+            return pos, sorterade_id[pos] == osm_id
+
+        pos_från, finns_från = position(från)
+        pos_till, finns_till = position(till)
+        behåll = finns_från & finns_till & (pos_från != pos_till)
+        u = ordning[pos_från[behåll]]
+        v = ordning[pos_till[behåll]]
+
+        # Numrera om till de noder som faktiskt används och ta bort dubblettkanter
+        använda, omnumrerade = np.unique(np.concatenate([u, v]), return_inverse=True)
+        u, v = omnumrerade[:len(u)], omnumrerade[len(u):]
+        par = np.unique(np.column_stack([np.minimum(u, v), np.maximum(u, v)]), axis=0)
+
+        lat, lon = nod_lat[använda], nod_lon[använda]
+        längd = radvisa_avstånd(lat[par[:, 0]], lon[par[:, 0]], lat[par[:, 1]], lon[par[:, 1]], läge="vincenty")
+        return cls(lat, lon, par[:, 0], par[:, 1], längd)
+
+    def spara(self, sökväg):
+        np.savez(sökväg, lat=self.lat, lon=self.lon, kant_från=self.kant_från,
+                 kant_till=self.kant_till, kant_längd=self.kant_längd)
+
+    @classmethod
+    def ladda(cls, sökväg):
+        with np.load(sökväg) as data:
+            return cls(data['lat'], data['lon'], data['kant_från'], data['kant_till'], data['kant_längd'])
+
+    @property
+    def nodindex(self):
+        if self._nodindex is None:
+            self._nodindex = PunktIndex(self.lat, self.lon)
+        return self._nodindex
+
+    # --- Närmaste nod i nätet för varje punkt, och fågelvägen dit ---
+    def närmaste_nod(self, lat, lon):
+        avstånd, index = self.nodindex.närmaste(lat, lon, k=1)
+        return index[:, 0], avstånd[:, 0]
+
+    # --- Gångavstånd från närmaste av startpunkterna till varje nod ---
+    # Varje startpunkt blir en extra nod som kopplas till sin närmaste nätnod med
+    # fågelvägen som vikt, så sträckan fram till nätet räknas med.
+    def avståndsfält(self, lat, lon):
+        noder, anslutning = self.närmaste_nod(lat, lon)
+        n, antal_källor = len(self), len(noder)
+        källnoder = np.arange(n, n + antal_källor)
+
+        rader = np.concatenate([self.kant_från, källnoder])
+        kolumner = np.concatenate([self.kant_till, noder])
+        vikter = np.maximum(np.concatenate([self.kant_längd, anslutning]), MINSTA_VIKT)
+        graf = coo_matrix((vikter, (rader, kolumner)), shape=(n + antal_källor,) * 2).tocsr()
+
+        avstånd, _, källor = dijkstra(
+            graf, directed=False, indices=källnoder, min_only=True, return_predecessors=True
+        )
+        return Avståndsfält(self, avstånd[:n], np.where(källor[:n] >= 0, källor[:n] - n, -1))
+
+
+# --- Förberäknat gångavstånd till närmaste startpunkt för alla noder ---
+class Avståndsfält:
+    def __init__(self, nät, avstånd, källa):
+        self.nät = nät
+        self.avstånd = avstånd
+        self.källa = källa
+
+    # --- Gångavstånd och närmaste startpunkt (index) för godtyckliga punkter ---
+    # Punkter vars närmaste nod inte når någon startpunkt får avståndet inf och index -1.
+    def slå_upp(self, lat, lon):
+        noder, anslutning = self.nät.närmaste_nod(lat, lon)
+        return anslutning + self.avstånd[noder], self.källa[noder]
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import tracemalloc
+import zipfile
+from contextlib import contextmanager
+
+import pandas as pd
+
+import regioner
+
+# --- Strömmande inläsning av hållplatser från GTFS (stops.txt eller en hel GTFS-zip) ---
+# Filen läses i block. Varje block filtreras direkt på koordinatrutan och dubbletter
+# (samma stop_name) tas bort medan vi läser, så bara de hållplatser vi behåller ligger
+# i minnet. Klarar därmed hela det nationella GTFS-flödet.
+#
+# Rutan (syd, väst, nord, öst) är som standard regionens: rutan i region.json bredvid filen,
+# annars standardregionens (se regioner.py).
+
+KOLUMNER = ['stop_id', 'stop_name', 'stop_lat', 'stop_lon']
+# Koordinaterna läses som float64 så att filtreringen mot rutan blir exakt som tidigare,
+# och görs om till float32 först när raderna har valts ut.
+INLÄSNINGSTYPER = {'stop_id': str, 'stop_name': str, 'stop_lat': 'float64', 'stop_lon': 'float64'}
+
+BLOCKSTORLEK = 50_000
+
+
+# --- Öppna stops.txt, antingen direkt eller inuti en GTFS-zip ---
+@contextmanager
+def _öppna_stops(källa):
+    if zipfile.is_zipfile(källa):
+        with zipfile.ZipFile(källa) as arkiv:
+            medlem = next(
+                (n for n in arkiv.namelist() if os.path.basename(n) == "stops.txt"), None
+            )
+            if medlem is None:
+                raise FileNotFoundError(f"Hittar ingen stops.txt i {källa}")
+            with arkiv.open(medlem) as f:
+                yield f
+    else:
+        with open(källa, "rb") as f:
+            yield f
+
+
+# --- Ofiltrerade block med KOLUMNER (float64-koordinater), t.ex. för att dela upp på regioner ---
+def läs_block(källa, blockstorlek=BLOCKSTORLEK):
+    with _öppna_stops(källa) as f:
+        yield from pd.read_csv(
+            f, usecols=KOLUMNER, dtype=INLÄSNINGSTYPER, chunksize=blockstorlek, encoding="utf-8-sig"
+        )
+
+
+def _läs_block(källa, bbox, blockstorlek, räknare):
+    syd, väst, nord, öst = bbox
+    sedda_namn = set()
+    for block in läs_block(källa, blockstorlek):
+        räknare['lästa_rader'] += len(block)
+        block = block[
+            (block['stop_lat'] >= syd) & (block['stop_lat'] <= nord) &
+            (block['stop_lon'] >= väst) & (block['stop_lon'] <= öst)
+        ]
+        # Första förekomsten av varje namn behålls, även när dubbletten ligger i ett senare block
+        block = block[~block['stop_name'].isin(sedda_namn)].drop_duplicates(subset='stop_name', keep='first')
+        sedda_namn.update(block['stop_name'])
+        yield block
+
+
+# --- Läs hållplatser inom bbox med kompakta datatyper ---
+# Returnerar kolumnerna stop_id, name (kategori), lat/lon (float32) och typ (kategori).
+def läs_hållplatser(källa, bbox=None, blockstorlek=BLOCKSTORLEK, räknare=None):
+    bbox = bbox or regioner.område_för(källa)
+    räknare = räknare if räknare is not None else {}
+    räknare.setdefault('lästa_rader', 0)
+
+    block = list(_läs_block(källa, bbox, blockstorlek, räknare))
+    df = pd.concat(block, ignore_index=True) if block else pd.DataFrame(columns=KOLUMNER)
+    df = df.rename(columns={'stop_name': 'name', 'stop_lat': 'lat', 'stop_lon': 'lon'})
+    df = df.astype({'name': 'category', 'lat': 'float32', 'lon': 'float32'})
+    df['typ'] = pd.Categorical(['hållplats'] * len(df))
+    räknare['behållna_rader'] = len(df)
+    return df
+
+
+# --- Mät inläsningen: toppminne (tracemalloc) och rader per sekund ---
+def mät_inläsning(källa, bbox=None, blockstorlek=BLOCKSTORLEK):
+    räknare = {}
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        df = läs_hållplatser(källa, bbox, blockstorlek, räknare)
+        sekunder = time.perf_counter() - start
+        _, toppminne = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return df, {
+        'lästa_rader': räknare['lästa_rader'],
+        'behållna_rader': räknare['behållna_rader'],
+        'sekunder': sekunder,
+        'rader_per_sekund': räknare['lästa_rader'] / sekunder if sekunder else float('inf'),
+        'toppminne_mb': toppminne / 1e6,
+        'dataframe_mb': df.memory_usage(deep=True).sum() / 1e6,
+    }
+
+
+if __name__ == "__main__":
+    # Ex: python gtfs.py sweden.zip  (utan argument används stops.txt bredvid skriptet)
+    källa = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "stops.txt")
+    _, statistik = mät_inläsning(källa)
+    for nyckel, värde in statistik.items():
+        print(f"{nyckel:<16} {värde:,.2f}" if isinstance(värde, float) else f"{nyckel:<16} {värde:,}")
@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import forberakning
+import klustring
+import pipeline
+
+# --- Förbyggda kartor för alla klustringsval ---
+# Kör samma steg som appen (pipeline.py) en gång per klustringsval och skriver statiska
+# filer som kan läggas på en CDN:
+#
+#   <katalog>/
+#       manifest.json               indatafilernas hash + filerna per variant
+#       hallplatser.geojson         alla hållplatser
+#       toaletter.geojson           alla toaletter
+#       <variant>/lekplatser.geojson   lekplatser med kluster, färg, avstånd och popup
+#       <variant>/karta.html           färdigrenderad folium-karta
+#       <variant>/legend.html          legenden till kartan
+#
+# Appen (se FORBYGGDA_KARTOR i streamlit_app.py) visar den förbyggda kartan när ingen
+# hållplats är vald, och bygger bara kartan själv för filtreringen runt en hållplats.
+# Exporten gäller en klustringsbackend (se klustring.py); appen använder den bara om
+# backenden är densamma. kartlager (folium) importeras bara vid export, så att appen
+# kan läsa en förbyggd karta utan folium.
+
+EXPORT_VERSION = 1
+
+# Katalognamn per klustringsval
+VARIANTER = {
+    "Hållplatsavstånd": "hallplatsavstand",
+    "Toalettavstånd": "toalettavstand",
+    "Både hållplats + toalett": "bada",
+}
+
+
+def exportnyckel(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil=None, läge="bulk", backend="kmeans"):
+    return forberakning.innehållshash(
+        *forberakning._indatafiler(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil),
+        version=f"export{EXPORT_VERSION}-{läge}-{backend}",
+    )
+
+
+def _skriv_json(data, sökväg):
+    with open(sökväg, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+
+# --- Bygg en variant (körs i en arbetsprocess) ---
+def exportera_variant(klustringsval, lekplats_fil, hållplats_fil, toalett_fil, katalog,
+                      gångnät_fil=None, läge="bulk", backend="kmeans"):
+    import kartlager
+
+    lekplatser, hållplatser, toaletter_df = pipeline.förbered(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil)
+    modell = klustring.modell_för(lekplatser, klustringsval, backend, källa=gångnät_fil)
+    lekplatser, kluster_medel, färger_sorterade, färgkarta = pipeline.klustra_lekplatser(
+        lekplatser, klustringsval, modell
+    )
+
+    variantkatalog = os.path.join(katalog, VARIANTER[klustringsval])
+    os.makedirs(variantkatalog, exist_ok=True)
+    _skriv_json(kartlager._punkter_som_geojson(
+        lekplatser['lat'], lekplatser['lon'],
+        name=lekplatser['name'].astype(str),
+        kluster=lekplatser['kluster'],
+        färg=lekplatser['färg'],
+        avstånd_m=lekplatser['avstånd_m'].round(1),
+        avstånd_toalett=lekplatser['avstånd_toalett'].round(1),
+        popup=kartlager.lekplats_popups(lekplatser, klustringsval),
+    ), os.path.join(variantkatalog, "lekplatser.geojson"))
+
+    karta = pipeline.bygg_karta(lekplatser, hållplatser, {'toaletter': toaletter_df}, klustringsval, läge=läge)
+    karta.save(os.path.join(variantkatalog, "karta.html"))
+    with open(os.path.join(variantkatalog, "legend.html"), "w", encoding="utf-8") as f:
+        f.write(pipeline.skapa_legend(lekplatser, klustringsval, kluster_medel, färger_sorterade, färgkarta))
+
+    return klustringsval, {
+        'katalog': VARIANTER[klustringsval],
+        'lekplatser': len(lekplatser),
+        'filer': ["lekplatser.geojson", "karta.html", "legend.html"],
+    }
+
+
+# --- Bygg alla varianter parallellt ---
+# Skrivs först till en temporär katalog som sedan byts in, så att appen eller en
+# CDN-synk aldrig ser en halvfärdig export.
+def exportera(lekplats_fil, hållplats_fil, toalett_fil, katalog, gångnät_fil=None,
+              läge="bulk", max_processer=None, backend="kmeans"):
+    # Avståndsartefakten byggs här, innan arbetsprocesserna startar, så att de inte bygger den samtidigt
+    forberakning.ladda_avstånd(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil=gångnät_fil)
+
+    tmp = f"{katalog.rstrip(os.sep)}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    import kartlager
+
+    lekplatser, hållplatser, toaletter_df = pipeline.förbered(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil)
+    _skriv_json(kartlager._punkter_som_geojson(
+        hållplatser['lat'], hållplatser['lon'], name=hållplatser['name'].astype(str)
+    ), os.path.join(tmp, "hallplatser.geojson"))
+    _skriv_json(kartlager._punkter_som_geojson(
+        toaletter_df['lat'], toaletter_df['lon']
+    ), os.path.join(tmp, "toaletter.geojson"))
+
+    max_processer = max_processer or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(max_processer, len(VARIANTER))) as pool:
+        jobb = [
+            pool.submit(exportera_variant, val, lekplats_fil, hållplats_fil, toalett_fil, tmp,
+                        gångnät_fil, läge, backend)
+            for val in VARIANTER
+        ]
+        varianter = dict(j.result() for j in jobb)
+
+    _skriv_json({
+        'version': EXPORT_VERSION,
+        'nyckel': exportnyckel(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil, läge, backend),
+        'läge': läge,
+        'klustring': backend,
+        'lager': ["hallplatser.geojson", "toaletter.geojson"],
+        'varianter': varianter,
+    }, os.path.join(tmp, "manifest.json"))
+
+    gammal = f"{katalog.rstrip(os.sep)}.{os.getpid()}.gammal"
+    if os.path.exists(katalog):
+        os.replace(katalog, gammal)
+    os.replace(tmp, katalog)
+    shutil.rmtree(gammal, ignore_errors=True)
+    return katalog
+
+
+# --- Hämta förbyggd karta och legend för ett klustringsval ---
+# Returnerar None om exporten saknas eller är byggd från andra indatafiler.
+def hämta_förbyggd(katalog, klustringsval, lekplats_fil, hållplats_fil, toalett_fil,
+                   gångnät_fil=None, läge="bulk", backend="kmeans"):
+    try:
+        with open(os.path.join(katalog, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    variant = manifest.get('varianter', {}).get(klustringsval)
+    if variant is None or manifest.get('nyckel') != exportnyckel(
+        lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil, läge, backend
+    ):
+        return None
+    variantkatalog = os.path.join(katalog, variant['katalog'])
+    with open(os.path.join(variantkatalog, "karta.html"), "r", encoding="utf-8") as f:
+        karta_html = f.read()
+    with open(os.path.join(variantkatalog, "legend.html"), "r", encoding="utf-8") as f:
+        legend_html = f.read()
+    return karta_html, legend_html
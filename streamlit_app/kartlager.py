@@ -0,0 +1,148 @@
+import folium
+import numpy as np
+import pandas as pd
+
+import bekvamligheter
+import matning
+from forberakning import GÅNGHASTIGHET_M_PER_MIN
+
+# --- Kartlager ---
+# "bulk": varje punktmängd blir ETT GeoJSON-lager som byggs direkt från kolumnerna,
+#         med popup-texter som skapas vektoriserat. Hållplatser ritas på canvas
+#         (kartan skapas med prefer_canvas=True) i stället för som tusentals DOM-element.
+# "markörer": det gamla sättet med en folium.Marker/CircleMarker per rad (används för jämförelse).
+LÄGEN = ("bulk", "markörer")
+
+
+# --- Gångtidstext för en hel kolumn, samma avrundning som uppskattad_gångtid ---
+def gångtid_text(meter):
+    minuter = np.rint(np.asarray(meter, dtype=float) / GÅNGHASTIGHET_M_PER_MIN).astype(int)
+    return pd.Series(minuter, index=getattr(meter, 'index', None)).astype(str) + " min"
+
+
+# --- Popup-texter för lekplatser, en per rad, beroende på klustringsval (eller eget urval av lager) ---
+def lekplats_popups(lekplatser, klustringsval):
+    urval = bekvamligheter.urval_för(klustringsval)
+    namn = "<strong>" + lekplatser['name'].astype(str) + "</strong><br>"
+    if len(urval) == 1:
+        lager = bekvamligheter.REGISTER[urval[0]]
+        meter = lekplatser[lager.kolumn]
+        return namn + " " + meter.astype(int).astype(str) + f" m {lager.popuptext}<br> " + gångtid_text(meter)
+    rader = []
+    for lagernamn in urval:
+        lager = bekvamligheter.REGISTER[lagernamn]
+        meter = lekplatser[lager.kolumn]
+        rader.append(meter.astype(int).astype(str) + f" m {lager.popuptext} " + gångtid_text(meter))
+    text = rader[0]
+    for rad in rader[1:]:
+        text = text + "<br>" + rad
+    return namn + text
+
+
+# --- Bygg en GeoJSON FeatureCollection direkt från kolumner ---
+# Koordinaterna avrundas till 6 decimaler (ca 0,1 m), annars skrivs float32-koordinater
+# ut med alla decimaler från omvandlingen till float64.
+def _punkter_som_geojson(lat, lon, **egenskaper):
+    kolumner = {namn: np.asarray(värden).tolist() for namn, värden in egenskaper.items()}
+    koordinater = np.column_stack([np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)]).round(6).tolist()
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': punkt},
+                'properties': {namn: värden[i] for namn, värden in kolumner.items()},
+            }
+            for i, punkt in enumerate(koordinater)
+        ],
+    }
+
+
+def skapa_karta(location, zoom_start, läge="bulk"):
+    return folium.Map(location=location, zoom_start=zoom_start, prefer_canvas=(läge == "bulk"))
+
+
+# --- Lekplatser (eller toaletter) som ikonmarkörer med färg och popup per punkt ---
+def lägg_till_ikoner(karta, lat, lon, färger, popups, ikon, läge="bulk", namn=None):
+    matning.räkna("kartpunkter", len(lat))
+    if läge == "markörer":
+        for a, b, färg, popup in zip(lat, lon, färger, popups):
+            folium.Marker(
+                location=(a, b),
+                popup=popup,
+                icon=folium.Icon(color=färg, icon=ikon, prefix='fa')
+            ).add_to(karta)
+        return karta
+    # Tomma lager ritas inte: folium kräver att popup-fältet finns i någon punkt
+    if not len(lat):
+        return karta
+
+    data = _punkter_som_geojson(lat, lon, färg=färger, popup=popups)
+    folium.GeoJson(
+        data,
+        name=namn,
+        marker=folium.Marker(icon=folium.Icon(icon=ikon, prefix='fa')),
+        style_function=lambda feature: {'markerColor': feature['properties']['färg']},
+        popup=folium.GeoJsonPopup(fields=['popup'], labels=False),
+    ).add_to(karta)
+    return karta
+
+
+# --- Hållplatser som små blå cirklar ---
+def lägg_till_hållplatser(karta, hållplatser, läge="bulk"):
+    matning.räkna("kartpunkter", len(hållplatser))
+    if läge == "markörer":
+        for _, rad in hållplatser.iterrows():
+            folium.CircleMarker(
+                location=(rad['lat'], rad['lon']),
+                radius=3,
+                color='blue',
+                opacity=0.6,
+                fill=True,
+                fill_color='blue',
+                fill_opacity=0.4,
+                popup=rad['name']
+            ).add_to(karta)
+        return karta
+    # Tomma lager ritas inte: folium kräver att popup-fältet finns i någon punkt
+    if hållplatser.empty:
+        return karta
+
+    data = _punkter_som_geojson(hållplatser['lat'], hållplatser['lon'], name=hållplatser['name'].astype(str))
+    folium.GeoJson(
+        data,
+        name="Hållplatser",
+        marker=folium.CircleMarker(
+            radius=3, color='blue', opacity=0.6, fill=True, fill_color='blue', fill_opacity=0.4
+        ),
+        popup=folium.GeoJsonPopup(fields=['name'], labels=False),
+    ).add_to(karta)
+    return karta
+
+
+# --- Antal punkter per cell (interaktivt läge, utzoomat): en cirkel per cell, större ju fler ---
+def lägg_till_celler(karta, lat, lon, antal, etikett, färg='gray'):
+    matning.räkna("kartceller", len(antal))
+    # Tomma lager ritas inte: folium kräver att tooltip-fältet finns i någon punkt
+    if not len(antal):
+        return karta
+    antal = np.asarray(antal, dtype=int)
+    radie = np.clip(4 + 3 * np.log2(np.maximum(antal, 1)), 4, 30).round(1)
+    data = _punkter_som_geojson(lat, lon, antal=antal, radie=radie, text=[f"{a} {etikett}" for a in antal])
+    folium.GeoJson(
+        data,
+        name=etikett.capitalize(),
+        marker=folium.CircleMarker(color=färg, weight=1, fill=True, fill_color=färg, fill_opacity=0.35),
+        style_function=lambda feature: {'radius': feature['properties']['radie']},
+        tooltip=folium.GeoJsonTooltip(fields=['text'], labels=False),
+    ).add_to(karta)
+    return karta
+
+
+# --- Värmekarta (RGBA-bild, rad 0 i norr) över området (syd, väst, nord, öst) ---
+def lägg_till_värmekarta(karta, bild, område, namn):
+    syd, väst, nord, öst = område
+    folium.raster_layers.ImageOverlay(
+        bild, bounds=[[syd, väst], [nord, öst]], mercator_project=True, pixelated=False, name=namn
+    ).add_to(karta)
+    return karta
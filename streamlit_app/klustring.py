@@ -0,0 +1,213 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+import bekvamligheter
+import forberakning
+
+# --- Klustermodell som sparas mellan körningar ---
+# Med backend "kmeans" anpassar appen KMeans från början vid varje ändring (som tidigare).
+# Med backend "minibatch" anpassas MiniBatchKMeans en gång och modellen sparas som .npz i
+# forberaknat/ (kluster_<nyckel>.npz): skalningens medel/skala, centroider, antal punkter
+# per centroid och, per OSM-id, raden (avstånden) som modellen senast såg för lekplatsen och
+# klustret den lades till i.
+# Vid nästa körning tilldelas alla lekplatser närmaste centroid (predict) utan ny anpassning,
+# och bara nya eller ändrade lekplatser flyttar centroiderna, med samma inlärningstakt som
+# MiniBatchKMeans (1/antal). Den gamla raden för en ändrad eller borttagen lekplats tas först
+# bort ur centroiden den lades till i (inte den som ligger närmast nu, centroiderna kan ha
+# flyttat sig), så varje lekplats räknas en gång och de sparade raderna växer inte.
+#
+# Skalningen låses vid anpassningen, annars skulle centroiderna hamna i en annan skala.
+# Färgordningen (grönt = kortast avstånd) bestäms av centroidernas avståndssumma när
+# modellen anpassas och behålls sedan vid uppdateringar, så samma kluster behåller sin färg.
+# scikit-learn importeras bara när en modell anpassas; att tilldela kluster kräver bara NumPy.
+
+FORMAT_VERSION = 3
+
+BACKENDS = ("kmeans", "minibatch")
+
+# Punkter per minibatch vid anpassning och uppdatering
+BATCHSTORLEK = 4096
+
+
+# --- Antal kluster per urval (samma som i appen från början) ---
+def antal_kluster(urval):
+    return 4 if tuple(urval) == ('hållplatser',) else 5
+
+
+class Klustermodell:
+    def __init__(self, kolumner, medel, skala, centroider, antal, ordning, sedda_id=None, sedda_X=None,
+                 sedda_kluster=None, backend="minibatch"):
+        self.kolumner = list(kolumner)
+        self.medel = np.asarray(medel, dtype=float)
+        self.skala = np.asarray(skala, dtype=float)
+        self.centroider = np.asarray(centroider, dtype=float)
+        self.antal = np.asarray(antal, dtype=float)
+        self.ordning = np.asarray(ordning, dtype=int)  # klusternummer, kortast avstånd först
+        # Lekplatsernas OSM-id (sorterade), raden modellen senast såg för var och en och klustret den lades till i
+        self.sedda_id = np.empty(0, dtype='i8') if sedda_id is None else np.asarray(sedda_id, dtype='i8')
+        self.sedda_X = (np.empty((0, len(self.kolumner))) if sedda_X is None
+                        else np.asarray(sedda_X, dtype=float).reshape(-1, len(self.kolumner)))
+        self.sedda_kluster = np.empty(0, dtype='i1') if sedda_kluster is None else np.asarray(sedda_kluster, dtype='i1')
+        self.backend = backend
+
+    @property
+    def n_clusters(self):
+        return len(self.centroider)
+
+    def skala_om(self, X):
+        return (np.asarray(X, dtype=float) - self.medel) / self.skala
+
+    # --- Anpassa skalning och kluster på X (oskalade avstånd); (modell, kluster per rad) ---
+    @classmethod
+    def anpassa(cls, X, kolumner, n_clusters, backend="minibatch", batchstorlek=BATCHSTORLEK, slumpfrö=0):
+        if backend not in BACKENDS:
+            raise ValueError(f"Okänd klustringsbackend {backend!r}, välj bland {BACKENDS}")
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = StandardScaler().fit(X)
+        X_scaled = scaler.transform(X)
+        if backend == "minibatch":
+            modell = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batchstorlek,
+                                     random_state=slumpfrö, n_init='auto')
+        else:
+            modell = KMeans(n_clusters=n_clusters, random_state=slumpfrö, n_init='auto')
+        etiketter = modell.fit_predict(X_scaled)
+
+        # Centroidernas avståndssumma i meter avgör färgordningen
+        centroider_m = modell.cluster_centers_ * scaler.scale_ + scaler.mean_
+        ordning = np.argsort(centroider_m.sum(axis=1), kind="stable")
+        return cls(kolumner, scaler.mean_, scaler.scale_, modell.cluster_centers_,
+                   np.bincount(etiketter, minlength=n_clusters), ordning, backend=backend), etiketter
+
+    # --- Närmaste centroid för varje rad i X ---
+    def tilldela(self, X):
+        X_scaled = self.skala_om(X)
+        etiketter = np.empty(len(X_scaled), dtype=int)
+        for början in range(0, len(X_scaled), BATCHSTORLEK):
+            del_X = X_scaled[början:början + BATCHSTORLEK]
+            etiketter[början:början + BATCHSTORLEK] = (
+                (del_X[:, None, :] - self.centroider[None, :, :]) ** 2
+            ).sum(axis=2).argmin(axis=1)
+        return etiketter
+
+    # --- Flytta centroiderna mot nya punkter, en minibatch i taget; klustret varje punkt lades till i ---
+    def uppdatera(self, X, batchstorlek=BATCHSTORLEK):
+        X = np.asarray(X, dtype=float)
+        alla_etiketter = np.empty(len(X), dtype=int)
+        for början in range(0, len(X), batchstorlek):
+            batch = X[början:början + batchstorlek]
+            etiketter = self.tilldela(batch)
+            alla_etiketter[början:början + batchstorlek] = etiketter
+            X_scaled = self.skala_om(batch)
+            for kluster in np.unique(etiketter):
+                punkter = X_scaled[etiketter == kluster]
+                self.antal[kluster] += len(punkter)
+                self.centroider[kluster] += (punkter - self.centroider[kluster]).sum(axis=0) / self.antal[kluster]
+        return alla_etiketter
+
+    # --- Ta tillbaka punkter ur klustren de lades till i (etiketter från uppdatera eller anpassa) ---
+    # Centroiden är medelvärdet av det den byggts av, så för punkter som lagts till med uppdatera
+    # är detta exakt inversen; för punkter från anpassningen är det en god approximation.
+    def ta_bort(self, X, etiketter):
+        X = np.asarray(X, dtype=float)
+        if not len(X):
+            return self
+        etiketter = np.asarray(etiketter, dtype=int)
+        X_scaled = self.skala_om(X)
+        for kluster in np.unique(etiketter):
+            punkter = X_scaled[etiketter == kluster]
+            kvar = self.antal[kluster] - len(punkter)
+            if kvar >= 1:
+                self.centroider[kluster] = (self.antal[kluster] * self.centroider[kluster] - punkter.sum(axis=0)) / kvar
+            self.antal[kluster] = max(kvar, 1)
+        return self
+
+    # --- Spara raderna som modellen nu har sett och deras kluster, per lekplats ---
+    def minns(self, id_, X, etiketter):
+        ordning = np.argsort(id_, kind="stable")
+        self.sedda_id = np.asarray(id_, dtype='i8')[ordning]
+        self.sedda_X = np.asarray(X, dtype=float)[ordning]
+        self.sedda_kluster = np.asarray(etiketter, dtype='i1')[ordning]
+        return self
+
+    def spara(self, sökväg):
+        np.savez(
+            sökväg, kolumner=np.array(self.kolumner), medel=self.medel, skala=self.skala,
+            centroider=self.centroider, antal=self.antal, ordning=self.ordning,
+            sedda_id=self.sedda_id, sedda_X=self.sedda_X, sedda_kluster=self.sedda_kluster,
+            backend=self.backend, version=FORMAT_VERSION,
+        )
+
+    @classmethod
+    def ladda(cls, sökväg):
+        with np.load(sökväg) as data:
+            if int(data['version']) != FORMAT_VERSION:
+                raise ValueError(f"{sökväg} har formatversion {int(data['version'])}, väntade {FORMAT_VERSION}")
+            return cls(data['kolumner'].tolist(), data['medel'], data['skala'], data['centroider'],
+                       data['antal'], data['ordning'], data['sedda_id'], data['sedda_X'],
+                       data['sedda_kluster'], str(data['backend']))
+
+
+def _sökväg(urval, n_clusters, katalog, källa):
+    nyckel = hashlib.sha256(
+        f"v{FORMAT_VERSION}|{'|'.join(urval)}|{n_clusters}|{os.path.basename(källa or '')}".encode()
+    ).hexdigest()[:16]
+    return os.path.join(katalog, f"kluster_{nyckel}.npz")
+
+
+# --- Läs den sparade modellen för klustringsvalet, uppdatera med nya lekplatser och spara ---
+# Finns ingen modell (eller ny=True) anpassas en från början på alla lekplatser. `källa` skiljer
+# modeller för olika avståndsslag åt (t.ex. gångnätsfilen), så de inte blandas ihop.
+def hämta_modell(lekplatser, klustringsval, katalog=forberakning.STANDARDKATALOG, backend="minibatch",
+                 ny=False, batchstorlek=BATCHSTORLEK, källa=None):
+    urval = bekvamligheter.urval_för(klustringsval)
+    kolumner = bekvamligheter.kolumner(urval)
+    n_clusters = antal_kluster(urval)
+    lekplatser = lekplatser.dropna(subset=kolumner)
+    sökväg = _sökväg(urval, n_clusters, katalog, källa)
+    id_ = lekplatser['id'].to_numpy(dtype='i8')
+    X = lekplatser[kolumner].to_numpy(dtype=float)
+
+    modell = None
+    if not ny and os.path.exists(sökväg):
+        try:
+            modell = Klustermodell.ladda(sökväg)
+        except (OSError, ValueError, KeyError):
+            modell = None
+    if modell is not None and modell.backend == backend:
+        # Sedda lekplatser vars rad har ändrats eller som inte finns längre tas bort innan de nya läggs till
+        plats = np.zeros(len(id_), dtype=int)
+        oförändrad = np.zeros(len(id_), dtype=bool)
+        if len(modell.sedda_id):
+            plats = np.minimum(np.searchsorted(modell.sedda_id, id_), len(modell.sedda_id) - 1)
+            oförändrad = (modell.sedda_id[plats] == id_) & (modell.sedda_X[plats] == X).all(axis=1)
+        kvar = np.zeros(len(modell.sedda_id), dtype=bool)
+        kvar[plats[oförändrad]] = True
+        if oförändrad.all() and kvar.all():
+            return modell
+        etiketter = np.empty(len(id_), dtype=int)
+        etiketter[oförändrad] = modell.sedda_kluster[plats[oförändrad]]
+        modell.ta_bort(modell.sedda_X[~kvar], modell.sedda_kluster[~kvar])
+        etiketter[~oförändrad] = modell.uppdatera(X[~oförändrad], batchstorlek)
+    else:
+        modell, etiketter = Klustermodell.anpassa(X, kolumner, n_clusters, backend, batchstorlek)
+    modell.minns(id_, X, etiketter)
+
+    # Unikt temporärt namn per anrop: sessionerna är trådar i samma process och kan spara samma modell samtidigt
+    os.makedirs(katalog, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=katalog, prefix=f"{os.path.basename(sökväg)}.", suffix=".tmp.npz")
+    os.close(fd)
+    modell.spara(tmp)
+    os.replace(tmp, sökväg)
+    return modell
+
+
+# --- Modellen för appens klustringsbackend; None med "kmeans" (anpassa om varje gång) ---
+def modell_för(lekplatser, klustringsval, backend, katalog=forberakning.STANDARDKATALOG, källa=None):
+    if backend == "kmeans":
+        return None
+    return hämta_modell(lekplatser, klustringsval, katalog, backend=backend, källa=källa)
@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# --- Mätning av tid och antal i appens heta delar ---
+# En Mätning samlar tid per steg (med antal bearbetade rader) och räknare (t.ex. antal
+# avståndsberäkningar) för en körning av appen. Den aktiva mätningen hålls per tråd,
+# eftersom Streamlit kör varje session i en egen tråd, så moduler som avstand.py kan
+# räkna utan att mätningen skickas runt. Utan aktiv mätning är steg() en delad
+# nullcontext och räkna() en uppslagning, så kostnaden är försumbar.
+#
+# Varje avslutad mätning läggs också till i en processgemensam summering som kan
+# exporteras i OpenMetrics-format (för Prometheus m.fl.) eller loggas som JSON.
+#
+# Processens RSS (residentminne) noteras när mätningen startar och avslutas, så att
+# minnet per session syns i debugpanelen och som gauge i OpenMetrics. Milstolpar
+# (markera()) ger tiden från körningens start till t.ex. att sidan först ritats.
+
+logger = logging.getLogger("lekplatskarta.matning")
+
+_tråd = threading.local()
+_INAKTIV = nullcontext()
+
+
+# --- Processens nuvarande RSS i MB (VmRSS), None där /proc saknas ---
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for rad in f:
+                if rad.startswith("VmRSS:"):
+                    return int(rad.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class Mätning:
+    def __init__(self):
+        self.steg = {}       # namn -> {'sekunder', 'anrop', 'rader'}
+        self.räknare = {}    # namn -> antal
+        self.start = time.perf_counter()
+        self.rss_start_mb = rss_mb()
+        self.rss_slut_mb = None
+        self.milstolpar = {}  # namn -> sekunder från start (första gången den nås)
+
+    @contextmanager
+    def mät(self, namn, rader=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            post = self.steg.setdefault(namn, {'sekunder': 0.0, 'anrop': 0, 'rader': 0})
+            post['sekunder'] += time.perf_counter() - start
+            post['anrop'] += 1
+            if rader is not None:
+                post['rader'] += int(rader)
+
+    def räkna(self, namn, antal=1):
+        self.räknare[namn] = self.räknare.get(namn, 0) + antal
+
+    def markera(self, namn):
+        self.milstolpar.setdefault(namn, time.perf_counter() - self.start)
+
+    def som_dict(self):
+        return {
+            'total_sekunder': time.perf_counter() - self.start,
+            'rss_start_mb': self.rss_start_mb,
+            'rss_slut_mb': self.rss_slut_mb,
+            'milstolpar': self.milstolpar,
+            'steg': self.steg,
+            'räknare': self.räknare,
+        }
+
+
+# --- Summering över alla körningar i processen ---
+class Summering:
+    def __init__(self):
+        self._lås = threading.Lock()
+        self.körningar = 0
+        self.steg = {}
+        self.räknare = {}
+        self.rss_mb = None
+        self.milstolpar = {}  # senaste körningens
+
+    def lägg_till(self, mätning):
+        with self._lås:
+            self.körningar += 1
+            self.rss_mb = mätning.rss_slut_mb
+            self.milstolpar = dict(mätning.milstolpar)
+            for namn, post in mätning.steg.items():
+                summa = self.steg.setdefault(namn, {'sekunder': 0.0, 'anrop': 0, 'rader': 0})
+                for fält in summa:
+                    summa[fält] += post[fält]
+            for namn, antal in mätning.räknare.items():
+                self.räknare[namn] = self.räknare.get(namn, 0) + antal
+
+    # --- OpenMetrics-text; cachestatistik ({namn: LRUCache.statistik()}) tas med om den anges ---
+    def som_openmetrics(self, cachar=None, prefix="lekplatskarta"):
+        with self._lås:
+            steg = {namn: dict(post) for namn, post in self.steg.items()}
+            räknare = dict(self.räknare)
+            körningar = self.körningar
+            rss = self.rss_mb
+            milstolpar = dict(self.milstolpar)
+
+        def etikett(värde):
+            return str(värde).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        rader = [
+            f"# TYPE {prefix}_korningar counter",
+            f"# HELP {prefix}_korningar Antal mätta körningar av appen.",
+            f"{prefix}_korningar_total {körningar}",
+        ]
+        for fält, typ, hjälp in (
+            ('sekunder', 'steg_seconds', "Sammanlagd tid per steg."),
+            ('anrop', 'steg_anrop', "Antal gånger steget körts."),
+            ('rader', 'steg_rader', "Antal bearbetade rader per steg."),
+        ):
+            rader.append(f"# TYPE {prefix}_{typ} counter")
+            if fält == 'sekunder':
+                rader.append(f"# UNIT {prefix}_{typ} seconds")
+            rader.append(f"# HELP {prefix}_{typ} {hjälp}")
+            rader += [f'{prefix}_{typ}_total{{steg="{etikett(namn)}"}} {post[fält]}' for namn, post in steg.items()]
+        rader += [f"# TYPE {prefix}_handelser counter", f"# HELP {prefix}_handelser Räknare från kodens heta delar."]
+        rader += [f'{prefix}_handelser_total{{namn="{etikett(namn)}"}} {antal}' for namn, antal in räknare.items()]
+        if milstolpar:
+            rader += [
+                f"# TYPE {prefix}_milstolpe_seconds gauge",
+                f"# UNIT {prefix}_milstolpe_seconds seconds",
+                f"# HELP {prefix}_milstolpe_seconds Tid från körningens start till milstolpen (senaste körningen).",
+            ]
+            rader += [f'{prefix}_milstolpe_seconds{{namn="{etikett(namn)}"}} {s}' for namn, s in milstolpar.items()]
+        if rss is not None:
+            rader += [
+                f"# TYPE {prefix}_rss_bytes gauge",
+                f"# UNIT {prefix}_rss_bytes bytes",
+                f"# HELP {prefix}_rss_bytes Processens residentminne efter senaste körningen.",
+                f"{prefix}_rss_bytes {int(rss * 1024 * 1024)}",
+            ]
+        if cachar:
+            # Metriknamn måste vara ASCII, därav traffar
+            for fält, namn in (('träffar', 'traffar'), ('missar', 'missar'), ('utkastade', 'utkastade')):
+                rader += [f"# TYPE {prefix}_cache_{namn} counter"]
+                rader += [f'{prefix}_cache_{namn}_total{{cache="{etikett(c)}"}} {s[fält]}' for c, s in cachar.items()]
+            rader += [f"# TYPE {prefix}_cache_poster gauge"]
+            rader += [f'{prefix}_cache_poster{{cache="{etikett(c)}"}} {s["poster"]}' for c, s in cachar.items()]
+        rader.append("# EOF")
+        return "\n".join(rader) + "\n"
+
+
+SUMMERING = Summering()
+
+
+# --- Starta och avsluta mätningen för den aktuella tråden ---
+def starta():
+    _tråd.mätning = Mätning()
+    return _tråd.mätning
+
+
+def avsluta():
+    mätning = getattr(_tråd, 'mätning', None)
+    _tråd.mätning = None
+    if mätning is not None:
+        mätning.rss_slut_mb = rss_mb()
+        SUMMERING.lägg_till(mätning)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(mätning.som_dict(), ensure_ascii=False))
+    return mätning
+
+
+# --- Används i koden som mäts: gör ingenting om ingen mätning är aktiv ---
+def steg(namn, rader=None):
+    mätning = getattr(_tråd, 'mätning', None)
+    if mätning is None:
+        return _INAKTIV
+    return mätning.mät(namn, rader)
+
+
+def räkna(namn, antal=1):
+    mätning = getattr(_tråd, 'mätning', None)
+    if mätning is not None:
+        mätning.räkna(namn, antal)
+
+
+def markera(namn):
+    mätning = getattr(_tråd, 'mätning', None)
+    if mätning is not None:
+        mätning.markera(namn)
+
+
+# --- Skriv OpenMetrics-texten till fil (atomiskt, så att en skrapare aldrig läser en halv fil) ---
+# Sessionerna är trådar i samma process och delar den temporära filen, därav låset.
+_skrivlås = threading.Lock()
+
+
+def skriv_openmetrics(sökväg, cachar=None):
+    text = SUMMERING.som_openmetrics(cachar)
+    tmp = f"{sökväg}.{os.getpid()}.tmp"
+    with _skrivlås:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, sökväg)
+
+
+# --- Skriv varje avslutad mätning som en JSON-rad till stderr ---
+def aktivera_loggning(nivå=logging.INFO):
+    if not logger.handlers:
+        hanterare = logging.StreamHandler()
+        hanterare.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(hanterare)
+    logger.setLevel(nivå)
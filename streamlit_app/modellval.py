@@ -0,0 +1,120 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import calinski_harabasz_score, silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+# --- Val av antal kluster (k) för KMeans ---
+# Kör rutnätet (featureset, k) parallellt i en processpool. Varje featureset svepas
+# uppåt i k i omgångar och avbryts när inertian planar ut (förbättringen mellan två
+# k-värden understiger `tolerans` flera gånger i rad). Silhouette räknas på ett
+# stickprov när datamängden är stor eftersom den är O(n²); Calinski–Harabasz är O(n)
+# och räknas alltid. Resultatet kan skrivas som JSON eller CSV. Med backend "minibatch"
+# används MiniBatchKMeans, som klarar nationella datamängder (se klustring.py).
+
+# Över så här många punkter räknas silhouette på ett stickprov
+SILHOUETTE_GRÄNS = 5000
+STICKPROV = 5000
+
+
+# --- Anpassa KMeans för ett k och räkna ut måtten (körs i en arbetsprocess) ---
+def utvärdera(featureset, X_scaled, k, slumpfrö=0, backend="kmeans"):
+    if backend == "minibatch":
+        kmeans = MiniBatchKMeans(n_clusters=k, n_init="auto", random_state=slumpfrö, batch_size=4096)
+    else:
+        kmeans = KMeans(n_clusters=k, n_init="auto", random_state=slumpfrö)
+    etiketter = kmeans.fit_predict(X_scaled)
+    n = len(X_scaled)
+    stickprov = STICKPROV if n > SILHOUETTE_GRÄNS else None
+    return {
+        'featureset': featureset,
+        'k': k,
+        'n': n,
+        'inertia': float(kmeans.inertia_),
+        'silhouette': float(silhouette_score(X_scaled, etiketter, sample_size=stickprov, random_state=slumpfrö)),
+        'silhouette_stickprov': stickprov or n,
+        'calinski_harabasz': float(calinski_harabasz_score(X_scaled, etiketter)),
+        'stoppade_tidigt': False,
+    }
+
+
+# --- Har inertian planat ut? Tittar på de `tålamod` senaste förbättringarna ---
+def har_planat_ut(inertior, tolerans, tålamod):
+    if len(inertior) <= tålamod:
+        return False
+    förbättringar = [
+        (föregående - nuvarande) / föregående if föregående > 0 else 0.0
+        for föregående, nuvarande in zip(inertior[-tålamod - 1:-1], inertior[-tålamod:])
+    ]
+    return all(f < tolerans for f in förbättringar)
+
+
+# --- Svep k för alla featureset ---
+# features: {namn: matris med oskalade värden}. Returnerar en lista med en rad per (featureset, k).
+def svep(features, ks=range(2, 11), max_processer=None, tolerans=0.05, tålamod=2, slumpfrö=0, backend="kmeans"):
+    ks = sorted(ks)
+    skalade = {namn: StandardScaler().fit_transform(np.asarray(X, dtype=float)) for namn, X in features.items()}
+    max_processer = max_processer or os.cpu_count() or 1
+
+    resultat = {namn: [] for namn in skalade}
+    nästa = {namn: 0 for namn in skalade}
+    aktiva = [namn for namn in skalade if len(skalade[namn]) > 1]
+
+    with ProcessPoolExecutor(max_workers=max_processer) as pool:
+        while aktiva:
+            # Fördela arbetarna på de featureset som fortfarande svepas
+            per_set = max(1, max_processer // len(aktiva))
+            jobb = []
+            for namn in aktiva:
+                X = skalade[namn]
+                omgång = [k for k in ks[nästa[namn]:nästa[namn] + per_set] if k < len(X)]
+                nästa[namn] += per_set
+                jobb += [pool.submit(utvärdera, namn, X, k, slumpfrö, backend) for k in omgång]
+
+            for j in jobb:
+                rad = j.result()
+                resultat[rad['featureset']].append(rad)
+
+            kvar = []
+            for namn in aktiva:
+                resultat[namn].sort(key=lambda r: r['k'])
+                återstår = [k for k in ks[nästa[namn]:] if k < len(skalade[namn])]
+                if not återstår:
+                    continue
+                if har_planat_ut([r['inertia'] for r in resultat[namn]], tolerans, tålamod):
+                    for r in resultat[namn]:
+                        r['stoppade_tidigt'] = True
+                    continue
+                kvar.append(namn)
+            aktiva = kvar
+
+    return [rad for namn in skalade for rad in resultat[namn]]
+
+
+# --- Bästa k per featureset enligt silhouette ---
+def bästa_k(rader):
+    bästa = {}
+    for rad in rader:
+        nuvarande = bästa.get(rad['featureset'])
+        if nuvarande is None or rad['silhouette'] > nuvarande['silhouette']:
+            bästa[rad['featureset']] = rad
+    return {namn: rad['k'] for namn, rad in bästa.items()}
+
+
+# --- Skriv rapporten; formatet väljs av filändelsen (.json eller .csv) ---
+def skriv_rapport(rader, sökväg):
+    if sökväg.endswith(".csv"):
+        fält = ['featureset', 'k', 'n', 'inertia', 'silhouette', 'silhouette_stickprov',
+                'calinski_harabasz', 'stoppade_tidigt']
+        with open(sökväg, "w", encoding="utf-8", newline="") as f:
+            skrivare = csv.DictWriter(f, fieldnames=fält)
+            skrivare.writeheader()
+            for rad in rader:
+                skrivare.writerow({namn: rad[namn] for namn in fält})
+    else:
+        with open(sökväg, "w", encoding="utf-8") as f:
+            json.dump({'bästa_k': bästa_k(rader), 'resultat': rader}, f, ensure_ascii=False, indent=2)
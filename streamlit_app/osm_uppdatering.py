@@ -0,0 +1,159 @@
+import json
+import os
+
+import forberakning
+import overpass
+
+# --- Inkrementell uppdatering av lekplatser och toaletter från OpenStreetMap ---
+# Nya element jämförs med de sparade via OSM-id och version. Filen skrivs bara om
+# något faktiskt har ändrats, och de förberäknade avstånden uppdateras bara för de
+# lekplatser som berörs (se forberakning.uppdatera_artefakt). Hämtningen sker i
+# rutor och för flera dataset samtidigt (se overpass.py).
+
+OVERPASS_URL = overpass.OVERPASS_URL
+
+FILNAMN = {
+    'lekplatser': "lekplatser_ny.json",
+    'toaletter': "toaletter.json",
+    'bänkar': "bankar.json",
+    'kaféer': "kafeer.json",
+    'dricksvatten': "dricksvatten.json",
+}
+
+
+# --- Hämta element från Overpass, eller från en lokal fixturfil (samma format som Overpass-svaret) ---
+# Övriga nyckelord (rutnät, max_samtidiga, cache_ttl_s, ...) skickas vidare till overpass.hämta.
+def hämta_element(dataset, fixtur=None, url=OVERPASS_URL, **hämtningsval):
+    if fixtur:
+        with open(fixtur, "r", encoding="utf-8") as f:
+            svar = json.load(f)
+        element = svar["elements"] if isinstance(svar, dict) else svar
+    else:
+        element = overpass.hämta([dataset], url=url, **hämtningsval)[dataset]
+    return filtrera(dataset, element)
+
+
+def filtrera(dataset, element):
+    if dataset == 'lekplatser':
+        #Filtrera bort lekplatser där access = "private"
+        element = [el for el in element if not (el.get("tags", {}).get("access") == "private")]
+    return element
+
+
+def _har_ändrats(gammalt, nytt):
+    if 'version' in gammalt and 'version' in nytt:
+        return gammalt['version'] != nytt['version']
+    return gammalt != nytt
+
+
+# --- Jämför sparade och nya element via OSM-id ---
+# "flyttade" är den delmängd av "ändrade" där koordinaterna har ändrats.
+def diffa(gamla, nya):
+    gamla_per_id = {el['id']: el for el in gamla}
+    nya_per_id = {el['id']: el for el in nya}
+
+    tillagda = [id_ for id_ in nya_per_id if id_ not in gamla_per_id]
+    borttagna = [id_ for id_ in gamla_per_id if id_ not in nya_per_id]
+    ändrade, flyttade = [], []
+    for id_, nytt in nya_per_id.items():
+        gammalt = gamla_per_id.get(id_)
+        if gammalt is None or not _har_ändrats(gammalt, nytt):
+            continue
+        ändrade.append(id_)
+        if (gammalt['lat'], gammalt['lon']) != (nytt['lat'], nytt['lon']):
+            flyttade.append(id_)
+
+    return {
+        'tillagda': tillagda,
+        'ändrade': ändrade,
+        'flyttade': flyttade,
+        'borttagna': borttagna,
+        'oförändrade': len(nya_per_id) - len(tillagda) - len(ändrade),
+    }
+
+
+def finns_ändringar(diff):
+    return bool(diff['tillagda'] or diff['ändrade'] or diff['borttagna'])
+
+
+# --- Slå ihop: oförändrade element behåller sin plats, ändrade byts ut, nya läggs sist ---
+def slå_ihop(gamla, nya, diff):
+    nya_per_id = {el['id']: el for el in nya}
+    borttagna = set(diff['borttagna'])
+    ändrade = set(diff['ändrade'])
+    sammanslagna = [
+        nya_per_id[el['id']] if el['id'] in ändrade else el
+        for el in gamla if el['id'] not in borttagna
+    ]
+    sammanslagna += [nya_per_id[id_] for id_ in diff['tillagda']]
+    return sammanslagna
+
+
+def skriv_element(sökväg, element):
+    tmp = f"{sökväg}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(element, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, sökväg)
+
+
+# --- Hela uppdateringen för ett dataset ---
+# Med inkrementell=False skrivs filen alltid om (som tidigare). Om katalogen även innehåller
+# de andra indatafilerna uppdateras de förberäknade avstånden för de berörda lekplatserna.
+# Med `element` används redan hämtade element (se uppdatera_flera).
+def uppdatera(dataset, katalog=".", fixtur=None, inkrementell=True, url=OVERPASS_URL, element=None,
+              **hämtningsval):
+    sökväg = os.path.join(katalog, FILNAMN[dataset])
+    if element is not None:
+        nya = filtrera(dataset, element)
+    else:
+        nya = hämta_element(dataset, fixtur=fixtur, url=url, **hämtningsval)
+
+    if not inkrementell or not os.path.exists(sökväg):
+        skriv_element(sökväg, nya)
+        return {'tillagda': [el['id'] for el in nya], 'ändrade': [], 'flyttade': [],
+                'borttagna': [], 'oförändrade': 0}
+
+    gamla = forberakning.läs_osm_json(sökväg)
+    diff = diffa(gamla, nya)
+    if not finns_ändringar(diff):
+        return diff
+
+    indatafiler = (
+        os.path.join(katalog, FILNAMN['lekplatser']),
+        os.path.join(katalog, "stops.txt"),
+        os.path.join(katalog, FILNAMN['toaletter']),
+    )
+    # Bara lekplatser och toaletter ingår i de förberäknade avstånden
+    har_alla_indata = dataset in ('lekplatser', 'toaletter') and all(os.path.exists(f) for f in indatafiler)
+    gammal_nyckel = forberakning.innehållshash(*indatafiler) if har_alla_indata else None
+
+    skriv_element(sökväg, slå_ihop(gamla, nya, diff))
+
+    if har_alla_indata:
+        _, diff['omräknade_lekplatser'] = forberakning.uppdatera_artefakt(
+            *indatafiler, gammal_nyckel,
+            lekplats_diff=diff if dataset == 'lekplatser' else None,
+            toalett_diff=diff if dataset == 'toaletter' else None,
+            katalog=os.path.join(katalog, os.path.basename(forberakning.STANDARDKATALOG)),
+        )
+    return diff
+
+
+# --- Hämta flera dataset samtidigt och uppdatera dem ett i taget ---
+def uppdatera_flera(dataset_lista, katalog=".", inkrementell=True, url=OVERPASS_URL, **hämtningsval):
+    hämtade = overpass.hämta(dataset_lista, url=url, **hämtningsval)
+    return {
+        dataset: uppdatera(dataset, katalog=katalog, inkrementell=inkrementell, element=hämtade[dataset])
+        for dataset in dataset_lista
+    }
+
+
+def sammanfatta(dataset, diff):
+    text = (
+        f"{dataset}: {len(diff['tillagda'])} tillagda, {len(diff['ändrade'])} ändrade "
+        f"({len(diff['flyttade'])} flyttade), {len(diff['borttagna'])} borttagna, "
+        f"{diff['oförändrade']} oförändrade"
+    )
+    if 'omräknade_lekplatser' in diff:
+        text += f"; avstånd omräknade för {diff['omräknade_lekplatser']} lekplatser"
+    return text
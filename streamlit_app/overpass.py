@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import forberakning
+import regioner
+
+# --- Samtidig hämtning från Overpass ---
+# Rutan (bbox; standardregionens om ingen anges, se regioner.py) delas upp i mindre rutor
+# och varje (dataset, ruta) blir en egen fråga.
+# Frågorna körs samtidigt med asyncio, men högst `max_samtidiga` åt gången, över en
+# gemensam requests-session med lika många anslutningar. Svar med 429/5xx eller
+# nätverksfel försöks igen med exponentiell väntetid (och Retry-After om servern anger
+# det). Svaren sparas i en diskcache med TTL, så en ny körning inom TTL inte belastar
+# Overpass. Resultatet slås ihop per dataset och dubbletter (element på rutgränser)
+# tas bort via OSM-id; högst version vinner.
+#
+# Adressen kan ändras med OVERPASS_URL (miljövariabel eller url-argument), t.ex. till en
+# lokal testserver.
+
+OVERPASS_URL = os.environ.get("OVERPASS_URL", "http://overpass-api.de/api/interpreter")
+
+# Taggfilter per dataset
+TAGGFILTER = {
+    'lekplatser': '["leisure"="playground"]',
+    'toaletter': '["amenity"="toilets"]',
+    'bänkar': '["amenity"="bench"]',
+    'kaféer': '["amenity"="cafe"]',
+    'dricksvatten': '["amenity"="drinking_water"]',
+}
+
+CACHEKATALOG = os.path.join(forberakning.STANDARDKATALOG, "overpass")
+CACHE_TTL_S = 3600
+
+# Statuskoder som är värda att försöka igen
+TILLFÄLLIGA_FEL = {429, 500, 502, 503, 504}
+
+
+# --- Dela upp (syd, väst, nord, öst) i rader × kolumner rutor ---
+def rutor(bbox=None, rader=2, kolumner=2):
+    syd, väst, nord, öst = bbox or regioner.standard().bbox
+    höjd, bredd = (nord - syd) / rader, (öst - väst) / kolumner
+    return [
+        (syd + i * höjd, väst + j * bredd, syd + (i + 1) * höjd, väst + (j + 1) * bredd)
+        for i in range(rader) for j in range(kolumner)
+    ]
+
+
+# --- Overpass-fråga för ett dataset i en ruta; "out meta" ger version för diffningen ---
+def fråga(dataset, ruta):
+    syd, väst, nord, öst = ruta
+    return f"[out:json][timeout:90];\nnode{TAGGFILTER[dataset]}({syd},{väst},{nord},{öst});\nout meta;\n"
+
+
+# --- Svar på disk, en JSON-fil per (adress, fråga) ---
+class SvarsCache:
+    def __init__(self, katalog=CACHEKATALOG, ttl_s=CACHE_TTL_S):
+        self.katalog = katalog
+        self.ttl_s = ttl_s
+
+    def _sökväg(self, url, text):
+        nyckel = hashlib.sha256(f"{url}\n{text}".encode()).hexdigest()[:24]
+        return os.path.join(self.katalog, f"{nyckel}.json")
+
+    def hämta(self, url, text):
+        sökväg = self._sökväg(url, text)
+        try:
+            if time.time() - os.path.getmtime(sökväg) > self.ttl_s:
+                return None
+            with open(sökväg, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def spara(self, url, text, svar):
+        os.makedirs(self.katalog, exist_ok=True)
+        sökväg = self._sökväg(url, text)
+        tmp = f"{sökväg}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(svar, f, ensure_ascii=False)
+        os.replace(tmp, sökväg)
+
+
+def _väntetid(försök, bas_s, respons=None):
+    if respons is not None and respons.headers.get("Retry-After", "").isdigit():
+        return float(respons.headers["Retry-After"])
+    return bas_s * 2 ** försök * (0.5 + random.random())
+
+
+# --- En fråga, med cache och omförsök ---
+async def _hämta_fråga(session, url, text, semafor, cache, max_försök, bas_väntetid_s, timeout_s):
+    if cache is not None:
+        svar = cache.hämta(url, text)
+        if svar is not None:
+            return svar
+
+    for försök in range(max_försök):
+        respons = None
+        try:
+            async with semafor:
+                respons = await asyncio.to_thread(session.post, url, data={"data": text}, timeout=timeout_s)
+            if respons.status_code not in TILLFÄLLIGA_FEL:
+                respons.raise_for_status()
+                svar = respons.json()
+                if cache is not None:
+                    cache.spara(url, text, svar)
+                return svar
+        except (requests.ConnectionError, requests.Timeout):
+            pass
+        if försök + 1 < max_försök:
+            await asyncio.sleep(_väntetid(försök, bas_väntetid_s, respons))
+
+    if respons is not None:
+        respons.raise_for_status()
+    raise requests.ConnectionError(f"Overpass svarade inte efter {max_försök} försök: {url}")
+
+
+# --- Slå ihop element från flera rutor; samma OSM-id behålls en gång (högst version) ---
+def slå_ihop_rutor(svar_lista):
+    per_id = {}
+    for svar in svar_lista:
+        for el in svar.get("elements", []):
+            nyckel = (el.get("type", "node"), el["id"])
+            befintligt = per_id.get(nyckel)
+            if befintligt is None or el.get("version", 0) > befintligt.get("version", 0):
+                per_id[nyckel] = el
+    return sorted(per_id.values(), key=lambda el: el["id"])
+
+
+async def hämta_async(dataset_lista, bbox=None, rutnät=(2, 2), url=OVERPASS_URL,
+                      max_samtidiga=4, cache=None, max_försök=4, bas_väntetid_s=1.0, timeout_s=120):
+    rutlista = rutor(bbox, *rutnät)
+    semafor = asyncio.Semaphore(max_samtidiga)
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_samtidiga)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        jobb = {
+            dataset: [
+                _hämta_fråga(session, url, fråga(dataset, ruta), semafor, cache,
+                             max_försök, bas_väntetid_s, timeout_s)
+                for ruta in rutlista
+            ]
+            for dataset in dataset_lista
+        }
+        svar = await asyncio.gather(*(j for lista in jobb.values() for j in lista))
+
+    resultat, i = {}, 0
+    for dataset, lista in jobb.items():
+        resultat[dataset] = slå_ihop_rutor(svar[i:i + len(lista)])
+        i += len(lista)
+    return resultat
+
+
+# --- Hämta ett eller flera dataset; returnerar {dataset: [element, ...]} ---
+def hämta(dataset_lista, bbox=None, rutnät=(2, 2), url=OVERPASS_URL, max_samtidiga=4,
+          cache_ttl_s=CACHE_TTL_S, cachekatalog=CACHEKATALOG, **kwargs):
+    cache = SvarsCache(cachekatalog, cache_ttl_s) if cache_ttl_s else None
+    return asyncio.run(hämta_async(
+        list(dataset_lista), bbox, rutnät, url, max_samtidiga, cache, **kwargs
+    ))
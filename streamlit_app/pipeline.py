@@ -0,0 +1,377 @@
+import numpy as np
+import pandas as pd
+
+import bekvamligheter
+import forberakning
+import klustring
+import matning
+import poi_lager
+import regioner
+from avstand import radvisa_avstånd
+
+# --- Appens steg från data till karta, utan Streamlit ---
+# streamlit_app.py anropar stegen (med cacheing runt), och benchmark_pipeline.py
+# kör och mäter dem var för sig utan gränssnitt.
+#
+# Tabellerna hålls kompakta: float32-koordinater och -avstånd, namn och typ som kategorier.
+# Stegen ändrar aldrig sina indata utan returnerar nya tabeller; med pandas copy-on-write
+# (alltid på från pandas 3, därav pandas>=3 i requirements.txt) delar de då kolumnerna med
+# indata i stället för att kopiera dem, så tabellerna från förbered() kan delas mellan alla
+# sessioner.
+#
+# scikit-learn och folium (via kartlager) importeras i de steg som använder dem, så att
+# appen kan rita sidan och läsa data innan de har laddats.
+#   1. ladda_*             läs lekplatser, hållplatser och toaletter
+#   2. kombinera           slå ihop till lekplatser/hållplatser
+#   3. lägg_till_avstånd   närmaste hållplats/toalett (förberäknat), övriga lager via Avståndsmotor
+#   4. klustra_lekplatser  skalning + KMeans (eller sparad modell, se klustring.py) + färger
+#   5. lekplatser_inom_radie  filtrering runt vald hållplats
+#   6. bygg_karta / skapa_legend (bygg_vyportlager: bara kartans utsnitt, för st_folium)
+
+# Klustringsvalen i appen; klustra_lekplatser m.fl. tar även ett eget urval av lager (se bekvamligheter.py)
+KLUSTRINGSVAL = list(bekvamligheter.KLUSTRINGSVAL)
+
+# Kartans mitt när ingen hållplats är vald; appen skickar in den valda regionens (se regioner.py)
+STANDARDCENTRUM = regioner.standard().centrum
+
+# Färg på cellerna (antal per cell) i det interaktiva läget, per lager
+CELLFÄRGER = {'lekplatser': 'green', 'hållplatser': 'blue'}
+
+
+# --- Omvandla avstånd till gångtid ---
+def uppskattad_gångtid(meter):
+    minuter = int(round(meter/83))  # 5 km/h gånghastighet
+    return f"{minuter} min"
+
+
+# --- 1. Inläsning ---
+def ladda_lekplatser(poi_tabell):
+    return pd.DataFrame({
+        'id': np.asarray(poi_tabell.id, dtype='i8'),
+        'name': poi_tabell.kolumn('name', saknas='Okänd lekplats'),
+        'lat': np.asarray(poi_tabell.lat, dtype='f4'),
+        'lon': np.asarray(poi_tabell.lon, dtype='f4'),
+        'typ': pd.Categorical.from_codes(np.zeros(len(poi_tabell), dtype='i1'), categories=['lekplats']),
+    })
+
+
+def ladda_toaletter(poi_tabell):
+    return pd.DataFrame({
+        'lat': np.asarray(poi_tabell.lat, dtype='f4'),
+        'lon': np.asarray(poi_tabell.lon, dtype='f4'),
+    })
+
+
+def ladda_data(lekplats_fil, hållplats_fil, toalett_fil, katalog=forberakning.STANDARDKATALOG):
+    lekplatser_df = ladda_lekplatser(poi_lager.ladda_poi(lekplats_fil, katalog))
+    stops_df = forberakning.läs_hållplatser(hållplats_fil)
+    toaletter_df = ladda_toaletter(poi_lager.ladda_poi(toalett_fil, katalog))
+    return lekplatser_df, stops_df, toaletter_df
+
+
+# --- 2. Kombinera lekplatser och hållplatser ---
+# Etiketterna blir desamma som i en gemensam tabell (lekplatser 0..n-1, hållplatserna efter),
+# men utan att slå ihop och dela upp tabellerna igen.
+def kombinera(lekplatser_df, stops_df):
+    antal = len(lekplatser_df)
+    lekplatser = lekplatser_df.set_axis(pd.RangeIndex(antal))
+    hållplatser = stops_df[['name', 'lat', 'lon', 'typ']].set_axis(pd.RangeIndex(antal, antal + len(stops_df)))
+    return lekplatser, hållplatser
+
+
+# --- 3. Avstånd från varje lekplats till närmaste hållplats och toalett ---
+# `förberäknat` är artefakten från forberakning.ladda_avstånd (samma ordning som lekplatserna).
+def lägg_till_avstånd(lekplatser, förberäknat):
+    return lekplatser.assign(
+        avstånd_m=np.asarray(förberäknat['avstånd_m'], dtype='f4'),
+        avstånd_toalett=np.asarray(förberäknat['avstånd_toalett'], dtype='f4'),
+    )
+
+
+# --- Steg 1-3 för en uppsättning indatafiler: (lekplatser med avstånd, hållplatser, toaletter) ---
+def förbered(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil=None, katalog=forberakning.STANDARDKATALOG):
+    with matning.steg("inläsning"):
+        lekplatser_df, stops_df, toaletter_df = ladda_data(lekplats_fil, hållplats_fil, toalett_fil, katalog)
+    with matning.steg("kombinera", rader=len(lekplatser_df) + len(stops_df)):
+        lekplatser, hållplatser = kombinera(lekplatser_df, stops_df)
+    with matning.steg("avstånd", rader=len(lekplatser)):
+        förberäknat = forberakning.ladda_avstånd(
+            lekplats_fil, hållplats_fil, toalett_fil, katalog=katalog, gångnät_fil=gångnät_fil
+        )
+        lekplatser = lägg_till_avstånd(lekplatser, förberäknat)
+    return lekplatser, hållplatser, toaletter_df
+
+
+# Avstånd till lager som inte är förberäknade (bänkar, kaféer, ...); motor är en bekvamligheter.Avståndsmotor
+def lägg_till_lager_avstånd(lekplatser, motor, lager):
+    lager = [namn for namn in lager if namn not in bekvamligheter.FÖRBERÄKNADE]
+    return motor.lägg_till_kolumner(lekplatser, lager) if lager else lekplatser
+
+
+# --- 4. Klustra lekplatserna utifrån valt kriterium och tilldela färger ---
+# klustringsval är ett av KLUSTRINGSVAL eller ett eget urval av lager, t.ex. ('toaletter', 'bänkar').
+# Med en sparad klustring.Klustermodell (`modell`) tilldelas lekplatserna modellens kluster
+# utan ny anpassning, och färgerna följer modellens ordning.
+def klustra_lekplatser(lekplatser, klustringsval, modell=None):
+    # Välj variabler beroende på klustringsval
+    urval = bekvamligheter.urval_för(klustringsval)
+    valda_kolumner = bekvamligheter.kolumner(urval)
+    lekplatser = lekplatser.dropna(subset=valda_kolumner)
+    X = lekplatser[valda_kolumner].values
+    n_clusters = klustring.antal_kluster(urval)
+    combo = lekplatser[valda_kolumner].sum(axis=1)
+
+    if modell is None:
+        from sklearn.cluster import KMeans
+        from sklearn.preprocessing import StandardScaler
+
+        # Standardisera (skala) värden för att förbättra klustring
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+
+        # Klustring
+        with matning.steg("kmeans", rader=len(X_scaled)):
+            kmeans = KMeans(n_clusters=n_clusters, random_state=0, n_init='auto').fit(X_scaled)
+
+        #  Uppdatera lekplatser-DataFrame med klustertillhörighet
+        lekplatser['kluster'] = kmeans.labels_.astype('i1')
+
+        # Sortera kluster baserat på medelavstånd (summan över valda lager) för att få konsekventa färger
+        kluster_medel = combo.groupby(lekplatser['kluster']).mean().sort_values()
+    else:
+        with matning.steg("kmeans_tilldela", rader=len(X)):
+            lekplatser['kluster'] = modell.tilldela(X).astype('i1')
+
+        # Modellens färgordning; tomma kluster behåller sin plats (medel NaN)
+        n_clusters = modell.n_clusters
+        kluster_medel = combo.groupby(lekplatser['kluster']).mean().reindex(modell.ordning)
+
+    # Tilldela färger till kluster
+    tillgängliga_färger = ['green', 'orange', 'red', 'purple', 'black']
+    färger_sorterade = tillgängliga_färger[:n_clusters]
+    färgkarta = {kluster: färger_sorterade[i] for i, kluster in enumerate(kluster_medel.index)}
+    lekplatser['färg'] = pd.Categorical(lekplatser['kluster'].map(färgkarta), categories=färger_sorterade)
+    return lekplatser, kluster_medel, färger_sorterade, färgkarta
+
+
+# --- Tilldela färg baserat på avstånd till vald hållplats ---
+def färg_avstånd(avstånd):
+    if avstånd < 181:
+        return 'green'
+    elif avstånd < 344:
+        return 'orange'
+    elif avstånd < 596:
+        return 'red'
+    else:
+        return 'purple'
+
+
+# --- 5. Lekplatser inom en viss radie från vald hållplats, med färg efter avståndet ---
+# Med grannar = (index, avstånd) från radiefraga.Grannlista.inom räknas inga avstånd om.
+# Index är lekplatsens position i lekplatsfilen, vilket är dess etikett efter kombinera().
+def lekplatser_inom_radie(lekplatser, vald_position, radie, grannar=None):
+    if grannar is None:
+        avstånd_till_vald = radvisa_avstånd(
+            lekplatser['lat'], lekplatser['lon'], *vald_position, läge="vincenty"
+        )
+        inom = avstånd_till_vald <= radie
+        lekplatser_nära = lekplatser[inom]
+        lekplatser_nära['avstånd_till_vald'] = avstånd_till_vald[inom]
+    else:
+        index, avstånd = grannar
+        finns = np.isin(index, lekplatser.index)
+        lekplatser_nära = lekplatser.loc[index[finns]]
+        lekplatser_nära['avstånd_till_vald'] = np.asarray(avstånd[finns], dtype=float)
+    lekplatser_nära['färg_filtrerad'] = lekplatser_nära['avstånd_till_vald'].apply(färg_avstånd)
+    return lekplatser_nära
+
+
+# --- 6a. Bygg kartan ---
+# punktlager: {lagernamn: DataFrame med lat/lon} för de lager utöver hållplatser som kan visas.
+# Med vald_hållplats (en rad ur hållplatser) visas bara lekplatser_nära och punkter inom radien;
+# nära = {lagernamn: (index, avstånd)} från radiefraga.Grannlista.inom sparar avståndsberäkningen.
+# värmekarta = (bild, område, namn) läggs under punkterna (se tillganglighet.som_bild).
+def bygg_karta(lekplatser, hållplatser, punktlager, klustringsval,
+               vald_hållplats=None, lekplatser_nära=None, radie=None, läge="bulk", nära=None, värmekarta=None,
+               centrum=None):
+    import folium
+
+    import kartlager
+
+    urval = bekvamligheter.urval_för(klustringsval)
+    nära = nära or {}
+    if vald_hållplats is not None:
+        # Filtrerat läge – lekplatser nära vald hållplats, karta centrerad på hållplatsen
+        vald_position = (vald_hållplats['lat'], vald_hållplats['lon'])
+        karta = kartlager.skapa_karta(list(vald_position), zoom_start=14, läge=läge)
+        synliga, färgkolumn = lekplatser_nära, 'färg_filtrerad'
+    else:
+        # Standardläge – visa alla lekplatser
+        karta = kartlager.skapa_karta(centrum or STANDARDCENTRUM, zoom_start=12, läge=läge)
+        synliga, färgkolumn = lekplatser, 'färg'
+    if värmekarta is not None:
+        kartlager.lägg_till_värmekarta(karta, *värmekarta)
+    kartlager.lägg_till_ikoner(
+        karta, synliga['lat'], synliga['lon'], synliga[färgkolumn],
+        kartlager.lekplats_popups(synliga, klustringsval), ikon='child',
+        läge=läge, namn="Lekplatser"
+    )
+
+    # Visa hållplatser (alla eller bara den valda)
+    if 'hållplatser' in urval:
+        if vald_hållplats is None:
+            kartlager.lägg_till_hållplatser(karta, hållplatser, läge=läge)
+        else:
+            folium.CircleMarker(
+                location=vald_position,
+                radius=4,
+                color='blue',
+                fill=True,
+                fill_color='blue',
+                fill_opacity=0.7,
+                popup=vald_hållplats['name']
+            ).add_to(karta)
+
+    # Visa övriga valda lager (t.ex. toaletter), inom vald radie om en hållplats är vald
+    for lager, rubrik, punkter, popups in _övriga_lager(urval, punktlager, vald_hållplats, radie, nära):
+        kartlager.lägg_till_ikoner(
+            karta, punkter['lat'], punkter['lon'], ['gray'] * len(punkter),
+            popups, ikon=lager.ikon, läge=läge, namn=rubrik
+        )
+    return karta
+
+
+# --- Valda lager utöver hållplatser: (lager, rubrik, punkter, popups), inom radien om en hållplats är vald ---
+def _övriga_lager(urval, punktlager, vald_hållplats, radie, nära):
+    for namn in urval:
+        if namn == 'hållplatser':
+            continue
+        lager = bekvamligheter.REGISTER[namn]
+        punkter = punktlager[namn]
+        rubrik = lager.etikett.capitalize()
+        if vald_hållplats is not None and namn in nära:
+            index, avstånd = nära[namn]
+            punkter = punkter.iloc[index]
+            popups = [f"{rubrik} ({int(a)} m från hållplats)" for a in avstånd]
+        elif vald_hållplats is not None:
+            avstånd_till_vald = radvisa_avstånd(
+                punkter['lat'], punkter['lon'], vald_hållplats['lat'], vald_hållplats['lon'], läge="vincenty"
+            )
+            inom = avstånd_till_vald <= radie
+            punkter = punkter[inom]
+            popups = [f"{rubrik} ({int(a)} m från hållplats)" for a in avstånd_till_vald[inom]]
+        else:
+            popups = [rubrik] * len(punkter)
+        yield lager, rubrik, punkter, popups
+
+
+# --- 6a (interaktivt). Lagren för kartans utsnitt, till st_folium ---
+# Samma lager som bygg_karta, men bara det som syns i bbox (syd, väst, nord, öst): enskilda
+# punkter inzoomat, annars antal per cell (se vyport.py). Returnerar en folium.FeatureGroup
+# som st_folium lägger på en grundkarta utan att ladda om den.
+# index: {lagernamn: vyport.Rutindex} byggda på tabellerna i anropet; saknade byggs här
+# (t.ex. för lekplatser_nära, som redan är begränsad till radien).
+def bygg_vyportlager(lekplatser, hållplatser, punktlager, klustringsval, bbox, zoom, index=None,
+                     vald_hållplats=None, lekplatser_nära=None, radie=None, nära=None, värmekarta=None):
+    import folium
+
+    import kartlager
+    import vyport
+
+    urval = bekvamligheter.urval_för(klustringsval)
+    # Med vald hållplats är tabellerna redan begränsade till radien och indexen gäller inte dem
+    index = (index or {}) if vald_hållplats is None else {}
+    nära = nära or {}
+    lager_grupp = folium.FeatureGroup(name="Utsnitt")
+    if värmekarta is not None:
+        kartlager.lägg_till_värmekarta(lager_grupp, *värmekarta)
+
+    def välj(namn, punkter):
+        rutindex = index.get(namn) or vyport.Rutindex(punkter['lat'], punkter['lon'])
+        typ, urvalet = vyport.välj(rutindex, bbox, zoom)
+        if typ == "celler":
+            kartlager.lägg_till_celler(lager_grupp, *urvalet, etikett=namn, färg=CELLFÄRGER.get(namn, 'gray'))
+            return None
+        return urvalet
+
+    if vald_hållplats is not None:
+        lekplatser, färgkolumn = lekplatser_nära, 'färg_filtrerad'
+    else:
+        färgkolumn = 'färg'
+    positioner = välj('lekplatser', lekplatser)
+    if positioner is not None:
+        synliga = lekplatser.iloc[positioner]
+        kartlager.lägg_till_ikoner(
+            lager_grupp, synliga['lat'], synliga['lon'], synliga[färgkolumn],
+            kartlager.lekplats_popups(synliga, klustringsval), ikon='child', namn="Lekplatser"
+        )
+
+    if 'hållplatser' in urval:
+        if vald_hållplats is None:
+            positioner = välj('hållplatser', hållplatser)
+            if positioner is not None:
+                kartlager.lägg_till_hållplatser(lager_grupp, hållplatser.iloc[positioner])
+        else:
+            folium.CircleMarker(
+                location=(vald_hållplats['lat'], vald_hållplats['lon']),
+                radius=4,
+                color='blue',
+                fill=True,
+                fill_color='blue',
+                fill_opacity=0.7,
+                popup=vald_hållplats['name']
+            ).add_to(lager_grupp)
+
+    for lager, rubrik, punkter, popups in _övriga_lager(urval, punktlager, vald_hållplats, radie, nära):
+        positioner = välj(lager.namn, punkter)
+        if positioner is not None:
+            synliga = punkter.iloc[positioner]
+            kartlager.lägg_till_ikoner(
+                lager_grupp, synliga['lat'], synliga['lon'], ['gray'] * len(synliga),
+                np.asarray(popups, dtype=object)[positioner], ikon=lager.ikon, namn=rubrik
+            )
+    return lager_grupp
+
+
+# --- 6b. Dynamisk legend ---
+def skapa_legend(lekplatser, klustringsval, kluster_medel, färger_sorterade, färgkarta):
+    urval = bekvamligheter.urval_för(klustringsval)
+    if len(urval) == 1:
+        lager = bekvamligheter.REGISTER[urval[0]]
+        kluster_max = lekplatser.groupby('kluster')[lager.kolumn].max()
+        beskrivningstyp = f"till {lager.etikett}"
+        kluster_beskrivning = {
+            färgkarta[kl]: f"max {uppskattad_gångtid(kluster_max[kl])} {beskrivningstyp}" for kl in kluster_max.index
+        }
+    else:
+        kvalitetsnivåer = {
+            0: "Enkel att nå, bekvämt belägen",
+            1: "Tillgänlig men ej optimal",
+            2: "Promenadavstånd",
+            3: "Ligger en bit bort",
+            4: "Avlägsen"
+        }
+        kluster_beskrivning = {
+            färgkarta[kl]: kvalitetsnivåer.get(i, "") for i, kl in enumerate(kluster_medel.index)
+        }
+
+    # Skapar HTML för dynamisk legend
+    legend_html = "<div class='lekplats-legend'>"
+    for färg in färger_sorterade:
+        text = kluster_beskrivning.get(färg, "")
+        emoji = {
+            'green': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-green.png' width='20px'>",
+            'orange': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-orange.png' width='20px'>",
+            'red': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-red.png' width='20px'>",
+            'purple': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-violet.png' width='20px'>",
+            'black': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-black.png' width='20px'>"
+        }.get(färg, "")
+
+        legend_html += f"{emoji} Lekplats ({text})<br>"
+    legend_html += "🔵 Hållplats<br>"
+    for namn in urval:
+        if namn != 'hållplatser':
+            lager = bekvamligheter.REGISTER[namn]
+            legend_html += f"{lager.symbol} {lager.etikett.capitalize()}<br>"
+    legend_html += "</div>"
+    return legend_html
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import forberakning
+
+# --- Kompakt kolumnformat för POI-data (lekplatser, toaletter) ---
+# JSON-filerna från OSM är fortfarande källan, men konverteras en gång till en katalog
+# med en .npy-fil per kolumn: id/lat/lon som tal och taggar som heltalskoder mot en
+# gemensam strängtabell (internering). Kolumnerna läses minnesmappade, så inläsningen
+# kräver varken JSON-parsning eller ett Python-objekt per element.
+#
+#   forberaknat/<filnamn>_<hash>/
+#       id.npy, lat.npy, lon.npy       int64/float64
+#       <tagg>.npy                     int32-koder, -1 = taggen saknas
+#       strängar.json                  {tagg: [värde, ...]}
+
+FORMAT_VERSION = 1
+
+# Taggar som sparas som kolumner
+TAGGAR = ('name', 'access', 'fee', 'wheelchair', 'changing_table', 'opening_hours')
+
+
+def _katalog_för(json_fil, katalog):
+    stam = os.path.splitext(os.path.basename(json_fil))[0]
+    nyckel = forberakning.innehållshash(json_fil, version=f"poi{FORMAT_VERSION}")
+    return os.path.join(katalog, f"{stam}_{nyckel}"), stam
+
+
+# --- Konvertera en OSM-JSON-fil till kolumnformatet ---
+def konvertera(json_fil, katalog=forberakning.STANDARDKATALOG):
+    målkatalog, stam = _katalog_för(json_fil, katalog)
+    element = forberakning.läs_osm_json(json_fil)
+
+    tmp = f"{målkatalog}.{os.getpid()}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    np.save(os.path.join(tmp, "id.npy"), np.array([el['id'] for el in element], dtype='i8'))
+    np.save(os.path.join(tmp, "lat.npy"), np.array([el['lat'] for el in element], dtype='f8'))
+    np.save(os.path.join(tmp, "lon.npy"), np.array([el['lon'] for el in element], dtype='f8'))
+
+    strängar = {}
+    for tagg in TAGGAR:
+        värden = pd.Series([el.get('tags', {}).get(tagg) for el in element], dtype=object)
+        koder, unika = pd.factorize(värden, use_na_sentinel=True)
+        np.save(os.path.join(tmp, f"{tagg}.npy"), koder.astype('i4'))
+        strängar[tagg] = [str(v) for v in unika]
+    with open(os.path.join(tmp, "strängar.json"), "w", encoding="utf-8") as f:
+        json.dump(strängar, f, ensure_ascii=False)
+
+    # Byt in den nya katalogen och ta bort äldre versioner av samma fil
+    if os.path.exists(målkatalog):
+        shutil.rmtree(tmp)
+    else:
+        os.replace(tmp, målkatalog)
+    # Bara <stam>_<nyckel>: lekplatser_* skulle annars även träffa lekplatser_ny_<nyckel>
+    for gammal in forberakning.filer_med_nyckel(katalog, stam):
+        if gammal != målkatalog and os.path.isdir(gammal):
+            shutil.rmtree(gammal, ignore_errors=True)
+    return målkatalog
+
+
+# --- En inläst POI-tabell: minnesmappade kolumner + strängtabeller ---
+class PoiTabell:
+    def __init__(self, katalog):
+        self.katalog = katalog
+        self.id = np.load(os.path.join(katalog, "id.npy"), mmap_mode='r')
+        self.lat = np.load(os.path.join(katalog, "lat.npy"), mmap_mode='r')
+        self.lon = np.load(os.path.join(katalog, "lon.npy"), mmap_mode='r')
+        with open(os.path.join(katalog, "strängar.json"), "r", encoding="utf-8") as f:
+            self.strängar = json.load(f)
+
+    def __len__(self):
+        return len(self.id)
+
+    def koder(self, tagg):
+        return np.load(os.path.join(self.katalog, f"{tagg}.npy"), mmap_mode='r')
+
+    # --- En taggkolumn som pandas-kategori; saknade värden ersätts med 'saknas' om det anges ---
+    def kolumn(self, tagg, saknas=None):
+        kategorier = list(self.strängar[tagg])
+        koder = np.asarray(self.koder(tagg))
+        if saknas is not None:
+            if saknas not in kategorier:
+                kategorier.append(saknas)
+            koder = np.where(koder < 0, kategorier.index(saknas), koder)
+        return pd.Categorical.from_codes(koder, categories=kategorier)
+
+
+# --- Läs POI-tabellen för en JSON-fil, konvertera först om den saknas eller är inaktuell ---
+def ladda_poi(json_fil, katalog=forberakning.STANDARDKATALOG):
+    målkatalog, _ = _katalog_för(json_fil, katalog)
+    if not os.path.isdir(målkatalog):
+        målkatalog = konvertera(json_fil, katalog)
+    return PoiTabell(målkatalog)
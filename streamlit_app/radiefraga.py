@@ -0,0 +1,132 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import forberakning
+
+# --- Punkter inom en radie från alla hållplatser på en gång ---
+# För varje hållplats sparas alla lekplatser (eller toaletter) inom MAX_RADIE_M, sorterade
+# på avstånd, i ett CSR-liknande format: start[i]:start[i+1] pekar ut hållplats i:s
+# grannar i `index` och `avstånd`. Eftersom grannarna är sorterade blir frågan
+# "inom R meter" för vilket R ≤ MAX_RADIE_M som helst bara ett prefix, så reglaget i
+# appen kräver ingen ny avståndsberäkning. Avstånden är geodetiska (Vincenty), samma
+# som radiefiltret i appen.
+#
+# Grannlistorna byggs en gång per uppsättning indatafiler och sparas som .npz bredvid
+# avståndsartefakten (forberaknat/grannar_<dataset>_<hash>.npz).
+
+FORMAT_VERSION = 1
+
+# Reglagets största värde i appen
+MAX_RADIE_M = 2000
+
+
+class Grannlista:
+    def __init__(self, start, index, avstånd, max_radie=MAX_RADIE_M):
+        self.start = np.asarray(start, dtype='i8')
+        self.index = np.asarray(index, dtype='i4')
+        self.avstånd = np.asarray(avstånd, dtype='f4')
+        self.max_radie = float(max_radie)
+        self._rad = None
+
+    # Antal hållplatser
+    def __len__(self):
+        return len(self.start) - 1
+
+    # --- Bygg från hållplatsernas och punkternas koordinater i ett svep ---
+    @classmethod
+    def bygg(cls, hållplats_lat, hållplats_lon, lat, lon, max_radie=MAX_RADIE_M):
+        from sokindex import PunktIndex  # scikit-learn behövs bara när listorna byggs
+        alla_index, alla_avstånd = PunktIndex(lat, lon).inom_radie(
+            hållplats_lat, hållplats_lon, max_radie, exakt=True
+        )
+        antal = np.array([len(rad) for rad in alla_index], dtype='i8')
+        start = np.concatenate([[0], np.cumsum(antal)])
+        index = np.concatenate(alla_index) if len(alla_index) else np.empty(0, dtype='i4')
+        avstånd = np.concatenate(alla_avstånd) if len(alla_avstånd) else np.empty(0)
+        return cls(start, index, avstånd, max_radie)
+
+    def spara(self, sökväg):
+        np.savez(sökväg, start=self.start, index=self.index, avstånd=self.avstånd, max_radie=self.max_radie)
+
+    @classmethod
+    def ladda(cls, sökväg):
+        with np.load(sökväg) as data:
+            return cls(data['start'], data['index'], data['avstånd'], float(data['max_radie']))
+
+    # --- Punkter inom radie meter från hållplats nummer `hållplats` (index, avstånd), närmast först ---
+    def inom(self, hållplats, radie):
+        if radie > self.max_radie:
+            raise ValueError(f"Radien {radie} m är större än grannlistans {self.max_radie:.0f} m")
+        början, slut = self.start[hållplats], self.start[hållplats + 1]
+        antal = np.searchsorted(self.avstånd[början:slut], radie, side='right')
+        return self.index[början:början + antal], self.avstånd[början:början + antal]
+
+    # --- Antal punkter inom varje radie för alla hållplatser, formen (antal hållplatser, antal radier) ---
+    def antal_inom(self, radier):
+        if self._rad is None:
+            self._rad = np.repeat(np.arange(len(self)), np.diff(self.start))
+        radier = np.atleast_1d(radier)
+        if radier.max(initial=0) > self.max_radie:
+            raise ValueError(f"Radierna får vara högst {self.max_radie:.0f} m")
+        return np.column_stack([
+            np.bincount(self._rad[self.avstånd <= r], minlength=len(self)) for r in radier
+        ]) if len(radier) else np.empty((len(self), 0), dtype=int)
+
+
+def _sökväg(dataset, nyckel, katalog):
+    return os.path.join(katalog, f"grannar_{dataset}_{nyckel}.npz")
+
+
+# --- Läs (eller bygg och spara) grannlistor för lekplatser och toaletter ---
+# Hållplatserna numreras i samma ordning som forberakning.läs_hållplatser ger dem.
+def ladda_grannlistor(lekplats_fil, hållplats_fil, toalett_fil, katalog=forberakning.STANDARDKATALOG,
+                      max_radie=MAX_RADIE_M):
+    hållplatser = None
+    grannlistor = {}
+    for dataset, poi_fil in (("lekplatser", lekplats_fil), ("toaletter", toalett_fil)):
+        nyckel = forberakning.innehållshash(
+            hållplats_fil, poi_fil, version=f"grannar{FORMAT_VERSION}-{max_radie}"
+        )
+        sökväg = _sökväg(dataset, nyckel, katalog)
+        if os.path.exists(sökväg):
+            grannlistor[dataset] = Grannlista.ladda(sökväg)
+            continue
+
+        if hållplatser is None:
+            hållplatser = forberakning.läs_hållplatser(hållplats_fil)
+        element = forberakning.läs_osm_json(poi_fil)
+        grannlista = Grannlista.bygg(
+            hållplatser['lat'], hållplatser['lon'],
+            [el['lat'] for el in element], [el['lon'] for el in element], max_radie
+        )
+        os.makedirs(katalog, exist_ok=True)
+        tmp = f"{sökväg}.{os.getpid()}.tmp.npz"
+        grannlista.spara(tmp)
+        os.replace(tmp, sökväg)
+        # Exakt nyckel, så att andra processers temporära filer (....tmp.npz) inte tas bort
+        forberakning.ta_bort_äldre(sökväg, f"grannar_{dataset}", ".npz")
+        grannlistor[dataset] = grannlista
+    return grannlistor
+
+
+# --- Rangordna hållplatser efter hur många lekplatser och toaletter som finns inom varje radie ---
+def rangordna_hållplatser(hållplatser, grannlistor, radier=(500, 1000)):
+    tabell = pd.DataFrame({'name': np.asarray(hållplatser['name']).astype(str)})
+    for dataset, grannlista in grannlistor.items():
+        antal = grannlista.antal_inom(radier)
+        for i, radie in enumerate(radier):
+            tabell[f"{dataset}_{radie}m"] = antal[:, i]
+    sortering = [f"{dataset}_{radier[0]}m" for dataset in grannlistor]
+    return tabell.sort_values(sortering, ascending=False, kind="stable")
+
+
+if __name__ == "__main__":
+    # Ex: python radiefraga.py 500 1000   (skriver de 10 hållplatser som har flest lekplatser nära)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    filer = [os.path.join(current_dir, namn) for namn in ("lekplatser_ny.json", "stops.txt", "toaletter.json")]
+    radier = tuple(int(r) for r in sys.argv[1:]) or (500, 1000)
+    tabell = rangordna_hållplatser(forberakning.läs_hållplatser(filer[1]), ladda_grannlistor(*filer), radier)
+    print(tabell.head(10).to_string(index=False))
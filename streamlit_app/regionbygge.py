@@ -0,0 +1,128 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import forberakning
+import gtfs
+import regioner
+from osm_uppdatering import FILNAMN, filtrera, skriv_element
+
+# --- Bygg regionernas shardar från nationella indatafiler ---
+# 1. Uppdelning (i huvudprocessen): den nationella GTFS-filen (stops.txt eller zip) läses en
+#    gång, block för block, och varje block skrivs till stops.txt i de regioner vars ruta det
+#    träffar; minnet hålls till ett block. Varje nationellt OSM-lager (Overpass-JSON) läses en
+#    gång och delas upp på samma sätt. region.json skrivs sist, och bara i kompletta shardar.
+# 2. Förberäkning (en process per region, parallellt): avstånd, POI-kolumner, grannlistor och
+#    (valfritt) tillgänglighetsraster i shardens forberaknat/, med samma funktioner som appen
+#    annars kör vid första start. Varje region har en egen katalog, så processerna skriver
+#    aldrig till samma filer.
+# Regioner som saknar hållplatser, lekplatser eller toaletter får sina filer men förberäknas
+# inte och visas inte i appen.
+
+KRÄVDA_LAGER = ('lekplatser', 'toaletter')
+
+
+def _inom(lat, lon, bbox):
+    syd, väst, nord, öst = bbox
+    return (lat >= syd) & (lat <= nord) & (lon >= väst) & (lon <= öst)
+
+
+# --- Dela upp den nationella GTFS-filen på regionerna; antal hållplatsrader per region ---
+def dela_hållplatser(gtfs_källa, regionlista, bas=regioner.SHARDKATALOG, blockstorlek=gtfs.BLOCKSTORLEK):
+    sökvägar = {r.id: os.path.join(regioner.shardkatalog(r.id, bas), "stops.txt") for r in regionlista}
+    tmp = {id_: f"{sökväg}.{os.getpid()}.tmp" for id_, sökväg in sökvägar.items()}
+    antal = dict.fromkeys(sökvägar, 0)
+    filer = {}
+    try:
+        for id_, sökväg in tmp.items():
+            os.makedirs(os.path.dirname(sökväg), exist_ok=True)
+            filer[id_] = open(sökväg, "w", encoding="utf-8", newline="")
+            filer[id_].write(",".join(gtfs.KOLUMNER) + "\n")
+        for block in gtfs.läs_block(gtfs_källa, blockstorlek):
+            lat, lon = block['stop_lat'].to_numpy(), block['stop_lon'].to_numpy()
+            for region in regionlista:
+                del_block = block[_inom(lat, lon, region.bbox)]
+                if len(del_block):
+                    del_block.to_csv(filer[region.id], header=False, index=False)
+                    antal[region.id] += len(del_block)
+    finally:
+        for f in filer.values():
+            f.close()
+    for id_, sökväg in sökvägar.items():
+        os.replace(tmp[id_], sökväg)
+    return antal
+
+
+# --- Dela upp ett nationellt OSM-lager på regionerna; antal element per region ---
+def dela_osm(dataset, osm_fil, regionlista, bas=regioner.SHARDKATALOG):
+    element = forberakning.läs_osm_json(osm_fil)
+    element = element['elements'] if isinstance(element, dict) else element
+    element = [el for el in element if 'lat' in el and 'lon' in el]
+    lat = np.array([el['lat'] for el in element], dtype=float)
+    lon = np.array([el['lon'] for el in element], dtype=float)
+    antal = {}
+    for region in regionlista:
+        urval = filtrera(dataset, [element[i] for i in np.flatnonzero(_inom(lat, lon, region.bbox))])
+        katalog = regioner.shardkatalog(region.id, bas)
+        os.makedirs(katalog, exist_ok=True)
+        skriv_element(os.path.join(katalog, FILNAMN[dataset]), urval)
+        antal[region.id] = len(urval)
+    return antal
+
+
+# --- Förberäkna en regions filer; körs i en egen process per region ---
+def förberäkna(region_id, bas=regioner.SHARDKATALOG, upplösning_m=None):
+    import poi_lager
+    import radiefraga
+    import tillganglighet
+
+    start = time.perf_counter()
+    katalog = regioner.shardkatalog(region_id, bas)
+    förberäknat = os.path.join(katalog, "forberaknat")
+    filer = [os.path.join(katalog, namn) for namn in (FILNAMN['lekplatser'], "stops.txt", FILNAMN['toaletter'])]
+
+    forberakning.ladda_avstånd(*filer, katalog=förberäknat)
+    for filnamn in FILNAMN.values():
+        if os.path.exists(os.path.join(katalog, filnamn)):
+            poi_lager.ladda_poi(os.path.join(katalog, filnamn), förberäknat)
+    radiefraga.ladda_grannlistor(*filer, katalog=förberäknat)
+    if upplösning_m:
+        tillganglighet.ladda_raster(
+            filer[1], filer[2], område=regioner.hämta(region_id, bas).bbox, upplösning_m=upplösning_m,
+            katalog=förberäknat
+        )
+    return region_id, time.perf_counter() - start
+
+
+# --- Hela bygget: dela upp indata och förberäkna regionerna parallellt ---
+# osm_källor: {dataset: nationell OSM-JSON}; lekplatser och toaletter krävs.
+# Returnerar {region_id: {'hållplatser': n, 'lekplatser': n, ..., 'sekunder': s eller None}}.
+def bygg(regionlista, gtfs_källa, osm_källor, bas=regioner.SHARDKATALOG, max_processer=None, upplösning_m=None):
+    saknas = [dataset for dataset in KRÄVDA_LAGER if dataset not in osm_källor]
+    if saknas:
+        raise ValueError(f"Nationella OSM-filer saknas för {', '.join(saknas)}")
+
+    antal = {'hållplatser': dela_hållplatser(gtfs_källa, regionlista, bas)}
+    for dataset, osm_fil in osm_källor.items():
+        antal[dataset] = dela_osm(dataset, osm_fil, regionlista, bas)
+    # Bara kompletta regioner får region.json och syns därmed i appen (regioner.tillgängliga)
+    kompletta = [r.id for r in regionlista if all(antal[d][r.id] for d in ('hållplatser',) + KRÄVDA_LAGER)]
+    for region in regionlista:
+        katalog = regioner.shardkatalog(region.id, bas)
+        if region.id in kompletta:
+            regioner.skriv(region, katalog)
+        elif os.path.exists(os.path.join(katalog, regioner.REGIONFIL)):
+            os.remove(os.path.join(katalog, regioner.REGIONFIL))
+    tider = {}
+    if kompletta:
+        max_processer = max_processer or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(max_processer, len(kompletta))) as pool:
+            jobb = [pool.submit(förberäkna, region_id, bas, upplösning_m) for region_id in kompletta]
+            tider = dict(j.result() for j in jobb)
+
+    return {
+        r.id: {**{dataset: per_region[r.id] for dataset, per_region in antal.items()}, 'sekunder': tider.get(r.id)}
+        for r in regionlista
+    }
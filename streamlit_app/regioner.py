@@ -0,0 +1,126 @@
+import json
+import os
+
+# --- Regioner ---
+# Appen kan visa flera kommuner från samma installation. Varje region har en egen katalog
+# (shard) med samma filer som appen har bredvid sig för Göteborg, plus sina förberäknade
+# filer och en region.json med regionens ruta och kartcentrum:
+#
+#   <SHARDKATALOG>/<id>/
+#       region.json                 id, namn, bbox (syd, väst, nord, öst), centrum, zoom
+#       stops.txt                   hållplatserna inom rutan (ur den nationella GTFS-filen)
+#       lekplatser_ny.json, toaletter.json, ...   OSM-lagren inom rutan
+#       forberaknat/                avstånd, grannlistor, POI-kolumner, tillgänglighetsraster
+#
+# Shardarna byggs av bygg_regioner.py (se regionbygge.py). Standardregionen (Göteborg)
+# använder filerna bredvid appen om den inte har en egen shard. Hållplatserna filtreras på
+# rutan i region.json bredvid stops.txt (se område_för), annars på standardregionens ruta.
+# Modulen använder bara standardbiblioteket så att appen kan välja region före första ritningen.
+
+APPKATALOG = os.path.dirname(os.path.abspath(__file__))
+SHARDKATALOG = os.environ.get("REGIONKATALOG") or os.path.join(APPKATALOG, "regioner")
+REGIONFIL = "region.json"
+
+
+class Region:
+    def __init__(self, id, namn, bbox, centrum=None, zoom=12):
+        self.id = id                # katalognamn, bara a-z
+        self.namn = namn            # visas i appen
+        self.bbox = tuple(bbox)     # (syd, väst, nord, öst), samma ordning som i Overpass-frågorna
+        syd, väst, nord, öst = self.bbox
+        self.centrum = list(centrum) if centrum is not None else [(syd + nord) / 2, (väst + öst) / 2]
+        self.zoom = zoom
+
+    def som_dict(self):
+        return {'id': self.id, 'namn': self.namn, 'bbox': list(self.bbox), 'centrum': self.centrum, 'zoom': self.zoom}
+
+    @classmethod
+    def från_dict(cls, data):
+        return cls(data['id'], data['namn'], data['bbox'], data.get('centrum'), data.get('zoom', 12))
+
+
+REGISTER = {}
+
+
+def registrera(region):
+    REGISTER[region.id] = region
+    return region
+
+
+registrera(Region("goteborg", "Göteborg", (57.5, 11.7, 57.85, 12.1), centrum=(57.7, 11.97)))
+registrera(Region("stockholm", "Stockholm", (59.22, 17.76, 59.44, 18.20), centrum=(59.33, 18.06)))
+registrera(Region("malmo", "Malmö", (55.49, 12.89, 55.65, 13.16), centrum=(55.60, 13.00)))
+registrera(Region("uppsala", "Uppsala", (59.78, 17.53, 59.92, 17.75), centrum=(59.858, 17.64)))
+registrera(Region("linkoping", "Linköping", (58.36, 15.50, 58.46, 15.70), centrum=(58.41, 15.62)))
+registrera(Region("orebro", "Örebro", (59.22, 15.10, 59.32, 15.30), centrum=(59.274, 15.21)))
+
+STANDARDREGION = "goteborg"
+
+
+def standard():
+    return REGISTER[STANDARDREGION]
+
+
+def shardkatalog(region_id, bas=SHARDKATALOG):
+    return os.path.join(bas, region_id)
+
+
+def _har_shard(region_id, bas):
+    return os.path.exists(os.path.join(shardkatalog(region_id, bas), REGIONFIL))
+
+
+# --- Regionerna som har data: byggda shardar, och standardregionen om den har filer bredvid appen ---
+def tillgängliga(bas=SHARDKATALOG):
+    ids = sorted(namn for namn in (os.listdir(bas) if os.path.isdir(bas) else []) if _har_shard(namn, bas))
+    if STANDARDREGION not in ids and os.path.exists(os.path.join(APPKATALOG, "stops.txt")):
+        ids.insert(0, STANDARDREGION)
+    return ids
+
+
+# --- Regionen som den är sparad i sin shard (eller i registret om den inte har någon) ---
+def hämta(region_id, bas=SHARDKATALOG):
+    if _har_shard(region_id, bas):
+        with open(os.path.join(shardkatalog(region_id, bas), REGIONFIL), "r", encoding="utf-8") as f:
+            return Region.från_dict(json.load(f))
+    if region_id not in REGISTER:
+        raise KeyError(f"Okänd region {region_id!r}, välj bland {sorted(REGISTER)}")
+    return REGISTER[region_id]
+
+
+# --- Katalogen med regionens indatafiler ---
+def datakatalog(region_id, bas=SHARDKATALOG):
+    if _har_shard(region_id, bas):
+        return shardkatalog(region_id, bas)
+    if region_id == STANDARDREGION:
+        return APPKATALOG
+    raise FileNotFoundError(f"Regionen {region_id!r} har ingen shard i {bas}; bygg den med bygg_regioner.py")
+
+
+# --- Katalogen med regionens förberäknade filer ---
+def förberäknat_katalog(region_id, bas=SHARDKATALOG):
+    return os.path.join(datakatalog(region_id, bas), "forberaknat")
+
+
+# --- Rutan som hållplatserna i en fil ska filtreras på: region.json bredvid filen, annars standardregionen ---
+def område_för(fil):
+    sökväg = os.path.join(os.path.dirname(os.path.abspath(fil)), REGIONFIL)
+    if os.path.exists(sökväg):
+        with open(sökväg, "r", encoding="utf-8") as f:
+            return tuple(json.load(f)['bbox'])
+    return standard().bbox
+
+
+def skriv(region, katalog):
+    os.makedirs(katalog, exist_ok=True)
+    sökväg = os.path.join(katalog, REGIONFIL)
+    tmp = f"{sökväg}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(region.som_dict(), f, ensure_ascii=False, indent=2)
+    os.replace(tmp, sökväg)
+    return sökväg
+
+
+# --- Läs fler regioner från en JSON-fil (en lista med samma fält som region.json) ---
+def registrera_från_fil(sökväg):
+    with open(sökväg, "r", encoding="utf-8") as f:
+        return [registrera(Region.från_dict(data)) for data in json.load(f)]
@@ -0,0 +1,85 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from avstand import JORDRADIE_M, radvisa_avstånd
+
+# Haversine på en sfär avviker som mest ca 0,55 % från geodetiskt avstånd på ellipsoiden.
+# Marginalen används för att inte tappa kandidater innan den exakta förfiningen.
+FÖRFINING_MARGINAL = 0.006
+
+
+def _som_radianer(lat, lon):
+    lat = np.atleast_1d(np.asarray(lat, dtype=float))
+    lon = np.atleast_1d(np.asarray(lon, dtype=float))
+    return np.radians(np.column_stack([lat, lon]))
+
+
+def _geodetiska_avstånd(lat, lon, mål_lat, mål_lon):
+    return radvisa_avstånd(lat, lon, mål_lat, mål_lon, läge="vincenty")
+
+
+# --- Spatialt index över en mängd punkter (hållplatser, toaletter, ...) ---
+# Byggs en gång per dataset och besvarar sedan närmaste-granne- och radiefrågor
+# för många punkter i taget.
+class PunktIndex:
+    def __init__(self, lat, lon):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        if len(self.lat) == 0:
+            raise ValueError("Kan inte bygga ett index utan punkter")
+        self._träd = BallTree(_som_radianer(self.lat, self.lon), metric="haversine")
+
+    def __len__(self):
+        return len(self.lat)
+
+    # --- k närmaste punkter för varje frågepunkt ---
+    # Returnerar (avstånd i meter, index) med formen (antal frågepunkter, k), sorterat på avstånd.
+    # Med exakt=True hämtas några extra kandidater som sedan räknas om geodetiskt.
+    def närmaste(self, lat, lon, k=1, exakt=False):
+        k = min(k, len(self))
+        frågor = _som_radianer(lat, lon)
+        if not exakt:
+            avstånd, index = self._träd.query(frågor, k=k)
+            return avstånd * JORDRADIE_M, index
+
+        antal_kandidater = min(len(self), max(2 * k, k + 4))
+        _, kandidater = self._träd.query(frågor, k=antal_kandidater)
+        frågor_grader = np.degrees(frågor)
+
+        # Alla kandidater räknas om i ett enda vektoriserat anrop, formen (antal frågor, antal kandidater)
+        exakta = _geodetiska_avstånd(
+            frågor_grader[:, :1], frågor_grader[:, 1:], self.lat[kandidater], self.lon[kandidater]
+        )
+        ordning = np.argsort(exakta, axis=1, kind="stable")[:, :k]
+        avstånd = np.take_along_axis(exakta, ordning, axis=1)
+        index = np.take_along_axis(kandidater, ordning, axis=1)
+        return avstånd, index
+
+    # --- Alla punkter inom radie_m meter från varje frågepunkt ---
+    # Returnerar två listor (en post per frågepunkt) med index och avstånd, sorterade på avstånd.
+    def inom_radie(self, lat, lon, radie_m, exakt=False):
+        frågor = _som_radianer(lat, lon)
+        sökradie = radie_m * (1 + FÖRFINING_MARGINAL) if exakt else radie_m
+        index, avstånd = self._träd.query_radius(
+            frågor, r=sökradie / JORDRADIE_M, return_distance=True, sort_results=True
+        )
+        avstånd = [a * JORDRADIE_M for a in avstånd]
+        if not exakt:
+            return list(index), avstånd
+
+        # Räkna om alla kandidater i ett anrop och dela sedan upp per frågepunkt igen
+        frågor_grader = np.degrees(frågor)
+        antal = np.array([len(rad) for rad in index])
+        platt_index = np.concatenate(index) if len(index) else np.empty(0, dtype=int)
+        exakta = _geodetiska_avstånd(
+            np.repeat(frågor_grader[:, 0], antal), np.repeat(frågor_grader[:, 1], antal),
+            self.lat[platt_index], self.lon[platt_index]
+        )
+        gränser = np.cumsum(antal)[:-1]
+        alla_index, alla_avstånd = [], []
+        for rad, rad_avstånd in zip(np.split(platt_index, gränser), np.split(exakta, gränser)):
+            behåll = rad_avstånd <= radie_m
+            ordning = np.argsort(rad_avstånd[behåll], kind="stable")
+            alla_index.append(rad[behåll][ordning])
+            alla_avstånd.append(rad_avstånd[behåll][ordning])
+        return alla_index, alla_avstånd
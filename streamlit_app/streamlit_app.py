@@ -1,56 +1,127 @@
 import streamlit as st
-import folium
-from streamlit_folium import folium_static
-import pandas as pd
 import json
-from geopy.distance import geodesic
-from sklearn.cluster import KMeans
 import os
-from sklearn.preprocessing import StandardScaler
-
-# --- Läs lekplatser --- med cacheing
+import bekvamligheter
+from cache import LRUCache
+import matning
+import regioner
+
+# --- Snabb start ---
+# Här importeras bara det som behövs för sidhuvudet och sidopanelen. pandas, scikit-learn,
+# folium m.fl. importeras under "Data och karta" nedan, efter att sidan har ritats, och
+# scikit-learn/folium bara i de steg som använder dem (se pipeline.py). Tiden till första
+# ritningen mäts som milstolpe (matning.markera) och följs upp med benchmark_start.py.
+
+# --- Regioner i minnet ---
+# Tabeller, lager, grannlistor och raster cachas per region (shard, se regioner.py). Högst så
+# här många regioner hålls samtidigt; den som använts minst nyligen släpps först.
+MAX_REGIONER = int(os.environ.get("REGIONER_I_MINNET", 2))
+
+# --- Läs lekplatser (med förberäknade avstånd), hållplatser och toaletter --- #Med cacheing
+# cache_resource: tabellerna delas mellan alla sessioner i stället för att kopieras till
+# varje session (som med cache_data). Ingen ändrar dem; stegen i pipeline.py returnerar nya
+# tabeller som delar kolumnerna (copy-on-write).
+# Ändringstiderna ingår i cachenyckeln så att tabellerna läses om när någon indatafil ändras.
+# Med gångnät_fil blir avstånden gångavstånd längs gatunätet i stället för fågelväg
+@st.cache_resource(max_entries=MAX_REGIONER)
+def läs_tabeller(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil, katalog, ändringstider):
+    return pipeline.förbered(lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil, katalog=katalog)
+
+# --- Läs ett extra punktlager (bänkar, kaféer, ...) från registret i bekvamligheter.py --- #Med cacheing
+@st.cache_resource(max_entries=MAX_REGIONER * len(bekvamligheter.REGISTER))
+def läs_punktlager(katalog, namn, ändringstid, poi_katalog):
+    return bekvamligheter.ladda(namn, katalog, poi_katalog)
+
+# --- Lekplatserna med avstånd till de extra lagren, delas mellan sessioner --- #Med cacheing
+# Tabellen och punktlagren hashas inte (understreck), ändringstiderna avgör när den byggs om.
+# Avståndsmotorn har ett spatialt index per lager och behövs bara när tabellen byggs.
+@st.cache_resource(max_entries=MAX_REGIONER)
+def lägg_till_extra_lager(_lekplatser, _punktlager, ändringstider):
+    motor = bekvamligheter.Avståndsmotor(_punktlager)
+    return pipeline.lägg_till_lager_avstånd(_lekplatser, motor, list(_punktlager))
+
+# --- Läs grannlistor: lekplatser och toaletter inom 2 km från varje hållplats, sorterade på avstånd ---
+# Reglaget för radien blir då bara ett prefix av listan (se radiefraga.py). #Med cacheing
+@st.cache_resource(max_entries=MAX_REGIONER)
+def läs_grannlistor(lekplats_fil, hållplats_fil, toalett_fil, katalog, ändringstider):
+    return radiefraga.ladda_grannlistor(lekplats_fil, hållplats_fil, toalett_fil, katalog=katalog)
+
+# --- Läs tillgänglighetsrastret (avstånd till närmaste hållplats/toalett per cell), minnesmappat --- #Med cacheing
+@st.cache_resource(max_entries=MAX_REGIONER)
+def läs_tillgänglighet(hållplats_fil, toalett_fil, område, upplösning_m, katalog, ändringstider):
+    return tillganglighet.ladda_raster(hållplats_fil, toalett_fil, område, upplösning_m, katalog)
+
+# --- Läs förbyggd karta och legend för ett klustringsval --- #Med cacheing
+# Ändringstiderna (indatafiler + manifest) ingår i cachenyckeln; None om exporten saknas eller är inaktuell
 @st.cache_data
-def läs_lekplatser(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+def läs_förbyggd_karta(katalog, klustringsval, lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil, läge,
+                       backend, ändringstider):
+    return kartexport.hämta_förbyggd(
+        katalog, klustringsval, lekplats_fil, hållplats_fil, toalett_fil, gångnät_fil=gångnät_fil, läge=läge,
+        backend=backend
+    )
 
-# --- Läs hållplatser --- #med chacheing
-@st.cache_data
-def läs_hållplatser(file_path):
-    df = pd.read_csv(file_path)
-    df = df[
-        (df['stop_lat'] >= 57.5) & (df['stop_lat'] <= 57.85) &
-        (df['stop_lon'] >= 11.7) & (df['stop_lon'] <= 12.1)
-    ]
-    df = df.drop_duplicates(subset='stop_name', keep='first')
-    df = df.rename(columns={'stop_name': 'name', 'stop_lat': 'lat', 'stop_lon': 'lon'})
-    df['typ'] = 'hållplats'
-    return df
-
-# --- Läs toaletter --- #Med chacheing
-@st.cache_data
-def läs_toaletter(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+# --- Rutindex för kartans utsnitt (interaktivt läge), ett per tabell --- #Med cacheing
+# Tabellen hashas inte (understreck); nyckeln anger vilken tabell och version det gäller.
+@st.cache_resource(max_entries=16)
+def läs_rutindex(_tabell, nyckel):
+    return vyport.Rutindex(_tabell['lat'], _tabell['lon'])
+
+# --- Cacheminnen för klustring och radiefiltrering --- delas mellan alla sessioner
+# Klustringen nycklas på klustringsval, radiefiltret på (hållplats, radie).
+@st.cache_resource
+def hämta_beräkningscache():
+    return {
+        'klustring': LRUCache(max_poster=8),
+        'radiefilter': LRUCache(max_poster=64),
+    }
 
-# --- Beräkna avstånd till närmaste hållplats ---
-def närmaste_avstånd(lat, lon, hållplatser):
-    lekplats_pos = (lat, lon)
-    return min(geodesic(lekplats_pos, (r['lat'], r['lon'])).meters for _, r in hållplatser.iterrows())
+# --- Hur kartans punkter ritas: "bulk" (ett GeoJSON-lager per punktmängd) eller "markörer" (en per rad) ---
+RENDERINGSLÄGE = os.environ.get("KARTA_RENDERINGSLÄGE", "bulk")
 
-# --- Omvandla avstånd till gångtid ---
-def uppskattad_gångtid(meter):
-    minuter = int(round(meter/83))  # 5 km/h gånghastighet
-    return f"{minuter} min"
+# --- Valfritt OSM-utdrag med gatunätet; då räknas gångavstånd längs gatorna i stället för fågelväg ---
+GÅNGNÄT_FIL = os.environ.get("GANGNAT_OSM") or None
 
-# --- Beräkna avstånd till närmast toalett ---
-def närmaste_toalett_avstånd(lat, lon, toaletter):
-    pos = (lat, lon)
-    return min(geodesic(pos, (r['lat'], r['lon'])).meters for _, r in toaletter.iterrows())
+# --- Interaktiv karta (st_folium) som bara får punkterna i utsnittet; kan slås på i sidopanelen ---
+INTERAKTIV_KARTA = os.environ.get("KARTA_INTERAKTIV") == "1"
+
+# --- Cellstorlek (meter) i tillgänglighetsrastret som värmekartan ritas från (tillganglighet.py) ---
+TILLGÄNGLIGHET_UPPLÖSNING_M = float(os.environ.get("TILLGANGLIGHET_UPPLOSNING_M", 100))
+
+# --- Klustringsbackend: "kmeans" anpassar om vid varje ändring, "minibatch" använder en sparad modell (klustring.py) ---
+KLUSTRING_BACKEND = os.environ.get("KLUSTRING_BACKEND", "kmeans")
+
+# --- Katalog med förbyggda kartor från exportera_kartor.py (annars "kartor" bredvid regionens filer) ---
+# Används bara om den matchar indatafilerna
+FÖRBYGGDA_KARTOR = os.environ.get("FORBYGGDA_KARTOR") or None
 
 # --- Sidhuvud ---
 st.set_page_config(page_title="Göteborgs lekplatskarta", layout="wide")
-st.title("Göteborgs lekplatskarta")
+
+# --- Region (kommun): väljaren visas bara när det finns flera byggda shardar, annars Göteborg ---
+# Kan även väljas med ?region=<id> i adressen.
+regionval = regioner.tillgängliga() or [regioner.STANDARDREGION]
+förvald_region = st.query_params.get("region")
+region_id = förvald_region if förvald_region in regionval else regionval[0]
+if len(regionval) > 1:
+    region_id = st.sidebar.selectbox(
+        "Region:", options=regionval, index=regionval.index(region_id),
+        format_func=lambda id_: regioner.hämta(id_).namn, key="region"
+    )
+region = regioner.hämta(region_id)
+st.title("Göteborgs lekplatskarta" if region.id == regioner.STANDARDREGION else f"Lekplatskarta för {region.namn}")
+
+# --- Mätning av tid per steg och räknare (se matning.py) ---
+# Slås på med ?debug=1 i adressen (visar en panel i sidopanelen) eller MATNING=1.
+# MATNING_OPENMETRICS=<fil> skriver summeringen i OpenMetrics-format efter varje körning
+# och MATNING_LOGG=1 loggar varje körning som en JSON-rad.
+DEBUG = st.query_params.get("debug") == "1"
+OPENMETRICS_FIL = os.environ.get("MATNING_OPENMETRICS") or None
+MÄTNING_PÅ = DEBUG or os.environ.get("MATNING") == "1" or OPENMETRICS_FIL is not None
+if os.environ.get("MATNING_LOGG") == "1":
+    matning.aktivera_loggning()
+if MÄTNING_PÅ:
+    matning.starta()
 
 st.markdown("""
 <style>
@@ -115,65 +186,106 @@ with st.expander("ℹ️ Klicka här för att läsa hur kartan fungerar"):
     **Trevlig lek!**
     """)
 
-# --- Hämtar sökvägen till aktuell katalog där scriptet körs ---
-current_dir = os.path.dirname(__file__)
-
-# --- Läs in JSON-filen med lekplatser ---
-file_path = os.path.join(current_dir, "lekplatser_ny.json")
-lekplatser_data = läs_lekplatser(file_path)
-
-# --- Skapa en DataFrame med lekplatsernas namn, koordinater och typ ---
-lekplatser_df = pd.DataFrame([{
-    'name': el.get('tags', {}).get('name', 'Okänd lekplats'),
-    'lat': el['lat'],
-    'lon': el['lon'],
-    'typ': 'lekplats'
-} for el in lekplatser_data])
-
-# --- Läs in filen med hållplatser ---
-file_path = os.path.join(current_dir, "stops.txt")
-stops_df = läs_hållplatser(file_path)
-
-# --- Läs in JSON-filen med toaletter ---
-file_path = os.path.join(current_dir, "toaletter.json")
-toaletter_data = läs_toaletter(file_path)
-
-# --- Skapa en DataFrame med koordinater för toaletter ---
-toaletter_df = pd.DataFrame([{
-    'lat': el['lat'],
-    'lon': el['lon'],
-} for el in toaletter_data])
-
-# --- Kombinera ---
-combined_df = pd.concat([lekplatser_df, stops_df[['name', 'lat', 'lon', 'typ']]], ignore_index=True)
-lekplatser = combined_df[combined_df['typ'] == 'lekplats'].copy()
-hållplatser = combined_df[combined_df['typ'] == 'hållplats'].copy()
-
-# --- Beräkna avståndet från varje lekplats till närmaste hållplats ---
-lekplatser['avstånd_m'] = lekplatser.apply(
-    lambda row: närmaste_avstånd(row['lat'], row['lon'], hållplatser), axis=1
-)
+# --- Regionens kataloger: indatafilerna (bredvid appen för Göteborg) och de förberäknade filerna ---
+datakatalog = regioner.datakatalog(region.id)
+förberäknat = regioner.förberäknat_katalog(region.id)
 
-# --- Beräkna avståndet från varje lekplats till närmaste toalett ---
-lekplatser['avstånd_toalett'] = lekplatser.apply(
-    lambda row: närmaste_toalett_avstånd(row['lat'], row['lon'], toaletter_df), axis=1
+# --- Övriga lager som finns som filer (t.ex. från ladda_osmdata.py); avstånden räknas av Avståndsmotor ---
+extra_lager = [namn for namn in bekvamligheter.tillgängliga(datakatalog) if namn not in bekvamligheter.FÖRBERÄKNADE]
+lagerversion = tuple(
+    os.path.getmtime(os.path.join(datakatalog, bekvamligheter.REGISTER[namn].fil)) for namn in extra_lager
 )
 
 # --- Skapa ett användargränssnitt i Streamlit för att välja klustringsmetod ---
 st.sidebar.markdown("### Klustringsmetod")
 klustringsval = st.sidebar.radio(
     "Välj vad lekplatserna ska grupperas utifrån:",
-    options=["Hållplatsavstånd", "Toalettavstånd", "Både hållplats + toalett"],
+    options=list(bekvamligheter.KLUSTRINGSVAL) + ["Eget urval"],
     index=0
 )
 
+# --- Eget urval: klustra på valfria lager bland dem som finns ---
+if klustringsval == "Eget urval":
+    valda_lager = st.sidebar.multiselect(
+        "Lager att klustra på:",
+        options=list(bekvamligheter.FÖRBERÄKNADE) + extra_lager,
+        default=list(bekvamligheter.FÖRBERÄKNADE),
+        format_func=lambda namn: namn.capitalize()
+    )
+    klustringsval = tuple(valda_lager) or ('hållplatser',)
+
+# --- Interaktiv karta: bara det som syns skickas, utzoomat som antal per område (se vyport.py) ---
+interaktiv = st.sidebar.checkbox(
+    "Interaktiv karta (laddar bara det som syns)", value=INTERAKTIV_KARTA
+)
+
+# --- Värmekarta med avståndet till närmaste hållplats eller toalett från varje plats i området ---
+VÄRMEKARTOR = {
+    "Ingen": None,
+    "Avstånd till hållplats": 'avstånd_hållplats',
+    "Avstånd till toalett": 'avstånd_toalett',
+}
+värmekarta_val = st.sidebar.radio("Värmekarta:", options=list(VÄRMEKARTOR), index=0, horizontal=True)
+
+# --- Dynamisk rubrik ovanför kartan ---
+rubrik_text = {
+    "Hållplatsavstånd": "**Denna karta visar lekplatser färgkodade efter avstånd till närmaste hållplats.**",
+    "Toalettavstånd": "**Denna karta visar lekplatser färgkodade efter avstånd till närmaste toalett.**",
+    "Både hållplats + toalett": "**Denna karta visar lekplatser färgkodade efter kombinerad tillgång till hållplats och toalett.**",
+}
+if klustringsval in rubrik_text:
+    st.markdown(rubrik_text[klustringsval])
+else:
+    etiketter = [bekvamligheter.REGISTER[namn].etikett for namn in klustringsval]
+    st.markdown(f"**Denna karta visar lekplatser färgkodade efter kombinerad tillgång till {', '.join(etiketter)}.**")
+
+# --- Platshållare där kartan hamnar; visar förloppet medan data och klustring laddas ---
+col1, _ = st.columns([3, 1])
+with col1:
+    laddning = st.empty()
+förlopp = laddning.progress(0, text="Läser lekplatser, hållplatser och toaletter …")
+matning.markera("första_ritning")
+
+# --- Data och karta ---
+# Importeras här, efter att sidan har ritats (se "Snabb start" överst)
+import kartexport
+import klustring
+import pipeline
+import radiefraga
+import tillganglighet
+import vyport
+
+# --- Läs in lekplatser, hållplatser och toaletter ---
+lekplats_fil = os.path.join(datakatalog, "lekplatser_ny.json")
+hållplats_fil = os.path.join(datakatalog, "stops.txt")
+toalett_fil = os.path.join(datakatalog, "toaletter.json")
+# Avstånden från varje lekplats till närmaste hållplats och toalett är förberäknade (forberakning.py)
+indatafiler = (lekplats_fil, hållplats_fil, toalett_fil) + ((GÅNGNÄT_FIL,) if GÅNGNÄT_FIL else ())
+# Regionen ingår så att cachenycklarna nedan aldrig blandar ihop två regioner med samma ändringstider
+dataversion = (region.id,) + tuple(os.path.getmtime(f) for f in indatafiler)
+with matning.steg("tabeller"):
+    lekplatser, hållplatser, toaletter_df = läs_tabeller(
+        lekplats_fil, hållplats_fil, toalett_fil, GÅNGNÄT_FIL, förberäknat, dataversion
+    )
+
+punktlager = {'toaletter': toaletter_df}
+if extra_lager:
+    with matning.steg("extra_lager", rader=len(lekplatser) * len(extra_lager)):
+        for namn, ändringstid in zip(extra_lager, lagerversion):
+            punktlager[namn] = läs_punktlager(datakatalog, namn, ändringstid, förberäknat)
+        lekplatser = lägg_till_extra_lager(
+            lekplatser, {namn: punktlager[namn] for namn in extra_lager}, (dataversion, extra_lager, lagerversion)
+        )
+matning.markera("data_inläst")
+
 # --- Visa filtreringsgränssnitt ENDAST för hållplatsavstånd ---
 if klustringsval == "Hållplatsavstånd":
     valda_hållplatsnamn = st.sidebar.selectbox(
         "Filtrera lekplatser nära en viss hållplats:",
         options=hållplatser['name'].sort_values().unique(),
         index=None,
-        placeholder="Välj en hållplats"
+        placeholder="Välj en hållplats",
+        key="hållplats"
     )
     radie = st.sidebar.slider(
         "Avståndsradie (meter)",
@@ -183,228 +295,122 @@ else:
     valda_hållplatsnamn = None
     radie = None
 
-# --- Dynamisk rubrik ovanför kartan ---
-rubrik_text = {
-    "Hållplatsavstånd": "**Denna karta visar lekplatser färgkodade efter avstånd till närmaste hållplats.**",
-    "Toalettavstånd": "**Denna karta visar lekplatser färgkodade efter avstånd till närmaste toalett.**",
-    "Både hållplats + toalett": "**Denna karta visar lekplatser färgkodade efter kombinerad tillgång till hållplats och toalett.**",
-}
-st.markdown(rubrik_text[klustringsval])
-
-# --- Klustring och färger ---
-# Välj variabler beroende på klustringsval
-if klustringsval == "Hållplatsavstånd":
-    X = lekplatser[['avstånd_m']].dropna().values
-elif klustringsval == "Toalettavstånd":
-    X = lekplatser[['avstånd_toalett']].dropna().values
-else:  # Både
-    X = lekplatser[['avstånd_m', 'avstånd_toalett']].dropna().values
-
-# Standardisera (skala) värden för att förbättra klustring
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+beräkningscache = hämta_beräkningscache()
 
-# Klustring
-n_clusters = 4 if klustringsval == "Hållplatsavstånd" else 5
-kmeans = KMeans(n_clusters=n_clusters, random_state=0, n_init='auto').fit(X_scaled)
-
-#  Uppdatera lekplatser-DataFrame med klustertillhörighet
-lekplatser = lekplatser.dropna(subset=['avstånd_m', 'avstånd_toalett']).copy()
-lekplatser['kluster'] = kmeans.labels_
-
-# Sortera kluster baserat på medelavstånd för att få konsekventa färger
-if klustringsval == "Hållplatsavstånd":
-    kluster_medel = lekplatser.groupby('kluster')['avstånd_m'].mean().sort_values()
-elif klustringsval == "Toalettavstånd":
-    kluster_medel = lekplatser.groupby('kluster')['avstånd_toalett'].mean().sort_values()
-else:
-    combo = lekplatser['avstånd_m'] + lekplatser['avstånd_toalett']
-    kluster_medel = combo.groupby(lekplatser['kluster']).mean().sort_values()
-
-# Tilldela färger till kluster
-tillgängliga_färger = ['green', 'orange', 'red', 'purple', 'black']
-färger_sorterade = tillgängliga_färger[:n_clusters]
-färgkarta = {kluster: färger_sorterade[i] for i, kluster in enumerate(kluster_medel.index)}
-lekplatser['färg'] = lekplatser['kluster'].map(färgkarta)
-
-# --- Skapa karta ---
-# Om användaren valt en hållplats, beräkna avstånd från varje lekplats till den hållplatsen
-if valda_hållplatsnamn:
-    vald_hållplats = hållplatser[hållplatser['name'] == valda_hållplatsnamn].iloc[0]
-    vald_position = (vald_hållplats['lat'], vald_hållplats['lon'])
-
-    lekplatser['avstånd_till_vald'] = lekplatser.apply(
-        lambda row: geodesic((row['lat'], row['lon']), vald_position).meters, axis=1
+# --- Förbyggd karta (exportera_kartor.py) när ingen hållplats är vald ---
+förbyggd = None
+kartkatalog = FÖRBYGGDA_KARTOR or os.path.join(datakatalog, "kartor")
+manifest = os.path.join(kartkatalog, "manifest.json")
+if not valda_hållplatsnamn and not interaktiv and not VÄRMEKARTOR[värmekarta_val] and os.path.exists(manifest):
+    förbyggd = läs_förbyggd_karta(
+        kartkatalog, klustringsval, lekplats_fil, hållplats_fil, toalett_fil, GÅNGNÄT_FIL,
+        RENDERINGSLÄGE, KLUSTRING_BACKEND, dataversion + (os.path.getmtime(manifest),)
     )
-    
-    # Filtrera ut lekplatser som ligger inom en viss radie från vald hållplats
-    lekplatser_nära = lekplatser[lekplatser['avstånd_till_vald'] <= radie].copy()
-
-    # Funktion för att tilldela färg baserat på avstånd till vald hållplats
-    def färg_avstånd(avstånd):
-        if avstånd < 181:
-            return 'green'
-        elif avstånd < 344:
-            return 'orange'
-        elif avstånd < 596:
-            return 'red'
-        else:
-            return 'purple'
-
-    # Skapa färgkodning för filtrerade lekplatser baserat på deras avstånd
-    lekplatser_nära['färg_filtrerad'] = lekplatser_nära['avstånd_till_vald'].apply(färg_avstånd)
 
-    # Skapa karta centrerad på vald hållplats
-    karta = folium.Map(location=[vald_hållplats['lat'], vald_hållplats['lon']], zoom_start=14)
-
-if valda_hållplatsnamn and vald_position is not None:
-    # Filtrerat läge – lekplatser nära vald hållplats
-    for _, rad in lekplatser_nära.iterrows():
-        if klustringsval == "Hållplatsavstånd":
-            popup_text = f"<strong>{rad['name']}</strong><br> {int(rad['avstånd_m'])} m till närmaste hållplats<br>{uppskattad_gångtid(rad['avstånd_m'])}"
-        elif klustringsval == "Toalettavstånd":
-            popup_text = f"<strong>{rad['name']}</strong><br> {int(rad['avstånd_toalett'])} m till toalett<br>{uppskattad_gångtid(rad['avstånd_toalett'])}"
-        else:
-            popup_text = (
-                f"<strong>{rad['name']}</strong><br>"
-                f"{int(rad['avstånd_m'])} m till närmaste hållplats {uppskattad_gångtid(rad['avstånd_m'])}<br>"
-                f"{int(rad['avstånd_toalett'])} m till toalett {uppskattad_gångtid(rad['avstånd_toalett'])}"
+if förbyggd is not None:
+    karta_html, legend_html = förbyggd
+else:
+    # --- Klustring och färger --- (hämtas från cachen om samma val gjorts tidigare)
+    förlopp.progress(40, text="Grupperar lekplatserna …")
+    with matning.steg("klustring", rader=len(lekplatser)):
+        lekplatser, kluster_medel, färger_sorterade, färgkarta = beräkningscache['klustring'].hämta(
+            (dataversion, lagerversion, klustringsval),
+            lambda: pipeline.klustra_lekplatser(lekplatser, klustringsval, klustring.modell_för(
+                lekplatser, klustringsval, KLUSTRING_BACKEND, katalog=förberäknat, källa=GÅNGNÄT_FIL
+            ))
+        )
+
+    # --- Skapa karta ---
+    # Om användaren valt en hållplats, filtrera lekplatser inom vald radie från den hållplatsen
+    vald_hållplats = None
+    lekplatser_nära = None
+    nära = {}
+    if valda_hållplatsnamn:
+        # Hållplatsens nummer i hållplatslistan, samma numrering som i grannlistorna
+        hållplats_nr = int((hållplatser['name'] == valda_hållplatsnamn).to_numpy().argmax())
+        vald_hållplats = hållplatser.iloc[hållplats_nr]
+        grannlistor = läs_grannlistor(lekplats_fil, hållplats_fil, toalett_fil, förberäknat, dataversion[:4])
+        nära['toaletter'] = grannlistor['toaletter'].inom(hållplats_nr, radie)
+        with matning.steg("radiefilter", rader=len(lekplatser)):
+            lekplatser_nära = beräkningscache['radiefilter'].hämta(
+                (dataversion, klustringsval, valda_hållplatsnamn, radie),
+                lambda: pipeline.lekplatser_inom_radie(
+                    lekplatser, (vald_hållplats['lat'], vald_hållplats['lon']), radie,
+                    grannar=grannlistor['lekplatser'].inom(hållplats_nr, radie)
+                )
             )
 
-        folium.Marker(
-            location=(rad['lat'], rad['lon']),
-            popup=popup_text,
-            icon=folium.Icon(color=rad['färg_filtrerad'], icon='child', prefix='fa')
-        ).add_to(karta)
-
-    # Markera vald hållplats
-    folium.CircleMarker(
-        location=vald_position,
-        radius=4,
-        color='blue',
-        fill=True,
-        fill_color='blue',
-        fill_opacity=0.7,
-        popup=vald_hållplats['name']
-    ).add_to(karta)
-
-else:
-    # Standardläge – visa alla lekplatser
-    karta = folium.Map(location=[57.7, 11.97], zoom_start=12)
-   
-    for _, rad in lekplatser.iterrows():
-        if klustringsval == "Hållplatsavstånd":
-            popup_text = f"<strong>{rad['name']}</strong><br> {int(rad['avstånd_m'])} m till närmaste hållplats<br> {uppskattad_gångtid(rad['avstånd_m'])}"
-        elif klustringsval == "Toalettavstånd":
-            popup_text = f"<strong>{rad['name']}</strong><br> {int(rad['avstånd_toalett'])} m till toalett<br> {uppskattad_gångtid(rad['avstånd_toalett'])}"
+    värmekarta = None
+    if VÄRMEKARTOR[värmekarta_val]:
+        with matning.steg("värmekarta"):
+            raster = läs_tillgänglighet(
+                hållplats_fil, toalett_fil, region.bbox, TILLGÄNGLIGHET_UPPLÖSNING_M, förberäknat, dataversion[:4]
+            )
+            värmekarta = (tillganglighet.som_bild(raster, VÄRMEKARTOR[värmekarta_val]), raster.område, värmekarta_val)
+
+    förlopp.progress(70, text="Ritar kartan …")
+    if interaktiv:
+        # --- Kartans utsnitt: från förra körningen, eller runt hållplatsen när den just valts ---
+        vy = st.session_state.get("karta") or {}
+        if (region.id, valda_hållplatsnamn) != st.session_state.get("karta_val"):
+            st.session_state["karta_val"] = (region.id, valda_hållplatsnamn)
+            vy = {}
+        if vy.get('center') and vy.get('zoom') is not None:
+            centrum, zoom = [vy['center']['lat'], vy['center']['lng']], vy['zoom']
+        elif vald_hållplats is not None:
+            centrum, zoom = [float(vald_hållplats['lat']), float(vald_hållplats['lon'])], 14
         else:
-            popup_text = (
-                f"<strong>{rad['name']}</strong><br>"
-                f"{int(rad['avstånd_m'])} m till närmaste hållplats {uppskattad_gångtid(rad['avstånd_m'])}<br>"
-                f"{int(rad['avstånd_toalett'])} m till toalett {uppskattad_gångtid(rad['avstånd_toalett'])}"
+            centrum, zoom = region.centrum, region.zoom
+        bounds = vy.get('bounds')
+        if bounds and bounds['_southWest']['lat'] is not None:
+            bbox = vyport.bbox_från(bounds)
+        else:
+            bbox = vyport.bbox_runt(centrum, zoom)
+
+        with matning.steg("karta"):
+            index = {'lekplatser': läs_rutindex(lekplatser, ('lekplatser', dataversion, lagerversion, klustringsval))}
+            for namn in bekvamligheter.urval_för(klustringsval):
+                tabell = hållplatser if namn == 'hållplatser' else punktlager[namn]
+                index[namn] = läs_rutindex(tabell, (namn, dataversion, lagerversion))
+            utsnitt = pipeline.bygg_vyportlager(
+                lekplatser, hållplatser, punktlager, klustringsval, bbox, zoom, index=index,
+                vald_hållplats=vald_hållplats, lekplatser_nära=lekplatser_nära, radie=radie, nära=nära,
+                värmekarta=värmekarta
             )
-
-        folium.Marker(
-            location=(rad['lat'], rad['lon']),
-            popup=popup_text,
-            icon=folium.Icon(color=rad['färg'], icon='child', prefix='fa')
-        ).add_to(karta)
-
-# Visa hållplatser (alla eller bara den valda)
-if klustringsval != "Toalettavstånd":
-    if not valda_hållplatsnamn:
-        for _, rad in hållplatser.iterrows():
-            folium.CircleMarker(
-                location=(rad['lat'], rad['lon']),
-                radius=3,
-                color='blue',
-                opacity=0.6,
-                fill=True,
-                fill_color='blue',
-                fill_opacity=0.4,
-                popup=rad['name']
-            ).add_to(karta)
     else:
-        folium.CircleMarker(
-            location=(vald_position),
-            radius=4,
-            color='blue',
-            fill=True,
-            fill_color='blue',
-            fill_opacity=0.7,
-            popup=vald_hållplats['name']
-        ).add_to(karta)
-
-# Visa toaletter inom vald radie om relevant
-if valda_hållplatsnamn and ("Toalett" in klustringsval or "både" in klustringsval.lower()):
-    toaletter_df['avstånd_till_vald'] = toaletter_df.apply(
-        lambda row: geodesic((row['lat'], row['lon']), vald_position).meters, axis=1
-    )
-    toaletter_nära = toaletter_df[toaletter_df['avstånd_till_vald'] <= radie].copy()
-
-    for _, rad in toaletter_nära.iterrows():
-        folium.Marker(
-            location=(rad['lat'], rad['lon']),
-            popup=f"Toalett ({int(rad['avstånd_till_vald'])} m från hållplats)",
-            icon=folium.Icon(color='gray', icon='restroom', prefix='fa')
-        ).add_to(karta)
-else:
-    if "Toalett" in klustringsval or "både" in klustringsval.lower():
-        for _, rad in toaletter_df.iterrows():
-            folium.Marker(
-                location=(rad['lat'], rad['lon']),
-                popup="Toalett",
-                icon=folium.Icon(color='gray', icon='restroom', prefix='fa')
-            ).add_to(karta)
-
-# --- Dynamisk legend ---
-if klustringsval == "Hållplatsavstånd":
-    kluster_max = lekplatser.groupby('kluster')['avstånd_m'].max()
-    beskrivningstyp = "till hållplats"
-    kluster_beskrivning = {
-    färgkarta[kl]: f"max {uppskattad_gångtid(kluster_max[kl])} {beskrivningstyp}" for kl in kluster_max.index
-}
-elif klustringsval == "Toalettavstånd":
-    kluster_max = lekplatser.groupby('kluster')['avstånd_toalett'].max()
-    beskrivningstyp = "till toalett"
-    kluster_beskrivning = {
-    färgkarta[kl]: f"max {uppskattad_gångtid(kluster_max[kl])} {beskrivningstyp}" for kl in kluster_max.index
-}
-else:
-    beskrivningstyp = "kombinerad tillgång till hållplats och toalett"
-    kvalitetsnivåer = {
-        0: "Enkel att nå, bekvämt belägen",
-        1: "Tillgänlig men ej optimal",
-        2: "Promenadavstånd",
-        3: "Ligger en bit bort",
-        4: "Avlägsen"
-    }
-    kluster_beskrivning = {
-        färgkarta[kl]: kvalitetsnivåer.get(i, "") for i, kl in enumerate(kluster_medel.index)
-    }
+        with matning.steg("karta"):
+            karta = pipeline.bygg_karta(
+                lekplatser, hållplatser, punktlager, klustringsval,
+                vald_hållplats=vald_hållplats, lekplatser_nära=lekplatser_nära, radie=radie, läge=RENDERINGSLÄGE,
+                nära=nära, värmekarta=värmekarta, centrum=region.centrum
+            )
 
-# Skapar HTML för dynamisk legend
-legend_html = "<div class='lekplats-legend'>"#"<div style='background-color:#f0f0f0;padding:10px;border-radius:10px;border:1px solid #ccc;font-size:15px; color: black;'>"
-for färg in färger_sorterade:
-    text = kluster_beskrivning.get(färg, "")
-    emoji = {
-        'green': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-green.png' width='20px'>",
-        'orange': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-orange.png' width='20px'>",
-        'red': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-red.png' width='20px'>",
-        'purple': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-violet.png' width='20px'>",
-        'black': "<img src='https://raw.githubusercontent.com/pointhi/leaflet-color-markers/master/img/marker-icon-black.png' width='20px'>"
-    }.get(färg, "")
-   
-    legend_html += f"{emoji} Lekplats ({text})<br>"
-legend_html += "🔵 Hållplats<br>"
-if klustringsval in ["Toalettavstånd", "Både hållplats + toalett"]:
-    legend_html += "🚻 Toalett<br>"
-legend_html += "</div>"
+    # --- Dynamisk legend ---
+    legend_html = pipeline.skapa_legend(lekplatser, klustringsval, kluster_medel, färger_sorterade, färgkarta)
 
-col1, _ = st.columns([3, 1])
+laddning.empty()
 with col1:
-    folium_static(karta)
+    with matning.steg("rendering"):
+        if förbyggd is not None:
+            import streamlit.components.v1 as components
+            # Samma storlek som folium_static
+            components.html(karta_html, height=510, width=700)
+        elif interaktiv:
+            # Grundkartan är densamma varje körning; bara utsnittets lager, centrum och zoom byts
+            import kartlager
+            from streamlit_folium import st_folium
+            st_folium(
+                kartlager.skapa_karta(region.centrum, zoom_start=region.zoom), key="karta",
+                height=510, width=700, center=centrum, zoom=zoom, feature_group_to_add=utsnitt,
+                returned_objects=["bounds", "zoom", "center"]
+            )
+        else:
+            from streamlit_folium import folium_static
+            folium_static(karta)
     st.markdown(legend_html, unsafe_allow_html=True)
+    if VÄRMEKARTOR[värmekarta_val]:
+        st.caption(f"Värmekarta: grönt = nära, rött = 1 km eller mer (fågelväg, rutor om {TILLGÄNGLIGHET_UPPLÖSNING_M:g} m).")
+matning.markera("karta_klar")
 
 st.markdown("<br>", unsafe_allow_html=True)
 
@@ -426,11 +432,45 @@ Studenter vid Göteborgs universitet
 
 **Teknisk information**  
 - Kartan visar endast lekplatser och hållplatser inom området:  
-  **lat:** 57.5–57.85, **lon:** 11.7–12.1  
+  **lat:** {syd:g}–{nord:g}, **lon:** {väst:g}–{öst:g}  
 - Gångtid beräknas med en genomsnittlig hastighet på **5 km/h**
 
 **Kontakt & feedback**  
 Har du frågor, förslag, hittat en bugg eller vill veta mer?  
 Kontakta: [victoriaj0109@outlook.com](mailto:victoriaj0109@outlook.com)  
 GitHub: [group-project-hackstreet-boys](https://github.com/SVP-GU/group-project-hackstreet-boys)
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """.format(**dict(zip(("syd", "väst", "nord", "öst"), region.bbox))), unsafe_allow_html=True)
+# --- Cachestatistik för att kunna dimensionera cachen (visas med ?debug=1 i adressen) ---
+if DEBUG:
+    with st.expander("Cachestatistik"):
+        st.json({namn: cache.statistik() for namn, cache in beräkningscache.items()})
+
+# --- Avsluta mätningen: panel i sidopanelen med ?debug=1, export till fil och logg ---
+if MÄTNING_PÅ:
+    mätning = matning.avsluta()
+    cachestatistik = {namn: cache.statistik() for namn, cache in beräkningscache.items()}
+    if OPENMETRICS_FIL:
+        matning.skriv_openmetrics(OPENMETRICS_FIL, cachestatistik)
+    if DEBUG:
+        with st.sidebar.expander("Mätning (denna körning)", expanded=True):
+            st.caption(f"Totalt {mätning.som_dict()['total_sekunder'] * 1000:.0f} ms")
+            if mätning.milstolpar:
+                st.caption(", ".join(f"{namn} {s * 1000:.0f} ms" for namn, s in mätning.milstolpar.items()))
+            if mätning.rss_slut_mb is not None:
+                st.caption(
+                    f"RSS {mätning.rss_slut_mb:.0f} MB "
+                    f"({mätning.rss_slut_mb - mätning.rss_start_mb:+.1f} MB under körningen)"
+                )
+            st.dataframe([
+                {'steg': namn, 'ms': round(post['sekunder'] * 1000, 1), 'anrop': post['anrop'], 'rader': post['rader']}
+                for namn, post in mätning.steg.items()
+            ], hide_index=True)
+            st.json(mätning.räknare)
+            st.download_button(
+                "Ladda ner (OpenMetrics)", matning.SUMMERING.som_openmetrics(cachestatistik),
+                file_name="lekplatskarta_metrics.txt", mime="text/plain"
+            )
+            st.download_button(
+                "Ladda ner (JSON)", json.dumps(mätning.som_dict(), ensure_ascii=False, indent=2),
+                file_name="lekplatskarta_matning.json", mime="application/json"
+            )
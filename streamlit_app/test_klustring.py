@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+import bekvamligheter
+import klustring
+
+# --- Klustermodellens uppdateringar: borttagna rader dras från klustret de lades till i ---
+# Kör: python -m pytest streamlit_app/test_klustring.py
+
+KOLUMNER = bekvamligheter.kolumner(bekvamligheter.urval_för("Både hållplats + toalett"))
+
+
+def _punkter(rng):
+    return np.vstack([rng.normal(c, 50, (100, 2)) for c in ([200, 200], [1000, 200], [600, 1200])])
+
+
+def test_ta_bort_efter_att_centroiderna_flyttat_sig():
+    rng = np.random.default_rng(0)
+    modell, _ = klustring.Klustermodell.anpassa(_punkter(rng), KOLUMNER, 3, backend="kmeans")
+    antal_före, centroider_före = modell.antal.copy(), modell.centroider.copy()
+
+    # A hamnar mellan två kluster; B drar sedan det ena klustret långt bort
+    A = rng.normal([600, 200], 40, (20, 2))
+    etiketter_A = modell.uppdatera(A)
+    B = rng.normal([1800, 200], 50, (300, 2))
+    etiketter_B = modell.uppdatera(B)
+    assert (modell.tilldela(A) != etiketter_A).any()
+
+    modell.ta_bort(A, etiketter_A)
+
+    # Kvar ska vara anpassningen plus B, som om A aldrig lagts till
+    B_skalad = modell.skala_om(B)
+    antal_B = np.bincount(etiketter_B, minlength=3)
+    summa_B = np.array([B_skalad[etiketter_B == k].sum(axis=0) for k in range(3)])
+    np.testing.assert_array_equal(modell.antal, antal_före + antal_B)
+    np.testing.assert_allclose(
+        modell.centroider, (antal_före[:, None] * centroider_före + summa_B) / (antal_före + antal_B)[:, None]
+    )
+
+
+def test_ändrade_lekplatser_räknas_en_gång(tmp_path):
+    rng = np.random.default_rng(1)
+    X = _punkter(rng)
+    lekplatser = pd.DataFrame({'id': np.arange(len(X)), KOLUMNER[0]: X[:, 0], KOLUMNER[1]: X[:, 1]})
+    val = "Både hållplats + toalett"
+    modell = klustring.hämta_modell(lekplatser, val, tmp_path)
+
+    # Flytta samma lekplatser flera gånger, så att centroiderna hinner flytta sig mellan gångerna
+    for steg in range(5):
+        lekplatser.loc[:19, KOLUMNER[0]] += 300
+        modell = klustring.hämta_modell(lekplatser, val, tmp_path)
+        assert len(modell.sedda_id) == len(lekplatser)
+        assert modell.antal.sum() == len(lekplatser)
+
+    # Borttagna lekplatser försvinner ur modellen
+    modell = klustring.hämta_modell(lekplatser.iloc[10:], val, tmp_path)
+    assert len(modell.sedda_id) == len(lekplatser) - 10
+    assert modell.antal.sum() == len(lekplatser) - 10
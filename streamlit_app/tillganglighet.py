@@ -0,0 +1,169 @@
+import glob
+import math
+import os
+
+import numpy as np
+
+import forberakning
+import regioner
+from avstand import JORDRADIE_M, radvisa_avstånd
+
+# --- Tillgänglighetsraster: avstånd till närmaste hållplats och toalett för hela området ---
+# Området (regionens ruta, samma som hållplatserna filtreras på) delas in i celler om UPPLÖSNING_M meter.
+# Varje cell lagrar fågelvägen från cellens mitt till närmaste hållplats och toalett, så att
+# vilken punkt som helst (t.ex. en ny lekplats) slås upp med index-aritmetik i stället för
+# en sökning bland hållplatserna.
+#
+# Beräkningen är vektoriserad över hela rutnätet: cellerna som innehåller en punkt blir frön
+# och en euklidisk avståndstransform (scipy.ndimage, i meter per axel) ger för varje cell
+# närmaste frö. Avståndet räknas sedan exakt (haversine) från cellens mitt till punkten i
+# den fröcellen. För en godtycklig punkt i cellen blir felet i storleksordningen cellstorleken
+# (uppmätt mot exakt sökning: högst ca 1,5 cellbredder, median en kvarts cellbredd).
+# Punkter utanför området räknas inte med.
+#
+# Rastret sparas som .npy i forberaknat/ och läses minnesmappat; filnamnet innehåller en
+# hash av indatafilerna, området och upplösningen. scipy importeras bara när rastret byggs.
+
+RASTER_VERSION = 1
+
+OMRÅDE = regioner.standard().bbox  # (syd, väst, nord, öst)
+
+UPPLÖSNING_M = 100
+
+RASTER_DTYPE = np.dtype([
+    ('avstånd_hållplats', 'f4'),
+    ('avstånd_toalett', 'f4'),
+])
+
+M_PER_GRAD = math.pi * JORDRADIE_M / 180
+
+
+# --- Antal (rader, kolumner) för området vid en upplösning i meter ---
+def rutnät(område, upplösning_m):
+    syd, väst, nord, öst = område
+    höjd_m = (nord - syd) * M_PER_GRAD
+    bredd_m = (öst - väst) * M_PER_GRAD * math.cos(math.radians((syd + nord) / 2))
+    return max(1, math.ceil(höjd_m / upplösning_m)), max(1, math.ceil(bredd_m / upplösning_m))
+
+
+class Tillgänglighetsraster:
+    def __init__(self, data, område):
+        self.data = data  # (rader, kolumner) med RASTER_DTYPE, rad 0 i söder
+        self.område = tuple(område)
+        syd, väst, nord, öst = self.område
+        self.rader, self.kolumner = data.shape
+        self.dlat = (nord - syd) / self.rader
+        self.dlon = (öst - väst) / self.kolumner
+
+    # --- Cellens (rad, kolumn) för punkter; -1 utanför området ---
+    def cell(self, lat, lon):
+        syd, väst, _, _ = self.område
+        r = np.floor((np.asarray(lat, dtype=float) - syd) / self.dlat).astype(int)
+        k = np.floor((np.asarray(lon, dtype=float) - väst) / self.dlon).astype(int)
+        utanför = (r < 0) | (r >= self.rader) | (k < 0) | (k >= self.kolumner)
+        return np.where(utanför, -1, r), np.where(utanför, -1, k)
+
+    # --- Avstånd (meter) till närmaste hållplats eller toalett för godtyckliga punkter; NaN utanför ---
+    def slå_upp(self, lat, lon, fält='avstånd_hållplats'):
+        r, k = self.cell(lat, lon)
+        värden = np.asarray(self.data[fält][np.maximum(r, 0), np.maximum(k, 0)], dtype=float)
+        return np.where(r < 0, np.nan, värden)
+
+    # --- Cellernas mittpunkter, (lat per rad, lon per kolumn) ---
+    def mittpunkter(self):
+        syd, väst, _, _ = self.område
+        return (syd + (np.arange(self.rader) + 0.5) * self.dlat,
+                väst + (np.arange(self.kolumner) + 0.5) * self.dlon)
+
+
+# --- Avstånd från varje cellmitt till närmaste punkt, via avståndstransform ---
+def _avståndsfält(raster, lat, lon):
+    from scipy.ndimage import distance_transform_edt
+
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    r, k = raster.cell(lat, lon)
+    inom = r >= 0
+    if not inom.any():
+        return np.full((raster.rader, raster.kolumner), np.inf, dtype='f4')
+
+    # En punkt per fröcell räcker; felet det ger är mindre än cellstorleken
+    fröpunkt = np.full((raster.rader, raster.kolumner), -1)
+    fröpunkt[r[inom], k[inom]] = np.flatnonzero(inom)
+    mitt_lat, mitt_lon = raster.mittpunkter()
+    sampling = (raster.dlat * M_PER_GRAD, raster.dlon * M_PER_GRAD * math.cos(math.radians(mitt_lat.mean())))
+    _, (ri, ki) = distance_transform_edt(fröpunkt < 0, sampling=sampling, return_indices=True)
+    närmaste = fröpunkt[ri, ki]
+
+    return radvisa_avstånd(
+        mitt_lat[:, None], mitt_lon[None, :], lat[närmaste], lon[närmaste]
+    ).astype('f4')
+
+
+def beräkna_raster(hållplatser, toaletter_data, område=OMRÅDE, upplösning_m=UPPLÖSNING_M):
+    data = np.empty(rutnät(område, upplösning_m), dtype=RASTER_DTYPE)
+    raster = Tillgänglighetsraster(data, område)
+    data['avstånd_hållplats'] = _avståndsfält(raster, hållplatser['lat'], hållplatser['lon'])
+    data['avstånd_toalett'] = _avståndsfält(
+        raster, [el['lat'] for el in toaletter_data], [el['lon'] for el in toaletter_data]
+    )
+    return raster
+
+
+def raster_sökväg(nyckel, upplösning_m, katalog=forberakning.STANDARDKATALOG):
+    return os.path.join(katalog, f"tillganglighet_{upplösning_m:g}m_{nyckel}.npy")
+
+
+def _nyckel(hållplats_fil, toalett_fil, område, upplösning_m):
+    return forberakning.innehållshash(
+        hållplats_fil, toalett_fil, version=f"raster{RASTER_VERSION}|{område}|{upplösning_m:g}"
+    )
+
+
+# --- Bygg rastret och skriv det till disk (atomiskt, som avståndsartefakten) ---
+def bygg_raster(hållplats_fil, toalett_fil, område=OMRÅDE, upplösning_m=UPPLÖSNING_M,
+                katalog=forberakning.STANDARDKATALOG):
+    sökväg = raster_sökväg(_nyckel(hållplats_fil, toalett_fil, område, upplösning_m), upplösning_m, katalog)
+    raster = beräkna_raster(
+        forberakning.läs_hållplatser(hållplats_fil), forberakning.läs_osm_json(toalett_fil), område, upplösning_m
+    )
+    os.makedirs(katalog, exist_ok=True)
+    tmp = f"{sökväg}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, raster.data)
+    os.replace(tmp, sökväg)
+
+    # Ta bort raster med samma upplösning som byggts från tidigare indata
+    for gammal in glob.glob(raster_sökväg("*", upplösning_m, katalog)):
+        if gammal != sökväg:
+            os.remove(gammal)
+    return sökväg
+
+
+# --- Läs rastret minnesmappat, bygg det först om indata, område eller upplösning har ändrats ---
+def ladda_raster(hållplats_fil, toalett_fil, område=OMRÅDE, upplösning_m=UPPLÖSNING_M,
+                 katalog=forberakning.STANDARDKATALOG):
+    sökväg = raster_sökväg(_nyckel(hållplats_fil, toalett_fil, område, upplösning_m), upplösning_m, katalog)
+    if not os.path.exists(sökväg):
+        sökväg = bygg_raster(hållplats_fil, toalett_fil, område, upplösning_m, katalog)
+    return Tillgänglighetsraster(np.load(sökväg, mmap_mode='r'), område)
+
+
+# --- Värmekarta: RGBA-bild (rad 0 i norr) från grönt (nära) till rött (max_meter eller längre) ---
+# Bilden glesas ut till högst max_pixlar per sida så att kartans storlek hålls nere.
+FÄRGSKALA = np.array([
+    [26, 150, 65],
+    [166, 217, 106],
+    [253, 174, 97],
+    [215, 25, 28],
+], dtype=float)
+
+
+def som_bild(raster, fält='avstånd_hållplats', max_meter=1000, max_pixlar=400, opacitet=0.55):
+    steg = max(1, math.ceil(max(raster.rader, raster.kolumner) / max_pixlar))
+    värden = np.asarray(raster.data[fält][::steg, ::steg], dtype=float)[::-1]
+    andel = np.clip(np.nan_to_num(värden / max_meter, nan=1.0, posinf=1.0), 0, 1) * (len(FÄRGSKALA) - 1)
+    nedre = np.minimum(andel.astype(int), len(FÄRGSKALA) - 2)
+    vikt = (andel - nedre)[..., None]
+    rgb = FÄRGSKALA[nedre] * (1 - vikt) + FÄRGSKALA[nedre + 1] * vikt
+    alfa = np.full(värden.shape + (1,), 255 * opacitet)
+    return np.concatenate([rgb, alfa], axis=-1).astype(np.uint8)
@@ -0,0 +1,112 @@
+import numpy as np
+
+# --- Punkter i kartans utsnitt ---
+# I det interaktiva kartläget (st_folium) skickar kartan tillbaka sitt utsnitt (bounds) och
+# sin zoomnivå, och bara punkterna i utsnittet skickas till webbläsaren. Rutindex delar in
+# punkterna i ett fast rutnät (sorterade på ruta, med start-index per ruta), så en fråga om
+# en rektangel bara går igenom rutorna som överlappar den – inte hela tabellen.
+#
+# Utfallet per lager är antingen enskilda punkter (inzoomat och högst MAX_PUNKTER i
+# utsnittet) eller antal per cell i ett RUTNÄT över utsnittet. Det som skickas är alltså
+# högst max(MAX_PUNKTER, rader × kolumner) punkter per lager, hur stora tabellerna än är.
+
+# Rutstorlek i indexet (grader, ca 1 km i nord-sydlig led)
+CELL_GRADER = 0.01
+
+# Punkter visas en och en från denna zoomnivå, om de är högst MAX_PUNKTER i utsnittet
+DETALJZOOM = 13
+MAX_PUNKTER = 500
+
+# Celler (rader, kolumner) över utsnittet när punkterna räknas i stället för visas
+RUTNÄT = (12, 12)
+
+# Utsnittet utökas med denna andel åt varje håll, så små panoreringar inte kräver ny hämtning
+MARGINAL = 0.25
+
+
+class Rutindex:
+    def __init__(self, lat, lon, cell_grader=CELL_GRADER):
+        self.lat = np.asarray(lat, dtype='f8')
+        self.lon = np.asarray(lon, dtype='f8')
+        self.cell = float(cell_grader)
+        if len(self.lat):
+            self.syd, self.väst = self.lat.min(), self.lon.min()
+            self.rader = int((self.lat.max() - self.syd) // self.cell) + 1
+            self.kolumner = int((self.lon.max() - self.väst) // self.cell) + 1
+        else:
+            self.syd = self.väst = 0.0
+            self.rader = self.kolumner = 0
+        rutor = self._rad(self.lat) * self.kolumner + self._kolumn(self.lon)
+        self.ordning = np.argsort(rutor, kind="stable")
+        self.start = np.searchsorted(rutor[self.ordning], np.arange(self.rader * self.kolumner + 1))
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _rad(self, lat):
+        return np.clip(((lat - self.syd) // self.cell).astype(int), 0, max(self.rader - 1, 0))
+
+    def _kolumn(self, lon):
+        return np.clip(((lon - self.väst) // self.cell).astype(int), 0, max(self.kolumner - 1, 0))
+
+    # --- Positionerna (i de ursprungliga arrayerna) för punkter inom (syd, väst, nord, öst) ---
+    def inom(self, bbox):
+        syd, väst, nord, öst = bbox
+        if not len(self) or nord < self.syd or öst < self.väst:
+            return np.empty(0, dtype=int)
+        r0, r1 = self._rad(np.array([syd, nord]))
+        k0, k1 = self._kolumn(np.array([väst, öst]))
+        # Rutorna i en rad ligger i följd, så varje rad i rektangeln är ett intervall i ordningen
+        rader = np.arange(r0, r1 + 1) * self.kolumner
+        kandidater = np.concatenate([
+            self.ordning[a:b] for a, b in zip(self.start[rader + k0], self.start[rader + k1 + 1])
+        ])
+        behåll = (
+            (self.lat[kandidater] >= syd) & (self.lat[kandidater] <= nord) &
+            (self.lon[kandidater] >= väst) & (self.lon[kandidater] <= öst)
+        )
+        return np.sort(kandidater[behåll])
+
+
+# --- (syd, väst, nord, öst) från st_folium:s bounds, utökat med marginal ---
+def bbox_från(bounds, marginal=MARGINAL):
+    sv, no = bounds['_southWest'], bounds['_northEast']
+    syd, väst, nord, öst = sv['lat'], sv['lng'], no['lat'], no['lng']
+    dlat, dlon = (nord - syd) * marginal, (öst - väst) * marginal
+    return (syd - dlat, väst - dlon, nord + dlat, öst + dlon)
+
+
+# --- Ungefärligt utsnitt för en karta med centrum och zoom (innan kartan har skickat sina bounds) ---
+# Web Mercator: 256 pixlar per 360 grader longitud vid zoom 0, latitud krymper med cos(lat).
+def bbox_runt(centrum, zoom, bredd_px=700, höjd_px=510, marginal=MARGINAL):
+    lat, lon = centrum
+    grader_per_px = 360.0 / (256 * 2 ** zoom)
+    dlon = bredd_px * grader_per_px / 2 * (1 + 2 * marginal)
+    dlat = höjd_px * grader_per_px * np.cos(np.radians(lat)) / 2 * (1 + 2 * marginal)
+    return (lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+
+
+# --- Antal punkter per cell i ett rader × kolumner-rutnät över bbox; bara celler med punkter ---
+# Returnerar (lat, lon, antal) där lat/lon är medelpositionen för punkterna i cellen.
+def räkna_per_cell(lat, lon, bbox, rutnät=RUTNÄT):
+    syd, väst, nord, öst = bbox
+    rader, kolumner = rutnät
+    lat, lon = np.asarray(lat, dtype='f8'), np.asarray(lon, dtype='f8')
+    r = np.clip(((lat - syd) / (nord - syd) * rader).astype(int), 0, rader - 1)
+    k = np.clip(((lon - väst) / (öst - väst) * kolumner).astype(int), 0, kolumner - 1)
+    cell = r * kolumner + k
+    antal = np.bincount(cell, minlength=rader * kolumner)
+    med = np.flatnonzero(antal)
+    return (
+        np.bincount(cell, weights=lat, minlength=rader * kolumner)[med] / antal[med],
+        np.bincount(cell, weights=lon, minlength=rader * kolumner)[med] / antal[med],
+        antal[med],
+    )
+
+
+# --- Vad som ska visas för ett lager: ("punkter", positioner) eller ("celler", (lat, lon, antal)) ---
+def välj(index, bbox, zoom, max_punkter=MAX_PUNKTER, detaljzoom=DETALJZOOM, rutnät=RUTNÄT):
+    positioner = index.inom(bbox)
+    if zoom >= detaljzoom and len(positioner) <= max_punkter:
+        return "punkter", positioner
+    return "celler", räkna_per_cell(index.lat[positioner], index.lon[positioner], bbox, rutnät)